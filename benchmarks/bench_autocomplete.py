@@ -0,0 +1,65 @@
+"""
+Benchmark of the autocomplete index
+
+Types a set of queries (some misspelled) one keystroke at a time against the
+autocomplete index of the thesauruses and reports the latency of each
+keystroke, with the cache of query words emptied before every keystroke
+("cold") and kept between them as in the app ("warm").
+
+Run from the repository root:
+
+    python benchmarks/bench_autocomplete.py
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "codethesaurus.settings")
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+from web.autocomplete import AutocompleteIndex  # pylint: disable=wrong-import-position
+from web.concept_index import ConceptIndex  # pylint: disable=wrong-import-position
+from web.corpus import Catalog  # pylint: disable=wrong-import-position
+
+QUERIES = [
+    "javascript", "javscript", "pyhton", "c++", "dictonary", "length of string", "lenght of strng",
+    "exceptoin handling", "for loop", "itreation", "queues and stacks", "hashed list",
+]
+RUNS = 20
+
+
+def keystroke_microseconds(index, cold):
+    """Returns the latency of every keystroke of every query in microseconds"""
+    latencies = []
+    for _ in range(RUNS):
+        index._match_cache.clear()  # pylint: disable=protected-access
+        for query in QUERIES:
+            for length in range(1, len(query) + 1):
+                if cold:
+                    index._match_cache.clear()  # pylint: disable=protected-access
+                start = time.perf_counter()
+                index.complete(query[:length])
+                latencies.append((time.perf_counter() - start) * 1e6)
+    return sorted(latencies)
+
+
+def main():
+    catalog = Catalog.scan()
+    concept_index = ConceptIndex.build(catalog)
+    start = time.perf_counter()
+    index = AutocompleteIndex.build(catalog, concept_index)
+    print(f"build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(index.items)} names")
+
+    print(f"{'cache':<6} {'p50 µs':>8} {'p95 µs':>8} {'max µs':>8}")
+    for label, cold in (("cold", True), ("warm", False)):
+        latencies = keystroke_microseconds(index, cold)
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{label:<6} {statistics.median(latencies):>8.0f} {p95:>8.0f} {latencies[-1]:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of the JSON API's filled templates
+
+Compares the CPU time per call of the old `load_filled_concepts` and
+`load_comparison` (template JSON string, `json.loads`, `jsonmerge.merge` and
+one `json.dumps` per entry plus another round trip for comparisons) with the
+dict-level merge that serializes once per response. Files are read through
+the document cache in both cases, so only the template work is compared.
+
+Run from the repository root:
+
+    python benchmarks/bench_filled_template.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "codethesaurus.settings")
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+from jsonmerge import merge  # pylint: disable=wrong-import-position
+
+from web.models import ThesaurusEntry  # pylint: disable=wrong-import-position
+from web.thesaurus_template_generators import generate_entry_template  # pylint: disable=wrong-import-position
+
+CALLS = 200
+CASES = [
+    ("python", "3", "data_types"),
+    ("javascript", "ECMAScript 2023", "functions"),
+    ("java", "17", "strings"),
+]
+
+
+def legacy_filled_concepts(entry, structure_key, version):
+    """The filled template as it was built before"""
+    entry.load_concepts(structure_key, version)
+    template = json.loads(generate_entry_template(entry.key, structure_key, version))
+    template['concepts'] = merge(template['concepts'], entry.concepts)
+    return json.dumps(template, indent=2)
+
+
+def legacy_comparison(structure_key, entry1, version1, entry2, version2):
+    """The comparison as it was built before"""
+    filled1 = legacy_filled_concepts(ThesaurusEntry(entry1, ""), structure_key, version1)
+    filled2 = legacy_filled_concepts(ThesaurusEntry(entry2, ""), structure_key, version2)
+    return json.dumps({
+        "meta": {
+            "entry_1": entry1,
+            "entry_version_1": version1,
+            "entry_2": entry2,
+            "entry_version_2": version2,
+            "structure": structure_key
+        },
+        "concepts1": json.loads(filled1)['concepts'],
+        "concepts2": json.loads(filled2)['concepts']
+    }, indent=2)
+
+
+def cpu_per_call(function):
+    """Returns the CPU time of one call in microseconds"""
+    function()
+    start = time.process_time()
+    for _ in range(CALLS):
+        function()
+    return (time.process_time() - start) / CALLS * 1e6
+
+
+def main():
+    print(f"{'call':<48} {'before µs':>10} {'after µs':>10} {'speedup':>8}")
+    for entry_key, version, structure_key in CASES:
+        before = cpu_per_call(
+            lambda: legacy_filled_concepts(ThesaurusEntry(entry_key, ""), structure_key, version))
+        after = cpu_per_call(
+            lambda: ThesaurusEntry(entry_key, "").load_filled_concepts(structure_key, version))
+        label = f"reference {entry_key} {version} {structure_key}"
+        print(f"{label:<48} {before:>10.0f} {after:>10.0f} {before / after:>7.1f}x")
+
+    before = cpu_per_call(
+        lambda: legacy_comparison("data_types", "python", "3", "java", "17"))
+    after = cpu_per_call(
+        lambda: ThesaurusEntry("python", "").load_comparison("data_types", "java", "17", "3"))
+    label = "compare python 3 / java 17 data_types"
+    print(f"{label:<48} {before:>10.0f} {after:>10.0f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark of building the home page entries as the corpus grows
+
+Builds synthetic thesauruses directories with an increasing number of
+languages and structures and compares the per-request cost of the old nested
+`os.listdir` walk with `group_index_entries` reading the catalog's
+availability matrix. The catalog itself is built once per tree, outside the
+timed section, as it is in the app.
+
+Run from the repository root:
+
+    python benchmarks/bench_index.py
+"""
+import os
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "codethesaurus.settings")
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+from web.corpus import Catalog  # pylint: disable=wrong-import-position
+from web.views import group_index_entries  # pylint: disable=wrong-import-position
+
+VERSIONS_PER_LANGUAGE = 2
+SIZES = [(10, 8), (40, 16), (160, 32), (640, 64)]
+
+
+def build_tree(root, language_count, structure_count):
+    """Creates a thesauruses directory and a matching meta info"""
+    structures = [f"structure{index}" for index in range(structure_count)]
+    os.makedirs(os.path.join(root, "_meta"))
+    for structure in structures:
+        open(os.path.join(root, "_meta", f"{structure}.json"), "w").close()
+    languages = {}
+    for index in range(language_count):
+        key = f"lang{index}"
+        languages[key] = f"Language {index}"
+        for version in range(VERSIONS_PER_LANGUAGE):
+            version_dir = os.path.join(root, "langs", key, str(version))
+            os.makedirs(version_dir)
+            # every language defines about two thirds of the structures
+            for structure in structures[index % 3::1][: structure_count * 2 // 3]:
+                open(os.path.join(version_dir, f"{structure}.json"), "w").close()
+    return SimpleNamespace(
+        languages=languages,
+        categories={"langs": "Programming Languages"},
+        category_structures={"langs": {key: key for key in structures}},
+    )
+
+
+def legacy_index_entries(root, meta_info):
+    """The per-request directory walk the index view used to do"""
+    meta_concepts = os.listdir(os.path.join(root, "_meta"))
+    entries = {
+        key: [{"version": version, "availStructs": []}
+              for version in os.listdir(os.path.join(root, "langs", key))]
+        for key in meta_info.languages
+    }
+    for category in os.listdir(root):
+        category_path = os.path.join(root, category)
+        if category == "_meta" or not os.path.isdir(category_path):
+            continue
+        for entry_dir in os.listdir(category_path):
+            entry_path = os.path.join(category_path, entry_dir)
+            for ver in os.listdir(entry_path):
+                ver_path = os.path.join(entry_path, ver)
+                for concept_json in meta_concepts:
+                    if concept_json in os.listdir(ver_path):
+                        for version in entries[entry_dir]:
+                            if version["version"] == ver:
+                                version["availStructs"].append(concept_json.split(".")[0])
+                                break
+    return entries
+
+
+def time_per_call(function, repeat=5):
+    """Best wall time of one call in milliseconds"""
+    number = 3
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    print(f"{'languages':>9} {'structures':>10} {'listdir (ms)':>13} {'matrix (ms)':>12} "
+          f"{'matrix us/row':>14}")
+    for language_count, structure_count in SIZES:
+        with tempfile.TemporaryDirectory() as root:
+            meta_info = build_tree(root, language_count, structure_count)
+            catalog = Catalog.scan(root)
+            legacy = time_per_call(lambda: legacy_index_entries(root, meta_info))
+            matrix = time_per_call(lambda: group_index_entries(meta_info, catalog))
+            rows = language_count * VERSIONS_PER_LANGUAGE
+            print(f"{language_count:>9} {structure_count:>10} {legacy:>13.2f} {matrix:>12.3f} "
+                  f"{matrix * 1000 / rows:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
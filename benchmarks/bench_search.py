@@ -0,0 +1,86 @@
+"""
+Benchmark of the full-text search index
+
+Builds the search index of the thesauruses and of synthetic corpora of up to
+10 times their size, then times a set of queries against each. The synthetic
+corpora repeat every document under a new entry key and rename the
+identifiers of each copy's code, so both the postings and the vocabulary grow
+with the corpus.
+
+Run from the repository root:
+
+    python benchmarks/bench_search.py
+"""
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "codethesaurus.settings")
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+from web.concept_index import ConceptIndex  # pylint: disable=wrong-import-position
+from web.corpus import Catalog  # pylint: disable=wrong-import-position
+from web.search import SearchIndex, iter_search_documents  # pylint: disable=wrong-import-position
+
+SCALES = [1, 2, 5, 10]
+QUERIES = [
+    "len", "strlen", "length of string", "print", "for loop", "hash map", "substring",
+    "convert string to integer", "append", "lambda", "exception", "null", "sort list",
+    "while", "st", "read file line by line",
+]
+RUNS = 20
+LIMIT = 20
+
+
+def scaled_documents(documents, scale):
+    """Returns the documents and `scale - 1` renamed copies of them"""
+    scaled = list(documents)
+    for copy in range(1, scale):
+        suffix = f"Copy{copy}"
+        for document in documents:
+            scaled.append(document._replace(
+                entry_key=f"{document.entry_key}{suffix}",
+                code=re.sub(r"[A-Za-z_]\w{3,}", lambda match: match.group(0) + suffix, document.code),
+            ))
+    return scaled
+
+
+def query_milliseconds(index):
+    """Returns the latency of every run of every query in milliseconds"""
+    latencies = []
+    for query in QUERIES:
+        index.search(query, LIMIT)
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            index.search(query, LIMIT)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    start = time.perf_counter()
+    concept_index = ConceptIndex.build(Catalog.scan())
+    read_seconds = time.perf_counter() - start
+    documents = list(iter_search_documents(concept_index))
+    print(f"reading the corpus into the concept index: {read_seconds * 1000:.0f} ms")
+
+    print(f"{'scale':>5} {'documents':>10} {'terms':>8} {'build ms':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+    for scale in SCALES:
+        corpus = scaled_documents(documents, scale)
+        start = time.perf_counter()
+        index = SearchIndex(corpus)
+        build_milliseconds = (time.perf_counter() - start) * 1000
+        latencies = sorted(query_milliseconds(index))
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"{scale:>4}x {len(corpus):>10} {len(index.postings):>8} {build_milliseconds:>9.0f} "
+              f"{statistics.median(latencies):>7.2f} {p95:>7.2f} {latencies[-1]:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
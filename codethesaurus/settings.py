@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 import django_on_heroku
 
@@ -20,6 +21,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("SECRET_KEY", "default-unsafe-key")
 
+# True while running `python manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # SECURITY WARNING: don't run with debug turned on in production!
 SYSTEM_ENV = os.environ.get('SYSTEM_ENV', None)
 
@@ -55,7 +59,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.common.BrokenLinkEmailsMiddleware'
+    'django.middleware.common.BrokenLinkEmailsMiddleware',
+    # last, so the middleware above also processes the pre-rendered pages
+    'web.middleware.PrerenderedPageMiddleware',
 ]
 
 ROOT_URLCONF = 'codethesaurus.urls'
@@ -178,6 +184,102 @@ LOGGING = {
     }
 }
 
+# Compiled thesaurus snapshot (`python manage.py compile_snapshot`). When the
+# file doesn't exist, or the files changed since it was compiled, the loose
+# JSON files in web/thesauruses are read instead.
+THESAURUS_SNAPSHOT_PATH = os.environ.get(
+    'THESAURUS_SNAPSHOT_PATH',
+    os.path.join(BASE_DIR, 'web', 'thesauruses.snapshot')
+)
+
+# Upper bound (in bytes of JSON source) for the in-process cache of thesaurus
+# files read when there is no snapshot
+THESAURUS_CACHE_MAX_BYTES = int(os.environ.get('THESAURUS_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+# How often (at most) the layout of web/thesauruses is re-checked for added or
+# removed entries, versions and structures when there is no snapshot
+THESAURUS_CATALOG_RECHECK_SECONDS = float(os.environ.get('THESAURUS_CATALOG_RECHECK_SECONDS', 5))
+
+# ETags of the compare/reference pages and API responses are derived from the
+# hashes of the thesaurus files they are built from. Change ETAG_SALT (e.g. to
+# the release) when a deploy changes how responses are rendered.
+ETAG_SALT = os.environ.get('ETAG_SALT', '')
+
+# Maximum number of lookups in one request to the batch API (/api/batch/)
+API_BATCH_MAX_ITEMS = int(os.environ.get('API_BATCH_MAX_ITEMS', 100))
+
+# Maximum number of results of one search (/search/ and /api/search/)
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 100))
+# Longer search queries are rejected with 400
+SEARCH_MAX_QUERY_LENGTH = int(os.environ.get('SEARCH_MAX_QUERY_LENGTH', 200))
+
+# Maximum number of results of one autocompletion (/api/autocomplete/)
+AUTOCOMPLETE_MAX_RESULTS = int(os.environ.get('AUTOCOMPLETE_MAX_RESULTS', 25))
+# Longer autocomplete queries are rejected with 400
+AUTOCOMPLETE_MAX_QUERY_LENGTH = int(os.environ.get('AUTOCOMPLETE_MAX_QUERY_LENGTH', 100))
+
+# Whether the search and autocomplete indexes are built in the background when
+# the app starts, instead of on first use
+SEARCH_INDEX_AT_STARTUP = os.environ.get('SEARCH_INDEX_AT_STARTUP', str(not TESTING)).lower() == 'true'
+
+# Reference and comparison API responses prebuilt in every variant (indented or
+# compact, plain or gzipped) by `python manage.py build_api_payloads`. They are
+# served while the thesaurus files they were built from are unchanged. Set
+# API_PAYLOAD_DIR to an empty string to always build responses per request.
+API_PAYLOAD_DIR = os.environ.get('API_PAYLOAD_DIR', os.path.join(BASE_DIR, 'api_payloads'))
+
+# Reference and compare pages rendered to static HTML files (plain and gzipped)
+# by `python manage.py prerender_pages`. PrerenderedPageMiddleware serves them
+# while the thesaurus files they were rendered from are unchanged; a web server
+# or CDN can serve PRERENDER_DIR directly as well. Set PRERENDER_DIR to an
+# empty string to always render pages per request.
+PRERENDER_DIR = os.environ.get('PRERENDER_DIR', os.path.join(BASE_DIR, 'prerendered'))
+# Scheme and host the absolute links of the pre-rendered pages point to
+PRERENDER_BASE_URL = os.environ.get('PRERENDER_BASE_URL', 'https://codethesaur.us')
+# Comparisons pre-rendered for every structure both entries have, as
+# "entry;version:entry;version" pairs separated by commas
+PRERENDER_COMPARISON_PAIRS = [
+    tuple(pair.split(':')) for pair in
+    os.environ.get('PRERENDER_COMPARISON_PAIRS', '').split(',') if pair.count(':') == 1
+]
+
+# Rendered categories of the compare and reference pages are cached in memory,
+# up to FRAGMENT_CACHE_MAX_BYTES of HTML, per entry version and content of its
+# thesaurus file
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Compare pages of at least CONCEPTS_STREAMING_MIN_ENTRIES entries are
+# streamed: the page header is sent right away and each category as soon as
+# it's rendered. 0 renders every page completely before sending it.
+CONCEPTS_STREAMING_MIN_ENTRIES = int(os.environ.get('CONCEPTS_STREAMING_MIN_ENTRIES', 3))
+
+# The compare and reference pages render their first CONCEPTS_EAGER_CATEGORIES
+# categories and load the others from /compare/category/ as they're scrolled
+# to. 0 renders every category.
+CONCEPTS_EAGER_CATEGORIES = int(os.environ.get('CONCEPTS_EAGER_CATEGORIES', 2))
+
+# Highlighted code snippets are cached in memory (up to HIGHLIGHT_CACHE_MAX_BYTES
+# of HTML) and in HIGHLIGHT_CACHE_DIR on disk, which
+# `python manage.py warm_highlight_cache` fills for the whole thesaurus.
+# Set HIGHLIGHT_CACHE_DIR to an empty string to only cache in memory (the
+# default for tests).
+HIGHLIGHT_CACHE_MAX_BYTES = int(os.environ.get('HIGHLIGHT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+HIGHLIGHT_CACHE_DIR = os.environ.get(
+    'HIGHLIGHT_CACHE_DIR', '' if TESTING else os.path.join(BASE_DIR, 'highlight_cache'))
+
+# Visits and lookups are queued in memory and written in batches by a background
+# thread (see web/analytics.py). At most ANALYTICS_MAX_BACKLOG rows are queued;
+# further rows are dropped until the backlog drains. Tests write synchronously.
+ANALYTICS_BUFFERED = os.environ.get('ANALYTICS_BUFFERED', str(not TESTING)).lower() == 'true'
+ANALYTICS_MAX_BACKLOG = int(os.environ.get('ANALYTICS_MAX_BACKLOG', 10000))
+ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE', 500))
+ANALYTICS_FLUSH_SECONDS = float(os.environ.get('ANALYTICS_FLUSH_SECONDS', 2))
+
+# The statistics page is computed at most once per STATISTICS_CACHE_SECONDS;
+# visitors get the previous numbers while a background thread refreshes them.
+# 0 computes it on every request (the default for tests).
+STATISTICS_CACHE_SECONDS = float(os.environ.get('STATISTICS_CACHE_SECONDS', 0 if TESTING else 300))
+
 SIMILAR_LEXERS = {
     "clips": "prolog",
 }
@@ -0,0 +1,241 @@
+"""Write-behind storage of the visit and lookup analytics of codethesaur.us"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from web.models import LookupData, MissingLookup, SiteVisit
+from web.rollups import rollup_counts
+
+
+# SQLite limits the depth of expression trees, so keys are looked up in chunks
+COUNTER_LOOKUP_CHUNK_SIZE = 100
+
+
+class CounterIncrement:
+    """Increments of counter rows, queued with the AnalyticsWriter like a row"""
+
+    def __init__(self, model, counts):
+        """
+        Initializes the increment
+
+        :param model: counter model with `KEY_FIELDS` and a `count` field
+        :param counts: dict of key tuple (values of `KEY_FIELDS`) -> amount
+        """
+        self.model = model
+        self.counts = counts
+
+
+def increment_counters(model, counts):
+    """
+    Adds `counts` to the counter rows of `model`, creating missing rows. Uses
+    one insert for new keys and one update per chunk of keys, whatever the
+    number of keys, and increments with F() so concurrent writers don't lose
+    counts.
+
+    :param model: counter model with `KEY_FIELDS`, a `count` and optionally a
+        `last_seen` field
+    :param counts: dict of key tuple -> amount
+    """
+    key_fields = model.KEY_FIELDS
+    now = timezone.now()
+    update_fields = ['count']
+    extra_fields = {}
+    if any(field.name == 'last_seen' for field in model._meta.fields):
+        update_fields.append('last_seen')
+        extra_fields['last_seen'] = now
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key)), count=0, **extra_fields) for key in counts],
+        ignore_conflicts=True,
+    )
+    keys = list(counts)
+    for start in range(0, len(keys), COUNTER_LOOKUP_CHUNK_SIZE):
+        condition = Q()
+        for key in keys[start:start + COUNTER_LOOKUP_CHUNK_SIZE]:
+            condition |= Q(**dict(zip(key_fields, key)))
+        rows = list(model.objects.filter(condition))
+        for row in rows:
+            row.count = F('count') + counts[tuple(getattr(row, field) for field in key_fields)]
+            for field, value in extra_fields.items():
+                setattr(row, field, value)
+        model.objects.bulk_update(rows, update_fields)
+
+
+class AnalyticsWriter:
+    """
+    Collects analytics rows (SiteVisit, LookupData and MissingLookup instances)
+    and CounterIncrements in memory and writes them with one `bulk_create` per
+    model (and one upsert per counter model) from a background thread, once
+    `batch_size` items are queued or `flush_seconds` passed. Requests only pay
+    for appending to the queue. The daily rollups of the written visits and
+    lookups are incremented in the same transaction.
+
+    Drop policy: the backlog is bounded by `max_backlog` rows. When it is full,
+    new rows are dropped (and counted in `dropped`) instead of blocking the
+    request or growing memory. Rows that reference a dropped or unsaved visit
+    are dropped when their batch is written. A failed batch is logged and
+    dropped as well; analytics never fail a page.
+
+    Queued rows are flushed when the process exits (the worker's `atexit`).
+    """
+
+    # Models in the order they have to be written, so visits have primary keys
+    # before the rows referencing them are inserted
+    WRITE_ORDER = (SiteVisit, LookupData, MissingLookup)
+
+    def __init__(self, max_backlog, batch_size, flush_seconds, buffered=True):
+        """
+        Initializes the writer; the background thread starts with the first row
+
+        :param max_backlog: maximum number of queued rows
+        :param batch_size: number of queued rows that triggers a write
+        :param flush_seconds: maximum time rows wait before they are written
+        :param buffered: if False, every row is written immediately in the
+            calling thread
+        """
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffered = buffered
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = threading.Event()
+
+    def add(self, instance):
+        """
+        Queues an unsaved model instance or a CounterIncrement to be written
+
+        :param instance: SiteVisit, LookupData or MissingLookup instance, or a
+            CounterIncrement
+        :return: False if the row was dropped because the backlog is full
+        :rtype: bool
+        """
+        if not self.buffered:
+            self.write([instance])
+            return True
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logging.warning(f"Analytics backlog full, {self.dropped} rows dropped so far")
+            return False
+        return True
+
+    def flush(self):
+        """Writes all queued rows in the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.write(batch)
+
+    def write(self, batch):
+        """
+        Writes a batch of rows with one `bulk_create` per model
+
+        :param batch: list of unsaved model instances
+        """
+        by_model = {model: [] for model in self.WRITE_ORDER}
+        counters = {}
+        for instance in batch:
+            if isinstance(instance, CounterIncrement):
+                model_counts = counters.setdefault(instance.model, {})
+                for key, amount in instance.counts.items():
+                    model_counts[key] = model_counts.get(key, 0) + amount
+            else:
+                by_model.setdefault(type(instance), []).append(instance)
+
+        with self._write_lock:
+            try:
+                with transaction.atomic():
+                    for model, instances in by_model.items():
+                        if model is not SiteVisit:
+                            instances = [
+                                instance for instance in instances
+                                if instance.site_visit is not None and instance.site_visit.pk is not None
+                            ]
+                        if instances:
+                            model.objects.bulk_create(instances)
+                            self.written += len(instances)
+                        by_model[model] = instances
+                    rollups = rollup_counts(by_model[SiteVisit], by_model[LookupData])
+                    for model_name, counts in rollups.items():
+                        model = apps.get_model('web', model_name)
+                        counters[model] = counts
+                    for model, counts in counters.items():
+                        increment_counters(model, counts)
+            except Exception as e:
+                logging.error(f"Failed to store {len(batch)} analytics rows: {e}")
+
+    def stop(self, timeout=5):
+        """
+        Stops the background thread and writes whatever is still queued
+
+        :param timeout: seconds to wait for the background thread
+        """
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._thread_pid == os.getpid():
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_thread(self):
+        # Also (re)starts the thread in forked workers, which don't inherit it
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="analytics-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._collect()
+                if batch:
+                    self.write(batch)
+        finally:
+            connection.close()
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size and not self._stopping.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.5)))
+            except queue.Empty:
+                continue
+        return batch
+
+
+analytics_writer = AnalyticsWriter(
+    max_backlog=getattr(settings, "ANALYTICS_MAX_BACKLOG", 10000),
+    batch_size=getattr(settings, "ANALYTICS_BATCH_SIZE", 500),
+    flush_seconds=getattr(settings, "ANALYTICS_FLUSH_SECONDS", 2),
+    buffered=getattr(settings, "ANALYTICS_BUFFERED", True),
+)
@@ -1,7 +1,33 @@
 """Apps config of codethesaur.us"""
+import logging
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def build_indexes():
+    """Builds the search and autocomplete indexes"""
+    # pylint: disable=import-outside-toplevel
+    from web.autocomplete import get_autocomplete_index
+    from web.search import get_search_index
+    get_search_index()
+    get_autocomplete_index()
 
 
 class WebConfig(AppConfig):
     """Config for thesaurus web App"""
     name = 'web'
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel
+        from web.concept_index import get_concept_index
+        from web.corpus import get_snapshot
+        get_snapshot()
+        try:
+            get_concept_index()
+        except (OSError, ValueError) as error:
+            # built again on first use, where the broken file gives its error
+            logging.error(f"Failed to build the concept index: {error}")
+        if getattr(settings, "SEARCH_INDEX_AT_STARTUP", False):
+            threading.Thread(target=build_indexes, name="search-indexes", daemon=True).start()
@@ -0,0 +1,324 @@
+"""Typo-tolerant autocomplete of the names of entries, structures and concepts"""
+import heapq
+import re
+import threading
+from collections import namedtuple
+
+from web.caching import BoundedLRUCache
+from web.concept_index import get_concept_index
+from web.corpus import get_catalog, load_meta_info, load_meta_structure
+
+
+class AutocompleteItem(namedtuple("AutocompleteItem", ["kind", "key", "name", "structure_key", "versions"])):
+    """
+    Something that can be completed: an entry (with its versions), a structure
+    or a concept (with the key of its structure)
+    """
+    __slots__ = ()
+
+    def as_dict(self):
+        """
+        Returns the item as it is shown in the autocomplete API
+
+        :rtype: dict
+        """
+        item = {"type": self.kind, "key": self.key, "name": self.name}
+        if self.kind == "entry":
+            item["versions"] = list(self.versions)
+        if self.kind == "concept":
+            item["structure"] = self.structure_key
+        return item
+
+
+# Results of the same score are ordered by their kind in this order
+KIND_ORDER = {"entry": 0, "structure": 1, "concept": 2}
+
+# Words of names and queries; "+" and "#" are kept for names like C++ and C#
+WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+# Score of a query word that is a whole word of a name, the start of one, or
+# a misspelling of one (minus a share per typo)
+EXACT_MATCH_SCORE = 1.0
+PREFIX_MATCH_SCORE = 0.8
+FUZZY_MATCH_SCORE = 0.7
+# Query words shorter than this only match exactly or as a prefix
+FUZZY_MIN_LENGTH = 3
+# Query words longer than this (or than the longest word of any name plus the
+# typos allowed) only match exactly; their deletion neighbourhoods grow with
+# the square of their length
+FUZZY_MAX_LENGTH = 24
+# Maximum total number of item matches of the query words kept in memory;
+# each keystroke repeats the words typed before
+MATCH_CACHE_SIZE = 100000
+
+
+def words(text):
+    """
+    Splits a name or a query into lowercase words
+
+    :param text: name or query
+    :rtype: list
+    """
+    return WORD_RE.findall(text.lower().replace("'", "").replace("_", " "))
+
+
+def deletions(word, count):
+    """
+    Returns the strings left of a word after deleting up to `count` of its
+    characters, including the word itself
+
+    :param word: lowercase word
+    :param count: maximum number of deleted characters
+    :rtype: set
+    """
+    variants = {word}
+    for _ in range(count):
+        variants |= {
+            variant[:index] + variant[index + 1:]
+            for variant in variants for index in range(len(variant))
+        }
+    return variants
+
+
+def max_edits(word):
+    """
+    Returns how many typos are tolerated in a query word of its length
+
+    :param word: lowercase query word
+    :rtype: int
+    """
+    return 1 if len(word) < 6 else 2
+
+
+def typo_distance(typed, word):
+    """
+    Returns how many typos separate what has been typed from a word or from
+    the start of it: the smallest number of insertions, deletions,
+    substitutions and transpositions of adjacent characters (optimal string
+    alignment distance) that turn `typed` into `word` or into a prefix of
+    `word` that is at most one character shorter or longer
+
+    :param typed: lowercase query word
+    :param word: lowercase word of a name
+    :rtype: int
+    """
+    word = word[:len(typed) + 1]
+    before_row, previous_row = None, list(range(len(word) + 1))
+    for i, typed_character in enumerate(typed, 1):
+        row = [i]
+        for j, word_character in enumerate(word, 1):
+            distance = min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (typed_character != word_character)
+            )
+            if i > 1 and j > 1 and typed_character == word[j - 2] and typed[i - 2] == word_character:
+                distance = min(distance, before_row[j - 2] + 1)
+            row.append(distance)
+        before_row, previous_row = previous_row, row
+    return min(previous_row[len(typed) - 1:] or previous_row[-1:])
+
+
+class _TrieNode:
+    __slots__ = ("children", "item_ids")
+
+    def __init__(self):
+        self.children = {}
+        self.item_ids = set()
+
+
+class AutocompleteIndex:
+    """
+    Completes names from a prefix trie over the words of every name, so each
+    keystroke only walks as many nodes as the query has characters. Words that
+    don't start any name are matched to the words at most one or two typos
+    away ("javscript", "pyhton") through the deletion neighbourhoods of all
+    words, so finding them takes dictionary lookups rather than comparing the
+    query with every word.
+    """
+
+    def __init__(self, items, signature=None):
+        """
+        Builds the index
+
+        :param items: iterable of AutocompleteItems
+        :param signature: signature of the corpus the items were read from
+        """
+        self.signature = signature
+        self.items = list(items)
+        self._match_cache = BoundedLRUCache(MATCH_CACHE_SIZE)
+        self._trie = _TrieNode()
+        self._word_items = {}
+        self._max_word_length = 0
+        for item_id, item in enumerate(self.items):
+            for word in set(words(item.name) + words(item.key)):
+                self._word_items.setdefault(word, set()).add(item_id)
+                self._max_word_length = max(self._max_word_length, len(word))
+                node = self._trie
+                for character in word:
+                    node = node.children.setdefault(character, _TrieNode())
+                    node.item_ids.add(item_id)
+        # position of each item among results of the same score
+        self._ranks = [0] * len(self.items)
+        ranked = sorted(
+            range(len(self.items)),
+            key=lambda item_id: (
+                KIND_ORDER[self.items[item_id].kind], len(self.items[item_id].name),
+                self.items[item_id].name
+            )
+        )
+        for rank, item_id in enumerate(ranked):
+            self._ranks[item_id] = rank
+        # deletion neighbourhood of every word and of the starts of every word
+        # (with one typo) -> the words; two words within a few typos of each
+        # other share a variant
+        self._variant_words = {}
+        for word in self._word_items:
+            for variant in deletions(word, max_edits(word)):
+                self._variant_words.setdefault(variant, set()).add(word)
+            for length in range(FUZZY_MIN_LENGTH, len(word)):
+                for variant in deletions(word[:length], 1):
+                    self._variant_words.setdefault(variant, set()).add(word)
+
+    @classmethod
+    def build(cls, catalog, concept_index):
+        """
+        Builds the index of all entries, structures and concepts
+
+        :param catalog: Catalog with the versions of the entries
+        :param concept_index: ConceptIndex whose structures and concepts are
+            completed; its signature becomes the index's signature
+        :rtype: AutocompleteIndex
+        """
+        meta_info = load_meta_info()
+        items = [
+            AutocompleteItem("entry", entry_key, name, None,
+                             tuple(catalog.entry_versions.get(entry_key, ())))
+            for entry_key, name in meta_info["languages"].items()
+        ]
+        structure_names = {}
+        for structures in meta_info["structures"].values():
+            structure_names.update(structures)
+        items += [
+            AutocompleteItem("structure", structure_key, name, None, None)
+            for structure_key, name in structure_names.items()
+        ]
+        structure_keys = sorted({structure_key for structure_key, _ in concept_index.postings})
+        for structure_key in structure_keys:
+            try:
+                categories = load_meta_structure(structure_key)["categories"]
+            except FileNotFoundError:
+                continue
+            items += [
+                AutocompleteItem("concept", concept_key, name, structure_key, None)
+                for category in categories.values()
+                for concept_key, name in category.items()
+            ]
+        return cls(items, concept_index.signature)
+
+    def _word_matches(self, word):
+        """
+        Returns the items a query word matches and how well
+
+        :param word: lowercase query word
+        :return: dict of item id -> score, shared with the cache so it must not
+            be modified
+        :rtype: dict
+        """
+        matches = self._match_cache.get(word)
+        if matches is not None:
+            return matches
+        matches = {}
+        node = self._trie
+        for character in word:
+            node = node.children.get(character)
+            if node is None:
+                break
+        else:
+            matches = dict.fromkeys(node.item_ids, PREFIX_MATCH_SCORE)
+            for item_id in self._word_items.get(word, ()):
+                matches[item_id] = EXACT_MATCH_SCORE
+
+        allowed_edits = max_edits(word)
+        if FUZZY_MIN_LENGTH <= len(word) <= min(FUZZY_MAX_LENGTH, self._max_word_length + allowed_edits) \
+                and word not in self._word_items:
+            candidates = set()
+            for variant in deletions(word, allowed_edits):
+                candidates.update(self._variant_words.get(variant, ()))
+            for candidate in candidates:
+                if candidate.startswith(word):
+                    continue
+                distance = typo_distance(word, candidate)
+                if distance > allowed_edits:
+                    continue
+                score = FUZZY_MATCH_SCORE * (1 - distance / (allowed_edits + 1))
+                for item_id in self._word_items[candidate]:
+                    if matches.get(item_id, 0) < score:
+                        matches[item_id] = score
+        self._match_cache.set(word, matches, len(matches) + 1)
+        return matches
+
+    def complete(self, query, limit=10, kind=None):
+        """
+        Returns the items best matching what has been typed so far. Every word
+        of the query has to match a word of the item's name or key.
+
+        :param query: the query text
+        :param limit: maximum number of results
+        :param kind: only return items of this kind ("entry", "structure" or
+            "concept")
+        :return: list of (score, AutocompleteItem) tuples, best first
+        :rtype: list
+        """
+        scores = None
+        for word in dict.fromkeys(words(query)):
+            matches = self._word_matches(word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    item_id: score + matches[item_id]
+                    for item_id, score in scores.items() if item_id in matches
+                }
+            if not scores:
+                return []
+        if scores is None:
+            return []
+
+        items = self.items
+        ranks = self._ranks
+        best = heapq.nsmallest(
+            limit,
+            (item_id for item_id in scores if kind is None or items[item_id].kind == kind),
+            key=lambda item_id: (-scores[item_id], ranks[item_id])
+        )
+        return [(scores[item_id], items[item_id]) for item_id in best]
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_autocomplete_index():
+    """
+    Returns the autocomplete index, building it on first use and rebuilding it
+    whenever the concept index changes
+
+    :rtype: AutocompleteIndex
+    """
+    global _index
+    concept_index = get_concept_index()
+    index = _index
+    if index is not None and index.signature == concept_index.signature:
+        return index
+    with _index_lock:
+        if _index is None or _index.signature != concept_index.signature:
+            _index = AutocompleteIndex.build(get_catalog(), concept_index)
+        return _index
+
+
+def reset_autocomplete_index():
+    """Forgets the index so the next `get_autocomplete_index` builds it again"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,151 @@
+"""
+Manifests of the artifacts built ahead of time (pre-rendered pages, API
+payloads), recording the hashes of the inputs each artifact was built from so
+a build only regenerates the artifacts whose inputs changed
+"""
+import hashlib
+import os
+from collections import namedtuple
+
+from django.template.loader import get_template
+
+from web.caching import BoundedLRUCache
+
+
+# Reasons an artifact is rebuilt besides changed inputs
+NOT_BUILT = "not built before"
+OUTPUT_MISSING = "output missing"
+FORCED = "forced"
+
+
+class RebuildPlan(namedtuple("RebuildPlan", ["unchanged", "rebuild", "removed"])):
+    """
+    What a build has to do: the names of the artifacts that are up to date,
+    a dict of name -> reasons for the artifacts to (re)build and the names of
+    previously built artifacts that aren't wanted anymore
+    """
+    __slots__ = ()
+
+    def report(self, describe=str):
+        """
+        Returns the lines of a report of the plan, for dry runs
+
+        :param describe: function returning the display name of an artifact
+        :rtype: list
+        """
+        lines = [f"rebuild {describe(name)}: {', '.join(reasons)}"
+                 for name, reasons in sorted(self.rebuild.items())]
+        lines += [f"remove {describe(name)}" for name in sorted(self.removed)]
+        return lines
+
+
+def manifest_entry(fingerprint, inputs):
+    """
+    Returns the manifest entry of a built artifact
+
+    :param fingerprint: hash the artifact is served against
+    :param inputs: dict of input name -> hash the artifact was built from
+    :rtype: dict
+    """
+    return {"fingerprint": fingerprint, "inputs": inputs}
+
+
+def manifest_fingerprint(manifest, name):
+    """
+    Returns the fingerprint an artifact was built with
+
+    :param manifest: the manifest
+    :param name: name of the artifact
+    :return: the fingerprint, or None if the manifest has no entry for it
+    :rtype: str
+    """
+    entry = manifest.get(name)
+    # manifests of older builds map names to bare hashes
+    if not isinstance(entry, dict):
+        return None
+    return entry.get("fingerprint")
+
+
+def inputs_fingerprint(inputs):
+    """
+    Returns a hash over the names and hashes of an artifact's inputs
+
+    :param inputs: dict of input name -> hash
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    for name, input_hash in sorted(inputs.items()):
+        digest.update(f"{name}\0{input_hash}\n".encode('UTF-8'))
+    return digest.hexdigest()
+
+
+def changed_inputs(previous_inputs, inputs):
+    """
+    Returns the names of the inputs that were added, removed or changed
+
+    :param previous_inputs: dict of input name -> hash of the last build
+    :param inputs: dict of input name -> current hash
+    :rtype: list
+    """
+    return sorted(
+        name for name in set(previous_inputs) | set(inputs)
+        if previous_inputs.get(name) != inputs.get(name)
+    )
+
+
+def plan_rebuild(manifest, artifacts, is_built, force=False):
+    """
+    Compares the wanted artifacts with the manifest of the last build
+
+    :param manifest: manifest of the last build
+    :param artifacts: dict of the name of every wanted artifact -> dict of its
+        input name -> current hash
+    :param is_built: function returning True if an artifact's output exists
+    :param force: True to rebuild every artifact
+    :rtype: RebuildPlan
+    """
+    unchanged = []
+    rebuild = {}
+    for name, inputs in artifacts.items():
+        entry = manifest.get(name)
+        if force:
+            rebuild[name] = [FORCED]
+        elif not isinstance(entry, dict):
+            rebuild[name] = [NOT_BUILT]
+        elif not is_built(name):
+            rebuild[name] = [OUTPUT_MISSING]
+        else:
+            changes = changed_inputs(entry.get("inputs", {}), inputs)
+            if changes:
+                rebuild[name] = [f"{change} changed" for change in changes]
+            else:
+                unchanged.append(name)
+    removed = [name for name in manifest if name not in artifacts]
+    return RebuildPlan(unchanged, rebuild, removed)
+
+
+# Bounded by the number of templates (each counts as 1)
+_template_hash_cache = BoundedLRUCache(1000)
+
+
+def template_hashes(template_names):
+    """
+    Returns the content hashes of templates. A template is only hashed again
+    when its mtime or size changed.
+
+    :param template_names: names of the templates, as given to `render`
+    :return: dict of "templates/<name>" -> SHA-256 hex digest
+    :rtype: dict
+    """
+    hashes = {}
+    for template_name in template_names:
+        path = get_template(template_name).origin.name
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _template_hash_cache.get(path, is_valid=lambda value, sig=signature: value[0] == sig)
+        if cached is None:
+            with open(path, 'rb') as file:
+                cached = (signature, hashlib.sha256(file.read()).hexdigest())
+            _template_hash_cache.set(path, cached, 1)
+        hashes[f"templates/{template_name}"] = cached[1]
+    return hashes
@@ -0,0 +1,191 @@
+"""In-process caches of codethesaur.us"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import connection
+
+
+class BoundedLRUCache:
+    """
+    Thread-safe least-recently-used cache that is bounded by the total size of
+    its values rather than by the number of entries
+    """
+
+    def __init__(self, max_size):
+        """
+        Initializes an empty cache
+
+        :param max_size: maximum total size of all values; the least recently
+            used values are evicted to stay below it
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, is_valid=None):
+        """
+        Returns the cached value for `key` and marks it as recently used
+
+        :param key: key of the value
+        :param is_valid: optional callable that gets the cached value and returns
+            False if it is stale; stale values are dropped and count as a miss
+        :return: the cached value, or None if it isn't cached (or stale)
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            value, size = cached
+            if is_valid is not None and not is_valid(value):
+                del self._entries[key]
+                self._size -= size
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size):
+        """
+        Caches `value` under `key`, evicting least recently used values if the
+        cache grows beyond `max_size`. Values larger than `max_size` aren't cached.
+
+        :param key: key of the value
+        :param value: value to cache
+        :param size: size the value counts with against `max_size`
+        """
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Removes all values and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the counters of the cache
+
+        :return: dict with hits, misses, evictions, invalidations, the number of
+            entries and their total size
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+            }
+
+
+class RefreshingValue:
+    """
+    A single computed value that is served for `max_age` seconds and then
+    refreshed in a background thread while the stale value keeps being served.
+    Only one computation runs at a time: concurrent requests for a missing
+    value wait for the one computation, and a stale value triggers at most one
+    background refresh.
+    """
+
+    def __init__(self, compute, max_age):
+        """
+        Initializes the value; it is computed on first use
+
+        :param compute: callable without arguments that returns the value
+        :param max_age: seconds a computed value is fresh; 0 or less computes
+            it on every `get`
+        """
+        self.compute = compute
+        self.max_age = max_age
+        self._value = None
+        self._computed_at = None
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._refreshing = False
+        self.hits = 0
+        self.stale_hits = 0
+        self.computations = 0
+
+    def get(self):
+        """
+        Returns the value, computing it if there is none yet
+
+        :return: the fresh or, while it is refreshed, the stale value
+        """
+        if self.max_age <= 0:
+            return self.compute()
+        with self._lock:
+            if self._computed_at is not None:
+                if time.monotonic() - self._computed_at < self.max_age:
+                    self.hits += 1
+                    return self._value
+                self.stale_hits += 1
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_in_background, name="refreshing-value", daemon=True
+                    ).start()
+                return self._value
+        with self._compute_lock:
+            # another request may have computed it while this one waited
+            with self._lock:
+                if self._computed_at is not None:
+                    self.hits += 1
+                    return self._value
+            return self._refresh()
+
+    def invalidate(self):
+        """Drops the value so the next `get` computes it again"""
+        with self._lock:
+            self._value = None
+            self._computed_at = None
+
+    def _refresh(self):
+        value = self.compute()
+        with self._lock:
+            self._value = value
+            self._computed_at = time.monotonic()
+            self.computations += 1
+        return value
+
+    def _refresh_in_background(self):
+        try:
+            with self._compute_lock:
+                self._refresh()
+        except Exception as e:
+            logging.error(f"Failed to refresh cached value: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+            connection.close()
@@ -0,0 +1,188 @@
+"""Inverted index from each concept to the entries that define it"""
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from web.corpus import (
+    META_DIR_NAME,
+    META_INFO_FILE_NAME,
+    file_fingerprint,
+    get_catalog,
+    get_snapshot,
+    load_entry_document,
+    load_meta_structure,
+)
+
+
+class ConceptPosting(namedtuple("ConceptPosting", ["entry_key", "version", "implemented", "concept"])):
+    """
+    One entry version's take on a concept. `concept` is the concept of the
+    entry file (shared with the loaded file, so it must not be modified), or
+    None if the file doesn't mention the concept.
+    """
+    __slots__ = ()
+
+    @property
+    def known(self):
+        """True if the entry file mentions the concept"""
+        return self.concept is not None
+
+    @property
+    def code(self):
+        """The code of an implemented concept as a string, else an empty string"""
+        code = self.concept.get("code", "") if self.implemented else ""
+        if isinstance(code, list):
+            code = "\n".join(code)
+        return code or ""
+
+    @property
+    def comment(self):
+        """The comment of the concept as a string"""
+        comment = self.concept.get("comment", "") if isinstance(self.concept, dict) else ""
+        if isinstance(comment, list):
+            comment = "\n".join(comment)
+        return comment or ""
+
+
+def corpus_signature(catalog):
+    """
+    Returns a hash over all thesaurus files of the catalog, from the snapshot
+    if there is one
+
+    :param catalog: Catalog of the thesauruses directory
+    :rtype: str
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.content_hash
+    relative_paths = [META_INFO_FILE_NAME]
+    relative_paths += [
+        os.path.join(META_DIR_NAME, f"{structure_key}.json")
+        for structure_key in catalog.availability.columns
+    ]
+    for entry_key, versions in sorted(catalog.entry_versions.items()):
+        for version in versions:
+            for structure_key in catalog.availability.structures(entry_key, version):
+                relative_paths.append(os.path.join(
+                    catalog.category(entry_key), entry_key, version, f"{structure_key}.json"))
+    digest = hashlib.sha256()
+    for relative_path in relative_paths:
+        try:
+            file_hash, _ = file_fingerprint(relative_path)
+        except FileNotFoundError:
+            file_hash = ""
+        digest.update(f"{relative_path}\0{file_hash}\n".encode('UTF-8'))
+    return digest.hexdigest()
+
+
+class ConceptIndex:
+    """
+    Maps (structure key, concept key) to a ConceptPosting for every entry
+    version that has the structure, so a concept can be shown across all
+    entries without loading their files
+    """
+
+    def __init__(self, postings, signature=None):
+        """
+        Initializes the index
+
+        :param postings: dict of (structure key, concept key) -> tuple of
+            ConceptPostings, sorted by entry and version
+        :param signature: `corpus_signature` of the files the index was built from
+        """
+        self.postings = postings
+        self.signature = signature
+
+    @classmethod
+    def build(cls, catalog, signature=None):
+        """
+        Builds the index by reading every entry file once
+
+        :param catalog: Catalog of the thesauruses directory
+        :param signature: `corpus_signature` of the files
+        :rtype: ConceptIndex
+        """
+        concept_keys = {}
+        for structure_key in catalog.availability.columns:
+            try:
+                categories = load_meta_structure(structure_key)["categories"]
+            except FileNotFoundError:
+                continue
+            concept_keys[structure_key] = [
+                concept_key for category in categories.values() for concept_key in category
+            ]
+
+        postings = {}
+        for entry_key in sorted(catalog.entry_versions):
+            language_dir = catalog.entry_dir(entry_key)
+            for version in catalog.entry_versions[entry_key]:
+                for structure_key in catalog.availability.structures(entry_key, version):
+                    concepts = load_entry_document(
+                        entry_key, version, structure_key, language_dir).get("concepts", {})
+                    for concept_key in concept_keys.get(structure_key, []):
+                        concept = concepts.get(concept_key)
+                        implemented = isinstance(concept, dict) and \
+                            not concept.get("not-implemented", False)
+                        postings.setdefault((structure_key, concept_key), []).append(
+                            ConceptPosting(entry_key, version, implemented, concept))
+        return cls(
+            {key: tuple(concept_postings) for key, concept_postings in postings.items()},
+            signature
+        )
+
+    def lookup(self, structure_key, concept_key):
+        """
+        Returns every entry version's take on a concept
+
+        :param structure_key: key of the structure
+        :param concept_key: key of the concept
+        :return: tuple of ConceptPostings, empty for unknown concepts
+        :rtype: tuple
+        """
+        return self.postings.get((structure_key, concept_key), ())
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_checked_at = 0.0
+
+
+def get_concept_index():
+    """
+    Returns the concept index, which `WebConfig.ready` builds when the corpus
+    is loaded. With a snapshot it is built once per snapshot. Otherwise the
+    files are re-checked for changes at most every
+    `settings.THESAURUS_CATALOG_RECHECK_SECONDS` and the index is rebuilt if
+    any changed.
+
+    :rtype: ConceptIndex
+    """
+    global _index, _index_checked_at
+    recheck_seconds = getattr(settings, "THESAURUS_CATALOG_RECHECK_SECONDS", 5)
+    now = time.monotonic()
+    index = _index
+    snapshot = get_snapshot()
+    if index is not None:
+        if snapshot is not None and index.signature == snapshot.content_hash:
+            return index
+        if snapshot is None and now - _index_checked_at < recheck_seconds:
+            return index
+
+    with _index_lock:
+        catalog = get_catalog()
+        signature = corpus_signature(catalog)
+        if _index is None or _index.signature != signature:
+            _index = ConceptIndex.build(catalog, signature)
+        _index_checked_at = now
+        return _index
+
+
+def reset_concept_index():
+    """Forgets the index so the next `get_concept_index` builds it again"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,91 @@
+"""Conditional GET (ETag and Last-Modified) for responses built from thesaurus files"""
+import datetime
+import functools
+import hashlib
+from http import HTTPStatus
+
+import pygments
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from web.build_manifest import template_hashes
+from web.corpus import structure_fingerprint
+
+
+def thesaurus_fingerprint(structure_key, entry_keys_versions, variant, templates=()):
+    """
+    Returns the ETag and Last-Modified of a response built from thesaurus
+    files: a hash of the files, `variant`, the templates, the Pygments
+    version and `settings.ETAG_SALT`, and the latest mtime of the files
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :param variant: string of anything else the response depends on
+    :param templates: names of the templates the response is rendered from
+    :return: tuple of the unquoted ETag and an aware datetime, or None if the
+        catalog doesn't know an entry's file
+    :rtype: tuple
+    """
+    try:
+        files_hash, last_modified = structure_fingerprint(structure_key, entry_keys_versions)
+    except FileNotFoundError:
+        return None
+    parts = [files_hash, variant, pygments.__version__, getattr(settings, "ETAG_SALT", "")]
+    parts += [f"{name}={template_hash}" for name, template_hash in sorted(template_hashes(templates).items())]
+    etag = hashlib.sha256("\0".join(parts).encode('UTF-8')).hexdigest()
+    return etag, datetime.datetime.fromtimestamp(int(last_modified), tz=datetime.timezone.utc)
+
+
+def thesaurus_condition(resolve, templates=(), not_modified=None):
+    """
+    Decorator adding strong ETags and Last-Modified headers to a view whose
+    response only depends on thesaurus files (and templates), and answering
+    matching `If-None-Match`/`If-Modified-Since` requests with 304 before the
+    view runs
+
+    :param resolve: callable that gets the view's arguments and returns a tuple
+        of the structure key, the list of (entry key, version) tuples and a
+        string of anything else the response depends on, or None if the
+        request can't be answered from the files (e.g. invalid parameters)
+    :param templates: names of the templates the view renders
+    :param not_modified: optional callable that gets the request, the
+        structure key and the list of (entry key, version) tuples when a 304
+        is sent instead of running the view, e.g. to store the visit the
+        view would have stored
+    :return: the decorator
+    """
+
+    def fingerprint(request, *args, **kwargs):
+        # computed once per request for both headers
+        if not hasattr(request, "_thesaurus_fingerprint"):
+            request._thesaurus_fingerprint = None
+            request._thesaurus_resolved = resolve(request, *args, **kwargs)
+            if request._thesaurus_resolved is not None:
+                request._thesaurus_fingerprint = thesaurus_fingerprint(
+                    *request._thesaurus_resolved, templates=templates)
+        return request._thesaurus_fingerprint
+
+    def etag(request, *args, **kwargs):
+        result = fingerprint(request, *args, **kwargs)
+        return result[0] if result else None
+
+    def last_modified(request, *args, **kwargs):
+        result = fingerprint(request, *args, **kwargs)
+        return result[1] if result else None
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(view):
+        conditional_view = conditional(view)
+
+        @functools.wraps(view)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if not_modified is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+                structure_key, entry_keys_versions, _ = request._thesaurus_resolved
+                not_modified(request, structure_key, entry_keys_versions)
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,710 @@
+"""Compiled snapshot of the thesaurus files of codethesaur.us"""
+import errno
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from web.caching import BoundedLRUCache
+
+
+THESAURUSES_DIR = os.path.join("web", "thesauruses")
+META_DIR_NAME = "_meta"
+META_INFO_FILE_NAME = "meta_info.json"
+
+# Bump whenever the layout of the pickled payload changes, so old snapshots
+# are ignored instead of being misread
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+class CorpusSnapshot:
+    """
+    Holds the parsed contents of `meta_info.json`, every `_meta` structure
+    file and every entry file, so none of them have to be read at request time
+    """
+
+    def __init__(self, meta_info, meta_structures, entry_categories, documents, content_hash,
+                 fingerprints=None):
+        """
+        Initializes the snapshot
+
+        :param meta_info: parsed `meta_info.json`
+        :param meta_structures: dict of structure key -> parsed `_meta` file
+        :param entry_categories: dict of entry key -> category directory
+        :param documents: dict of (entry key, version, structure key) -> parsed
+            entry file
+        :param content_hash: hash over the contents of all files in the snapshot
+        :param fingerprints: dict of path relative to the thesauruses
+            directory -> (SHA-256 of the file, mtime of the file)
+        """
+        self.meta_info = meta_info
+        self.meta_structures = meta_structures
+        self.entry_categories = entry_categories
+        self.documents = documents
+        self.content_hash = content_hash
+        self.fingerprints = fingerprints or {}
+
+    @classmethod
+    def compile(cls, root=THESAURUSES_DIR):
+        """
+        Reads every thesaurus file below `root` into a new snapshot
+
+        :param root: path of the thesauruses directory
+        :return: the compiled snapshot
+        :rtype: CorpusSnapshot
+        """
+        fingerprints = {}
+
+        def read(path):
+            with open(path, 'rb') as file:
+                raw = file.read()
+                mtime = os.fstat(file.fileno()).st_mtime
+            fingerprints[os.path.relpath(path, root)] = (hashlib.sha256(raw).hexdigest(), mtime)
+            return json.loads(raw.decode('UTF-8'))
+
+        meta_info = read(os.path.join(root, META_INFO_FILE_NAME))
+
+        meta_structures = {}
+        meta_dir = os.path.join(root, META_DIR_NAME)
+        for file_name in sorted(os.listdir(meta_dir)):
+            if file_name.endswith(".json"):
+                meta_structures[file_name[:-5]] = read(os.path.join(meta_dir, file_name))
+
+        entry_categories = {}
+        documents = {}
+        for category in sorted(os.listdir(root)):
+            category_dir = os.path.join(root, category)
+            if category == META_DIR_NAME or not os.path.isdir(category_dir):
+                continue
+            for entry_key in sorted(os.listdir(category_dir)):
+                entry_dir = os.path.join(category_dir, entry_key)
+                if not os.path.isdir(entry_dir):
+                    continue
+                entry_categories.setdefault(entry_key, category)
+                for version in sorted(os.listdir(entry_dir)):
+                    version_dir = os.path.join(entry_dir, version)
+                    if not os.path.isdir(version_dir):
+                        continue
+                    for file_name in sorted(os.listdir(version_dir)):
+                        if not file_name.endswith(".json"):
+                            continue
+                        documents[(entry_key, version, file_name[:-5])] = read(
+                            os.path.join(version_dir, file_name))
+
+        content_hash = hashlib.sha256()
+        for relative_path, (file_hash, _) in sorted(fingerprints.items()):
+            content_hash.update(f"{relative_path}\0{file_hash}\n".encode('UTF-8'))
+
+        return cls(
+            meta_info, meta_structures, entry_categories, documents, content_hash.hexdigest(),
+            fingerprints
+        )
+
+    def dump(self, path):
+        """
+        Writes the snapshot to `path`, replacing any previous snapshot atomically
+
+        :param path: file path to write to
+        """
+        payload = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "content_hash": self.content_hash,
+            "meta_info": self.meta_info,
+            "meta_structures": self.meta_structures,
+            "entry_categories": self.entry_categories,
+            "documents": self.documents,
+            "fingerprints": self.fingerprints,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as file:
+            pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a snapshot written by `dump`
+
+        :param path: file path of the snapshot
+        :return: the snapshot, or None if it was written in another format version
+        :rtype: CorpusSnapshot
+        """
+        with open(path, 'rb') as file:
+            payload = pickle.load(file)
+        if payload.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            logging.warning(
+                f"Ignoring thesaurus snapshot {path}: format version "
+                f"{payload.get('format_version')} != {SNAPSHOT_FORMAT_VERSION}"
+            )
+            return None
+        return cls(
+            payload["meta_info"],
+            payload["meta_structures"],
+            payload["entry_categories"],
+            payload["documents"],
+            payload["content_hash"],
+            payload["fingerprints"],
+        )
+
+    def stale_files(self, root=THESAURUSES_DIR):
+        """
+        Returns the files below `root` that were added, removed or changed
+        since the snapshot was compiled. Only files whose mtime differs from
+        the snapshot's are hashed again.
+
+        :param root: path of the thesauruses directory
+        :return: sorted paths relative to `root`
+        :rtype: list
+        """
+        stale = set(self.fingerprints).symmetric_difference(thesaurus_file_paths(root))
+        for relative_path, (file_hash, mtime) in self.fingerprints.items():
+            if relative_path in stale:
+                continue
+            path = os.path.join(root, relative_path)
+            if os.stat(path).st_mtime == mtime:
+                continue
+            with open(path, 'rb') as file:
+                if hashlib.sha256(file.read()).hexdigest() != file_hash:
+                    stale.add(relative_path)
+        return sorted(stale)
+
+    def meta_structure(self, structure_key):
+        """
+        Returns the parsed `_meta` file of a structure
+
+        :param structure_key: key of the structure
+        :return: the parsed meta structure file
+        :raises FileNotFoundError: if the structure isn't in the snapshot
+        """
+        try:
+            return self.meta_structures[structure_key]
+        except KeyError as key_error:
+            raise FileNotFoundError(
+                errno.ENOENT, "Structure not in snapshot", structure_key) from key_error
+
+    def entry_document(self, entry_key, version, structure_key):
+        """
+        Returns the parsed entry file of a structure for an entry's version
+
+        :param entry_key: key of the entry
+        :param version: version of the entry
+        :param structure_key: key of the structure
+        :return: the parsed entry file
+        :raises FileNotFoundError: if the file isn't in the snapshot
+        """
+        try:
+            return self.documents[(entry_key, version, structure_key)]
+        except KeyError as key_error:
+            raise FileNotFoundError(
+                errno.ENOENT,
+                "Entry file not in snapshot",
+                f"{entry_key}/{version}/{structure_key}.json"
+            ) from key_error
+
+
+def thesaurus_file_paths(root=THESAURUSES_DIR):
+    """
+    Returns the files a snapshot is compiled from: `meta_info.json`, the
+    `_meta` structure files and the entry files
+
+    :param root: path of the thesauruses directory
+    :return: set of paths relative to `root`
+    :rtype: set
+    """
+    paths = set()
+    for directory, _, file_names in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        depth = 0 if relative_dir == os.curdir else len(relative_dir.split(os.sep))
+        is_meta_dir = relative_dir.split(os.sep)[0] == META_DIR_NAME
+        for file_name in file_names:
+            if (depth == 0 and file_name == META_INFO_FILE_NAME) or (
+                    file_name.endswith(".json") and depth == (1 if is_meta_dir else 3)):
+                paths.add(os.path.normpath(os.path.join(relative_dir, file_name)))
+    return paths
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = None
+_snapshot_loaded = False
+
+
+def get_snapshot():
+    """
+    Returns the snapshot at `settings.THESAURUS_SNAPSHOT_PATH`, loading it on
+    the first call. Returns None if there is no (usable) snapshot or the
+    thesaurus files changed since it was compiled, in which case callers read
+    the loose JSON files instead.
+
+    :rtype: CorpusSnapshot
+    """
+    global _snapshot, _snapshot_loaded
+    if _snapshot_loaded:
+        return _snapshot
+    with _snapshot_lock:
+        if not _snapshot_loaded:
+            path = getattr(settings, "THESAURUS_SNAPSHOT_PATH", None)
+            if path and os.path.isfile(path):
+                try:
+                    _snapshot = CorpusSnapshot.load(path)
+                    stale_files = _snapshot.stale_files() if _snapshot is not None else []
+                except (OSError, pickle.UnpicklingError, EOFError, KeyError) as error:
+                    logging.error(f"Failed to load thesaurus snapshot {path}: {error}")
+                    _snapshot = None
+                    stale_files = []
+                if stale_files:
+                    logging.warning(
+                        f"Ignoring thesaurus snapshot {path}: {len(stale_files)} files changed "
+                        f"since it was compiled (e.g. {stale_files[0]}); "
+                        f"run `python manage.py compile_snapshot`"
+                    )
+                    _snapshot = None
+            _snapshot_loaded = True
+    return _snapshot
+
+
+def reset_snapshot():
+    """
+    Forgets the loaded snapshot (and the catalog built from it) so the next
+    `get_snapshot` reads it again
+    """
+    global _snapshot, _snapshot_loaded
+    with _snapshot_lock:
+        _snapshot = None
+        _snapshot_loaded = False
+    reset_catalog()
+
+
+class DocumentCache:
+    """
+    Caches parsed thesaurus JSON files. Every lookup does a single `stat` of
+    the file and re-reads it when its mtime or size changed, so content updates
+    are picked up without restarting. The memory bound is measured in bytes of
+    the source files.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initializes an empty cache
+
+        :param max_bytes: maximum total size of the cached source files
+        """
+        self._lru = BoundedLRUCache(max_bytes)
+
+    def load(self, key, path):
+        """
+        Returns the parsed JSON file at `path`
+
+        :param key: cache key of the file, e.g. (entry key, version, structure key)
+        :param path: path of the JSON file
+        :return: the parsed file; callers must not modify it
+        :raises FileNotFoundError: if the file doesn't exist
+        """
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._lru.get(key, is_valid=lambda value: value[0] == signature)
+        if cached is not None:
+            return cached[1]
+
+        with open(path, 'r', encoding='UTF-8') as file:
+            document = json.load(file)
+        self._lru.set(key, (signature, document), stat.st_size)
+        return document
+
+    def clear(self):
+        """Removes all cached files and resets the counters"""
+        self._lru.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss/eviction counters of the cache
+
+        :rtype: dict
+        """
+        return self._lru.stats()
+
+
+document_cache = DocumentCache(getattr(settings, "THESAURUS_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+
+def load_meta_info():
+    """
+    Returns the parsed `meta_info.json`, from the snapshot if there is one
+
+    :rtype: dict
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.meta_info
+    return document_cache.load(
+        (META_INFO_FILE_NAME,),
+        os.path.join(THESAURUSES_DIR, META_INFO_FILE_NAME)
+    )
+
+
+def load_meta_structure(structure_key):
+    """
+    Returns the parsed `_meta` file of a structure, from the snapshot if there
+    is one
+
+    :param structure_key: key of the structure
+    :rtype: dict
+    :raises FileNotFoundError: if the structure file doesn't exist
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.meta_structure(structure_key)
+    return document_cache.load(
+        (META_DIR_NAME, structure_key),
+        os.path.join(THESAURUSES_DIR, META_DIR_NAME, f"{structure_key}.json")
+    )
+
+
+def load_entry_document(entry_key, version, structure_key, language_dir):
+    """
+    Returns the parsed entry file of a structure for an entry's version, from
+    the snapshot if there is one
+
+    :param entry_key: key of the entry
+    :param version: version of the entry
+    :param structure_key: key of the structure
+    :param language_dir: directory of the entry, used without a snapshot
+    :rtype: dict
+    :raises FileNotFoundError: if the entry file doesn't exist
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.entry_document(entry_key, version, structure_key)
+    return document_cache.load(
+        (entry_key, version, structure_key),
+        os.path.join(language_dir, version, f"{structure_key}.json")
+    )
+
+
+# Bounded by the number of files (each counts as 1)
+_fingerprint_cache = BoundedLRUCache(100000)
+
+
+def file_fingerprint(relative_path):
+    """
+    Returns the content hash and modification time of a thesaurus file, from
+    the snapshot if there is one. Without a snapshot the file is only hashed
+    again when its mtime or size changed.
+
+    :param relative_path: path of the file below the thesauruses directory
+    :return: tuple of the file's SHA-256 hex digest and its mtime in seconds
+    :rtype: tuple
+    :raises FileNotFoundError: if the file doesn't exist
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        try:
+            return snapshot.fingerprints[relative_path]
+        except KeyError as key_error:
+            raise FileNotFoundError(
+                errno.ENOENT, "File not in snapshot", relative_path) from key_error
+
+    path = os.path.join(THESAURUSES_DIR, relative_path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _fingerprint_cache.get(relative_path, is_valid=lambda value: value[0] == signature)
+    if cached is not None:
+        return cached[1]
+
+    with open(path, 'rb') as file:
+        fingerprint = (hashlib.sha256(file.read()).hexdigest(), stat.st_mtime)
+    _fingerprint_cache.set(relative_path, (signature, fingerprint), 1)
+    return fingerprint
+
+
+def structure_input_paths(structure_key, entry_keys_versions):
+    """
+    Returns the paths below the thesauruses directory of `meta_info.json`,
+    the `_meta` file of a structure and the structure's files of the given
+    entries
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :rtype: list
+    :raises FileNotFoundError: if an entry's version doesn't define the structure
+    """
+    catalog = get_catalog()
+    relative_paths = [META_INFO_FILE_NAME, os.path.join(META_DIR_NAME, f"{structure_key}.json")]
+    for entry_key, version in entry_keys_versions:
+        # only known files, so request parameters can't point anywhere else
+        if not catalog.availability.has(entry_key, version, structure_key):
+            raise FileNotFoundError(
+                errno.ENOENT, "No such entry file", f"{entry_key}/{version}/{structure_key}.json")
+        relative_paths.append(os.path.join(
+            catalog.category(entry_key), entry_key, version, f"{structure_key}.json"))
+    return relative_paths
+
+
+def structure_input_hashes(structure_key, entry_keys_versions):
+    """
+    Returns the content hash of each of the `structure_input_paths`
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: dict of path below the thesauruses directory -> SHA-256 hex digest
+    :rtype: dict
+    :raises FileNotFoundError: if an entry's version doesn't define the structure
+    """
+    return {
+        relative_path: file_fingerprint(relative_path)[0]
+        for relative_path in structure_input_paths(structure_key, entry_keys_versions)
+    }
+
+
+def structure_fingerprint(structure_key, entry_keys_versions):
+    """
+    Returns a hash over `meta_info.json`, the `_meta` file of a structure and
+    the structure's files of the given entries, and the latest of their mtimes
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: tuple of the SHA-256 hex digest and the latest mtime in seconds
+    :rtype: tuple
+    :raises FileNotFoundError: if an entry's version doesn't define the structure
+    """
+    digest = hashlib.sha256()
+    last_modified = 0
+    for relative_path in structure_input_paths(structure_key, entry_keys_versions):
+        file_hash, mtime = file_fingerprint(relative_path)
+        digest.update(f"{relative_path}\0{file_hash}\n".encode('UTF-8'))
+        last_modified = max(last_modified, mtime)
+    return digest.hexdigest(), last_modified
+
+
+class AvailabilityMatrix:
+    """
+    Bitmap of which (entry, version) defines which structure. Each row is an
+    int with one bit per structure column.
+    """
+
+    def __init__(self, structure_keys, available_structures):
+        """
+        Builds the matrix
+
+        :param structure_keys: keys of the structures, one column each
+        :param available_structures: dict of (entry key, version) -> iterable
+            of structure keys; keys without a column are ignored
+        """
+        self.columns = tuple(structure_keys)
+        self.column_bits = {key: 1 << index for index, key in enumerate(self.columns)}
+        self.rows = {}
+        self._decoded = {}
+        for row_key, structures in available_structures.items():
+            bits = 0
+            for structure_key in structures:
+                bits |= self.column_bits.get(structure_key, 0)
+            self.rows[row_key] = bits
+            self._decoded[row_key] = [
+                key for key in self.columns if bits & self.column_bits[key]
+            ]
+
+    def has(self, entry_key, version, structure_key):
+        """
+        Returns True if the entry's version defines the structure
+
+        :rtype: bool
+        """
+        return bool(self.rows.get((entry_key, version), 0) & self.column_bits.get(structure_key, 0))
+
+    def structures(self, entry_key, version):
+        """
+        Returns the keys of all structures the entry's version defines, in
+        column order
+
+        :rtype: list
+        """
+        return self._decoded.get((entry_key, version), [])
+
+
+class Catalog:
+    """
+    Layout of the thesauruses directory: which category each entry is in,
+    which versions each entry has and which structures each version of an
+    entry defines
+    """
+
+    def __init__(self, entry_categories, available_structures, structure_keys, signature=None):
+        """
+        Initializes the catalog
+
+        :param entry_categories: dict of entry key -> category directory
+        :param available_structures: dict of (entry key, version) -> frozenset
+            of structure keys
+        :param structure_keys: keys of the structures that have a `_meta` file
+        :param signature: mtimes of the scanned directories, used to detect
+            changes to the tree; None if the catalog can't go stale
+        """
+        self.entry_categories = entry_categories
+        self.available_structures = available_structures
+        self.signature = signature
+        self.entry_versions = {}
+        for (entry_key, version) in sorted(available_structures):
+            self.entry_versions.setdefault(entry_key, []).append(version)
+        self.availability = AvailabilityMatrix(structure_keys, available_structures)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Builds the catalog from the documents of a snapshot
+
+        :param snapshot: the CorpusSnapshot
+        :rtype: Catalog
+        """
+        available_structures = {}
+        for (entry_key, version, structure_key) in snapshot.documents:
+            available_structures.setdefault((entry_key, version), set()).add(structure_key)
+        return cls(
+            dict(snapshot.entry_categories),
+            {key: frozenset(value) for key, value in available_structures.items()},
+            sorted(snapshot.meta_structures),
+        )
+
+    @classmethod
+    def scan(cls, root=THESAURUSES_DIR):
+        """
+        Builds the catalog by walking the thesauruses directory
+
+        :param root: path of the thesauruses directory
+        :rtype: Catalog
+        """
+        entry_categories = {}
+        available_structures = {}
+        meta_dir = os.path.join(root, META_DIR_NAME)
+        signature = [(root, os.stat(root).st_mtime_ns), (meta_dir, os.stat(meta_dir).st_mtime_ns)]
+        structure_keys = sorted(
+            file_name[:-5] for file_name in os.listdir(meta_dir) if file_name.endswith(".json"))
+        for category in sorted(os.listdir(root)):
+            category_dir = os.path.join(root, category)
+            if category == META_DIR_NAME or not os.path.isdir(category_dir):
+                continue
+            signature.append((category_dir, os.stat(category_dir).st_mtime_ns))
+            with os.scandir(category_dir) as entry_dirs:
+                for entry_dir in sorted(entry_dirs, key=lambda dir_entry: dir_entry.name):
+                    if not entry_dir.is_dir():
+                        continue
+                    entry_categories.setdefault(entry_dir.name, category)
+                    signature.append((entry_dir.path, entry_dir.stat().st_mtime_ns))
+                    with os.scandir(entry_dir.path) as version_dirs:
+                        for version_dir in version_dirs:
+                            if not version_dir.is_dir():
+                                continue
+                            signature.append((version_dir.path, version_dir.stat().st_mtime_ns))
+                            available_structures[(entry_dir.name, version_dir.name)] = frozenset(
+                                file_name[:-5]
+                                for file_name in os.listdir(version_dir.path)
+                                if file_name.endswith(".json")
+                            )
+        return cls(entry_categories, available_structures, structure_keys, tuple(signature))
+
+    def is_stale(self):
+        """
+        Returns True if any scanned directory changed since the catalog was built
+
+        :rtype: bool
+        """
+        if self.signature is None:
+            return False
+        for path, mtime_ns in self.signature:
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def category(self, entry_key):
+        """
+        Returns the category directory an entry is in
+
+        :param entry_key: key of the entry
+        :return: the category, or None if the entry has no directory
+        """
+        return self.entry_categories.get(entry_key)
+
+    def entry_dir(self, entry_key):
+        """
+        Returns the directory of an entry
+
+        :param entry_key: key of the entry
+        :return: the path, or None if the entry has no directory
+        """
+        category = self.category(entry_key)
+        if category is None:
+            return None
+        return os.path.join(THESAURUSES_DIR, category, entry_key)
+
+    def versions(self, entry_key):
+        """
+        Returns the versions of an entry and their directories
+
+        :param entry_key: key of the entry
+        :return: dict of version -> path, sorted by version
+        :rtype: dict
+        """
+        entry_dir = self.entry_dir(entry_key)
+        return {
+            version: os.path.join(entry_dir, version)
+            for version in self.entry_versions.get(entry_key, [])
+        }
+
+    def structures(self, entry_key, version):
+        """
+        Returns the structures an entry's version defines
+
+        :param entry_key: key of the entry
+        :param version: version of the entry
+        :rtype: frozenset
+        """
+        return self.available_structures.get((entry_key, version), frozenset())
+
+
+_catalog_lock = threading.Lock()
+_catalog = None
+_catalog_checked_at = 0.0
+
+
+def get_catalog():
+    """
+    Returns the catalog of the thesauruses directory. With a snapshot it is
+    built from the snapshot once. Otherwise the directory is scanned once and
+    then re-checked for changes at most every
+    `settings.THESAURUS_CATALOG_RECHECK_SECONDS`, and rescanned only if
+    something was added, renamed or removed.
+
+    :rtype: Catalog
+    """
+    global _catalog, _catalog_checked_at
+    snapshot = get_snapshot()
+    recheck_seconds = getattr(settings, "THESAURUS_CATALOG_RECHECK_SECONDS", 5)
+    now = time.monotonic()
+    catalog = _catalog
+    if catalog is not None and (
+            catalog.signature is None or now - _catalog_checked_at < recheck_seconds):
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or (_catalog.signature is not None and _catalog.is_stale()):
+            if snapshot is not None:
+                _catalog = Catalog.from_snapshot(snapshot)
+            else:
+                _catalog = Catalog.scan()
+        _catalog_checked_at = now
+        return _catalog
+
+
+def reset_catalog():
+    """Forgets the catalog so the next `get_catalog` builds it again"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
@@ -0,0 +1,45 @@
+"""Streaming export of the whole thesaurus as newline-delimited JSON"""
+import json
+import logging
+
+from web.corpus import get_catalog
+from web.models import ThesaurusEntry, ThesaurusMetaInfo
+
+
+def iter_filled_documents(categories=None, entry_keys=None, structure_keys=None):
+    """
+    Yields the filled template of every (entry, version, structure) of the
+    thesaurus, one at a time, in the same form as the reference API returns it
+
+    :param categories: optional collection of categories ("langs",
+        "databases", ...) to export
+    :param entry_keys: optional collection of entries to export
+    :param structure_keys: optional collection of structures to export
+    :return: generator of dicts
+    """
+    meta_info = ThesaurusMetaInfo()
+    catalog = get_catalog()
+    for entry_key in sorted(catalog.entry_versions):
+        if entry_keys and entry_key not in entry_keys:
+            continue
+        if categories and catalog.category(entry_key) not in categories:
+            continue
+        entry = ThesaurusEntry(entry_key, meta_info.languages.get(entry_key, entry_key))
+        for version in catalog.entry_versions[entry_key]:
+            for structure_key in catalog.availability.structures(entry_key, version):
+                if structure_keys and structure_key not in structure_keys:
+                    continue
+                try:
+                    yield entry.filled_concepts(structure_key, version, meta_info)
+                except Exception as e:
+                    logging.error(f"Failed to export {entry_key} {version} {structure_key}: {e}")
+
+
+def iter_ndjson(categories=None, entry_keys=None, structure_keys=None):
+    """
+    Yields the documents of `iter_filled_documents` as lines of JSON
+
+    :return: generator of strings ending in a newline
+    """
+    for document in iter_filled_documents(categories, entry_keys, structure_keys):
+        yield json.dumps(document) + "\n"
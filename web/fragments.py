@@ -0,0 +1,118 @@
+"""Cache of the rendered categories of the compare and reference pages"""
+import hashlib
+from collections import namedtuple
+
+import pygments
+from django.conf import settings
+
+from web.caching import BoundedLRUCache
+from web.corpus import structure_fingerprint
+
+
+class CategoryFragment(namedtuple("CategoryFragment", ["cards", "is_incomplete", "missing_concepts"])):
+    """
+    One entry version's column of a category on the compare and reference
+    pages: the rendered concept card of each concept of the category (in the
+    order of the meta structure), whether the category is incomplete for the
+    entry and the keys of the concepts the entry doesn't implement
+    """
+    __slots__ = ()
+
+    @property
+    def size(self):
+        """Number of characters of the rendered cards"""
+        return sum(len(card) for card in self.cards)
+
+
+def rendering_fingerprint(structure_key, entry_keys_versions):
+    """
+    Returns a hash of everything the rendered HTML of entries' structure
+    depends on: the entries' files, the meta files, the Pygments version and
+    `settings.ETAG_SALT`, which changes when a deploy changes how pages are
+    rendered
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: the hash, or None if the catalog doesn't know an entry's file
+    :rtype: str
+    """
+    try:
+        files_hash, _ = structure_fingerprint(structure_key, entry_keys_versions)
+    except FileNotFoundError:
+        return None
+    return hashlib.sha256("\0".join([
+        files_hash,
+        pygments.__version__,
+        getattr(settings, "ETAG_SALT", ""),
+    ]).encode('UTF-8')).hexdigest()
+
+
+def entry_fingerprint(entry_key, version, structure_key):
+    """
+    Returns the `rendering_fingerprint` of one entry's structure
+
+    :param entry_key: key of the entry
+    :param version: version of the entry
+    :param structure_key: key of the structure
+    :return: the hash, or None if the catalog doesn't know the entry's file
+    :rtype: str
+    """
+    return rendering_fingerprint(structure_key, [(entry_key, version)])
+
+
+class FragmentCache:
+    """
+    In-process cache of CategoryFragments keyed by (entry fingerprint, entry,
+    version, structure, category), so an entry's categories are rendered once
+    per version of its file and shared by all pages showing them
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initializes an empty cache
+
+        :param max_bytes: maximum total size of the rendered cards in memory
+        """
+        self._cache = BoundedLRUCache(max_bytes)
+
+    def get(self, fingerprint, entry_key, version, structure_key, category_key):
+        """
+        Returns a cached fragment
+
+        :param fingerprint: `entry_fingerprint` of the entry's structure
+        :param entry_key: key of the entry
+        :param version: version of the entry
+        :param structure_key: key of the structure
+        :param category_key: key of the category
+        :return: the CategoryFragment, or None if it isn't cached
+        """
+        return self._cache.get((fingerprint, entry_key, version, structure_key, category_key))
+
+    def set(self, fingerprint, entry_key, version, structure_key, category_key, fragment):
+        """
+        Caches a fragment
+
+        :param fingerprint: `entry_fingerprint` of the entry's structure
+        :param entry_key: key of the entry
+        :param version: version of the entry
+        :param structure_key: key of the structure
+        :param category_key: key of the category
+        :param fragment: the CategoryFragment
+        """
+        self._cache.set(
+            (fingerprint, entry_key, version, structure_key, category_key), fragment, fragment.size)
+
+    def clear(self):
+        """Removes all fragments and resets the counters"""
+        self._cache.clear()
+
+    def stats(self):
+        """
+        Returns the counters of the cache
+
+        :rtype: dict
+        """
+        return self._cache.stats()
+
+
+fragment_cache = FragmentCache(getattr(settings, "FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
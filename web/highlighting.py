@@ -0,0 +1,238 @@
+"""Syntax highlighting of thesaurus code for codethesaur.us"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+import pygments
+from django.conf import settings
+from pygments import highlight
+from pygments.formatters.html import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.util import ClassNotFound
+
+from web.caching import BoundedLRUCache
+
+
+class HighlightCache:
+    """
+    Two-tier cache of highlighted HTML keyed by (lexer name, hash of the code):
+    an in-process LRU in front of a directory on disk that survives restarts
+    and can be warmed at deploy time
+    """
+
+    def __init__(self, max_bytes, directory=None):
+        """
+        Initializes the cache
+
+        :param max_bytes: maximum total size of the HTML kept in memory
+        :param directory: directory of the on-disk tier, or None to only cache
+            in memory. Entries are stored below a subdirectory per Pygments
+            version, so upgrading Pygments doesn't serve outdated markup.
+        """
+        self._memory = BoundedLRUCache(max_bytes)
+        self.directory = None
+        if directory:
+            self.directory = os.path.join(directory, f"pygments-{pygments.__version__}")
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+    @staticmethod
+    def key(lexer_name, code):
+        """
+        Returns the cache key of a snippet
+
+        :param lexer_name: name of the lexer the code is highlighted with
+        :param code: the code
+        :rtype: tuple
+        """
+        return lexer_name, hashlib.sha256(code.encode('UTF-8')).hexdigest()
+
+    def _path(self, key):
+        lexer_name, code_hash = key
+        safe_lexer_name = re.sub(r"[^A-Za-z0-9_.+-]", "_", lexer_name)
+        return os.path.join(self.directory, safe_lexer_name, code_hash[:2], f"{code_hash}.html")
+
+    def get(self, key):
+        """
+        Returns the cached HTML for `key`, or None if neither tier has it
+
+        :param key: key from `HighlightCache.key`
+        :rtype: str
+        """
+        html = self._memory.get(key)
+        if html is not None or self.directory is None:
+            return html
+        try:
+            with open(self._path(key), 'r', encoding='UTF-8') as file:
+                html = file.read()
+        except OSError:
+            return None
+        self.disk_hits += 1
+        self._memory.set(key, html, len(html))
+        return html
+
+    def set(self, key, html):
+        """
+        Stores the HTML for `key` in memory and on disk
+
+        :param key: key from `HighlightCache.key`
+        :param html: the highlighted HTML
+        """
+        self._memory.set(key, html, len(html))
+        if self.directory is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    'w', encoding='UTF-8', dir=os.path.dirname(path), delete=False) as file:
+                file.write(html)
+            os.chmod(file.name, 0o644)
+            os.replace(file.name, path)
+            self.disk_writes += 1
+        except OSError as error:
+            logging.warning(f"Failed to write highlight cache file {path}: {error}")
+
+    def clear_memory(self):
+        """Empties the in-process tier and resets its counters"""
+        self._memory.clear()
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+    def stats(self):
+        """
+        Returns the counters of both tiers
+
+        :rtype: dict
+        """
+        stats = self._memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        stats["disk_writes"] = self.disk_writes
+        return stats
+
+
+class LexerRegistry:
+    """
+    Resolves every entry key to a Pygments lexer once per process and keeps
+    track of which keys had to fall back to a similar lexer or to plain text
+    """
+
+    FALLBACK_LEXER = "text"
+
+    def __init__(self, similar_lexers):
+        """
+        Initializes an empty registry
+
+        :param similar_lexers: dict of entry key -> lexer name to use when
+            Pygments has no lexer for the entry key itself
+        """
+        self.similar_lexers = similar_lexers
+        self._lexers = {}
+        self._resolutions = {}
+        self._lock = threading.Lock()
+        self.formatter = HtmlFormatter()
+
+    def lexer(self, entry_key):
+        """
+        Returns the lexer for an entry, resolving it on first use
+
+        :param entry_key: key of the entry
+        :return: Pygments lexer
+        """
+        lexer = self._lexers.get(entry_key)
+        if lexer is not None:
+            return lexer
+        with self._lock:
+            if entry_key not in self._lexers:
+                self._lexers[entry_key], self._resolutions[entry_key] = self._resolve(entry_key)
+            return self._lexers[entry_key]
+
+    def _resolve(self, entry_key):
+        try:
+            return get_lexer_by_name(entry_key, startinline=True), "exact"
+        except ClassNotFound:
+            pass
+        if entry_key in self.similar_lexers:
+            try:
+                return get_lexer_by_name(self.similar_lexers[entry_key], startinline=True), "similar"
+            except ClassNotFound:
+                pass
+        logging.warning(f"No Pygments lexer for \"{entry_key}\", highlighting it as plain text")
+        return get_lexer_by_name(self.FALLBACK_LEXER, startinline=True), "text"
+
+    def resolve_all(self, entry_keys):
+        """
+        Resolves the lexers for all `entry_keys` up front
+
+        :param entry_keys: keys of the entries, e.g. from meta_info.json
+        """
+        for entry_key in entry_keys:
+            self.lexer(entry_key)
+
+    def describe(self):
+        """
+        Returns how each resolved entry key is highlighted
+
+        :return: dict of entry key -> dict with the lexer's name and how it was
+            resolved ("exact", "similar" or "text")
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                entry_key: {
+                    "lexer": lexer_cache_name(lexer),
+                    "resolution": self._resolutions[entry_key],
+                }
+                for entry_key, lexer in sorted(self._lexers.items())
+            }
+
+    def fallbacks(self):
+        """
+        Returns the resolved entry keys that are highlighted as plain text
+
+        :rtype: list
+        """
+        return [
+            entry_key for entry_key, info in self.describe().items()
+            if info["resolution"] == "text"
+        ]
+
+
+lexer_registry = LexerRegistry(getattr(settings, "SIMILAR_LEXERS", {}))
+
+
+highlight_cache = HighlightCache(
+    getattr(settings, "HIGHLIGHT_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+    getattr(settings, "HIGHLIGHT_CACHE_DIR", None),
+)
+
+
+def lexer_cache_name(lexer):
+    """
+    Returns the name a lexer is identified by in the highlight cache
+
+    :param lexer: Pygments lexer
+    :rtype: str
+    """
+    return lexer.aliases[0] if lexer.aliases else lexer.name
+
+
+def highlight_code(code, lexer):
+    """
+    Returns the syntax-highlighted HTML for `code`, from the highlight cache if
+    it was highlighted before
+
+    :param code: the code to highlight
+    :param lexer: Pygments lexer to highlight it with
+    :return: HTML of the highlighted code
+    :rtype: str
+    """
+    key = HighlightCache.key(lexer_cache_name(lexer), code)
+    html = highlight_cache.get(key)
+    if html is None:
+        html = highlight(code, lexer, lexer_registry.formatter)
+        highlight_cache.set(key, html)
+    return html
@@ -0,0 +1,123 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.db.models import Count
+
+from web.build_manifest import plan_rebuild
+from web.corpus import get_catalog
+from web.models import LookupData, ThesaurusEntry, ThesaurusMetaInfo
+from web.payloads import PayloadStore, payload_inputs, payload_name
+
+
+class Command(BaseCommand):
+    help = 'Prebuild the reference and most requested comparison API responses in every encoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=settings.API_PAYLOAD_DIR,
+            help="Directory to write to (defaults to API_PAYLOAD_DIR)"
+        )
+        parser.add_argument(
+            '--comparisons', type=int, default=500,
+            help="Number of the most looked up comparisons to build (needs the database)"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report which payloads would be built again or removed, and why"
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Build every payload again, even if its inputs are unchanged"
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("No output directory; set API_PAYLOAD_DIR or pass --output")
+        store = PayloadStore(options['output'])
+        previous_manifest = store.read_manifest()
+        payloads = self.payloads(options)
+        artifacts = {
+            name: payload_inputs(structure_key, entry_keys_versions)
+            for name, (_, structure_key, entry_keys_versions) in payloads.items()
+        }
+        plan = plan_rebuild(previous_manifest, artifacts, store.exists, options['force'])
+
+        if options['dry_run']:
+            def describe(name):
+                if name not in payloads:
+                    return name
+                kind, structure_key, entry_keys_versions = payloads[name]
+                entries = " ".join(f"{entry_key};{version}" for entry_key, version in entry_keys_versions)
+                return f"{kind} {structure_key} {entries} ({name})"
+
+            for line in plan.report(describe):
+                self.stdout.write(line)
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(plan.rebuild)} of {len(payloads)} payloads would be built, '
+                f'{len(plan.removed)} removed'
+            ))
+            return
+
+        meta_info = ThesaurusMetaInfo()
+        manifest = {name: previous_manifest[name] for name in plan.unchanged}
+        for name in plan.rebuild:
+            kind, structure_key, entry_keys_versions = payloads[name]
+            (entry_key, version), *others = entry_keys_versions
+            if kind == "reference":
+                document = ThesaurusEntry(entry_key, "").filled_concepts(structure_key, version, meta_info)
+            else:
+                other_key, other_version = others[0]
+                document = ThesaurusEntry(entry_key, "").comparison(
+                    structure_key, other_key, other_version, version)
+            store.write(kind, structure_key, entry_keys_versions, document, manifest)
+
+        store.write_manifest(manifest)
+        # only after the new manifest, so no payload is served while it's missing
+        for name in plan.removed:
+            store.remove(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(plan.rebuild)} of {len(payloads)} payloads '
+            f'({len(plan.unchanged)} unchanged, {len(plan.removed)} removed) in "{options["output"]}"'
+        ))
+
+    def payloads(self, options):
+        """Returns a dict of payload name -> (kind, structure key, entry keys and versions) to build"""
+        catalog = get_catalog()
+        payloads = {}
+        for entry_key, versions in catalog.entry_versions.items():
+            for version in versions:
+                for structure_key in catalog.availability.structures(entry_key, version):
+                    entry_keys_versions = [(entry_key, version)]
+                    payloads[payload_name("reference", structure_key, entry_keys_versions)] = (
+                        "reference", structure_key, entry_keys_versions)
+
+        for lookup in self.common_comparisons(options['comparisons']):
+            entry_keys_versions = [
+                (lookup['entry1'], lookup['version1']),
+                (lookup['entry2'], lookup['version2']),
+            ]
+            structure_key = lookup['structure']
+            if all(catalog.availability.has(entry_key, version, structure_key)
+                   for entry_key, version in entry_keys_versions):
+                payloads[payload_name("compare", structure_key, entry_keys_versions)] = (
+                    "compare", structure_key, entry_keys_versions)
+        return payloads
+
+    @staticmethod
+    def common_comparisons(limit):
+        """Returns the most looked up comparisons, or none without a database"""
+        if limit <= 0:
+            return []
+        try:
+            return list(
+                LookupData.objects.exclude(entry2='')
+                .values('entry1', 'version1', 'entry2', 'version2', 'structure')
+                .annotate(lookups=Count('id'))
+                .order_by('-lookups')[:limit]
+            )
+        except DatabaseError as e:
+            logging.warning(f"Not building comparison payloads, the lookups can't be read: {e}")
+            return []
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web.corpus import CorpusSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Compile all thesaurus files into a single snapshot that is loaded once at startup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=settings.THESAURUS_SNAPSHOT_PATH,
+            help="Where to write the snapshot (defaults to THESAURUS_SNAPSHOT_PATH)"
+        )
+
+    def handle(self, *args, **options):
+        snapshot = CorpusSnapshot.compile()
+        snapshot.dump(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Compiled {len(snapshot.documents)} entry files and '
+            f'{len(snapshot.meta_structures)} structures into "{options["output"]}" '
+            f'(content hash {snapshot.content_hash[:12]})'
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from web.export import iter_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Export the filled template of every entry, version and structure as newline-delimited JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help="File to write to (defaults to standard output)"
+        )
+        parser.add_argument(
+            '--category', action='append', default=[],
+            help="Only export entries of this category, e.g. langs (can be repeated)"
+        )
+        parser.add_argument(
+            '--entry', action='append', default=[],
+            help="Only export this entry (can be repeated)"
+        )
+        parser.add_argument(
+            '--structure', action='append', default=[],
+            help="Only export this structure (can be repeated)"
+        )
+
+    def handle(self, *args, **options):
+        lines = iter_ndjson(
+            set(options['category']),
+            set(options['entry']),
+            set(options['structure']),
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        documents = 0
+        with open(options['output'], 'w', encoding='UTF-8') as output:
+            for line in lines:
+                output.write(line)
+                documents += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {documents} documents to "{options["output"]}"'
+        ))
@@ -0,0 +1,141 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.db.models import Count
+
+from web.build_manifest import inputs_fingerprint, manifest_entry, plan_rebuild
+from web.corpus import get_catalog
+from web.models import LookupData
+from web.prerender import PrerenderedPages, init_worker, page_inputs, page_path, render_page
+
+
+class Command(BaseCommand):
+    help = 'Pre-render every reference page and a set of comparison pages to static HTML files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=settings.PRERENDER_DIR,
+            help="Directory to write to (defaults to PRERENDER_DIR)"
+        )
+        parser.add_argument(
+            '--base-url',
+            default=settings.PRERENDER_BASE_URL,
+            help="Scheme and host the pages' absolute links point to (defaults to PRERENDER_BASE_URL)"
+        )
+        parser.add_argument(
+            '--pair', nargs=2, action='append', default=[], metavar=('ENTRY;VERSION', 'ENTRY;VERSION'),
+            help="Comparison to render for every structure both entries have, "
+                 "in addition to PRERENDER_COMPARISON_PAIRS (can be repeated)"
+        )
+        parser.add_argument(
+            '--comparisons', type=int, default=500,
+            help="Number of the most looked up comparisons to render (needs the database)"
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count() or 1,
+            help="Number of processes rendering pages (defaults to the number of CPUs)"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report which pages would be rendered again or removed, and why"
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Render every page again, even if its inputs are unchanged"
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("No output directory; set PRERENDER_DIR or pass --output")
+        store = PrerenderedPages(options['output'])
+        previous_manifest = store.read_manifest()
+        pages = {}
+        artifacts = {}
+        for structure_key, entry_keys_versions in self.pages(options):
+            inputs = page_inputs(structure_key, entry_keys_versions)
+            if inputs is not None:
+                relative_path = page_path(structure_key, entry_keys_versions)
+                pages[relative_path] = (structure_key, entry_keys_versions)
+                artifacts[relative_path] = inputs
+        plan = plan_rebuild(previous_manifest, artifacts, store.exists, options['force'])
+
+        if options['dry_run']:
+            for line in plan.report():
+                self.stdout.write(line)
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(plan.rebuild)} of {len(pages)} pages would be rendered, '
+                f'{len(plan.removed)} removed'
+            ))
+            return
+
+        manifest = {relative_path: previous_manifest[relative_path] for relative_path in plan.unchanged}
+        with ProcessPoolExecutor(max_workers=max(options['jobs'], 1), initializer=init_worker) as pool:
+            futures = [
+                pool.submit(render_page, options['output'], options['base_url'], *pages[relative_path])
+                for relative_path in plan.rebuild
+            ]
+            for future in futures:
+                rendered = future.result()
+                if rendered is not None:
+                    relative_path, inputs = rendered
+                    manifest[relative_path] = manifest_entry(inputs_fingerprint(inputs), inputs)
+
+        store.write_manifest(manifest)
+        # only after the new manifest, so no page is served while it's missing
+        for relative_path in plan.removed:
+            store.remove(relative_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Pre-rendered {len(manifest) - len(plan.unchanged)} of {len(pages)} pages '
+            f'({len(plan.unchanged)} unchanged, {len(plan.removed)} removed) in "{options["output"]}"'
+        ))
+
+    def pages(self, options):
+        """Returns the (structure key, entry keys and versions) of every page to render"""
+        catalog = get_catalog()
+        pages = {}
+        for entry_key, versions in catalog.entry_versions.items():
+            for version in versions:
+                for structure_key in catalog.availability.structures(entry_key, version):
+                    pages[(structure_key, ((entry_key, version),))] = None
+
+        pairs = list(settings.PRERENDER_COMPARISON_PAIRS) + [tuple(pair) for pair in options['pair']]
+        for pair in pairs:
+            entry_keys_versions = tuple(tuple(entry_str.split(';', 1)) for entry_str in pair)
+            if any(len(entry_key_version) != 2 for entry_key_version in entry_keys_versions):
+                raise CommandError(f'Invalid pair {pair}; use "entry;version" for both entries')
+            for structure_key in catalog.availability.columns:
+                if all(catalog.availability.has(entry_key, version, structure_key)
+                       for entry_key, version in entry_keys_versions):
+                    pages[(structure_key, entry_keys_versions)] = None
+
+        for lookup in self.common_comparisons(options['comparisons']):
+            entry_keys_versions = (
+                (lookup['entry1'], lookup['version1']),
+                (lookup['entry2'], lookup['version2']),
+            )
+            if all(catalog.availability.has(entry_key, version, lookup['structure'])
+                   for entry_key, version in entry_keys_versions):
+                pages[(lookup['structure'], entry_keys_versions)] = None
+
+        return [(structure_key, list(entry_keys_versions)) for structure_key, entry_keys_versions in pages]
+
+    @staticmethod
+    def common_comparisons(limit):
+        """Returns the most looked up comparisons, or none without a database"""
+        if limit <= 0:
+            return []
+        try:
+            return list(
+                LookupData.objects.exclude(entry2='')
+                .values('entry1', 'version1', 'entry2', 'version2', 'structure')
+                .annotate(lookups=Count('id'))
+                .order_by('-lookups')[:limit]
+            )
+        except DatabaseError as e:
+            logging.warning(f"Not pre-rendering the most looked up comparisons, the lookups can't be read: {e}")
+            return []
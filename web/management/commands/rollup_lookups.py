@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily visit and lookup rollups the statistics page reads from'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help="Only recompute the days from this date (YYYY-MM-DD) on"
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError as error:
+                raise CommandError(f"Invalid --since date: {error}") from error
+        written = rebuild_rollups(since=since)
+        for model_name, rows in written.items():
+            self.stdout.write(f"{model_name}: {rows} rows")
+        self.stdout.write(self.style.SUCCESS("Rebuilt the daily rollups"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from web.highlighting import lexer_registry
+from web.models import ThesaurusMetaInfo
+
+
+class Command(BaseCommand):
+    help = "Show which Pygments lexer highlights each entry in meta_info.json"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-fallback',
+            action='store_true',
+            help="Exit with an error if any entry is highlighted as plain text"
+        )
+
+    def handle(self, *args, **options):
+        lexer_registry.resolve_all(ThesaurusMetaInfo().languages)
+
+        for entry_key, info in lexer_registry.describe().items():
+            line = f"{entry_key:<16} {info['lexer']:<16} {info['resolution']}"
+            if info["resolution"] == "text":
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+
+        fallbacks = lexer_registry.fallbacks()
+        if fallbacks:
+            message = f"{len(fallbacks)} entries fall back to plain text: {', '.join(fallbacks)}"
+            if options['fail_on_fallback']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every entry has a lexer."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from web.corpus import get_catalog, load_entry_document
+from web.highlighting import highlight_cache, highlight_code, lexer_registry
+from web.models import ThesaurusEntry, ThesaurusMetaInfo
+
+
+class Command(BaseCommand):
+    help = 'Highlight every code snippet of the thesaurus into the highlight cache'
+
+    def handle(self, *args, **options):
+        meta_info = ThesaurusMetaInfo()
+        catalog = get_catalog()
+        snippets = 0
+
+        for entry_key in meta_info.languages:
+            entry = ThesaurusEntry(entry_key, meta_info.entry_name(entry_key))
+            lexer = lexer_registry.lexer(entry_key)
+            for version in catalog.entry_versions.get(entry_key, []):
+                for structure_key in catalog.structures(entry_key, version):
+                    entry.concepts = load_entry_document(
+                        entry_key, version, structure_key, entry.language_dir)["concepts"]
+                    for concept_key in entry.concepts:
+                        # the snippets format_code_for_display highlights, empty ones included
+                        if entry.concept_unknown(concept_key) or entry.concept_code(concept_key) is None:
+                            continue
+                        if entry.concept_implemented(concept_key):
+                            highlight_code(entry.concept_code(concept_key), lexer)
+                            snippets += 1
+
+        stats = highlight_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Highlighted {snippets} snippets ({stats["disk_writes"]} newly written to '
+            f'"{highlight_cache.directory}", {stats["disk_hits"]} already cached)'
+        ))
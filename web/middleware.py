@@ -1,7 +1,14 @@
 # web/middleware.py
 from django.db.utils import OperationalError
 from django.shortcuts import render
-from django.http import HttpResponseServerError
+from django.http import HttpResponse, HttpResponseServerError
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from web.conditional import thesaurus_fingerprint
+from web.payloads import accepts_gzip
+from web.prerender import PAGE_TEMPLATES, prerendered_pages
 
 class DatabaseDownMiddleware:
     """
@@ -15,4 +22,75 @@ class DatabaseDownMiddleware:
             return self.get_response(request)
         except OperationalError:
             # Render error500.html template
-            return HttpResponseServerError(render(request, "error500.html"))
\ No newline at end of file
+            return HttpResponseServerError(render(request, "error500.html"))
+
+
+class PrerenderedPageMiddleware:
+    """
+    Serves reference and compare pages from the files of
+    `python manage.py prerender_pages` when an up-to-date one exists, and
+    leaves every other request (and pages that weren't pre-rendered) to the
+    views. It comes last in MIDDLEWARE, so the other middleware still
+    processes its responses, and it answers like the view: the same ETag and
+    Last-Modified, and the visit, lookup and missing concepts are stored.
+    """
+    # parameters the pre-rendered pages are keyed by; requests with any other
+    # parameter (e.g. the legacy `lang`) go to the view
+    PARAMETERS = frozenset(('concept', 'entry'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.prerendered_response(request)
+        if response is None:
+            return self.get_response(request)
+        return response
+
+    def prerendered_response(self, request):
+        """
+        Returns the response with the pre-rendered page for a request
+
+        :param request: HttpRequest object
+        :return: HttpResponse object, or None if there is no up-to-date page
+        """
+        # pylint: disable=import-outside-toplevel
+        from web.views import clean_entry_parameter, concepts_condition, store_concepts_visit
+
+        # the view only answers GET
+        if request.method != 'GET' or \
+                request.path not in (reverse('reference'), reverse('compare')):
+            return None
+        if not request.GET or set(request.GET) - self.PARAMETERS:
+            return None
+        structure_key = request.GET.get('concept')
+        entry_keys_versions = [
+            clean_entry_parameter(entry_str) for entry_str in request.GET.getlist('entry')
+        ]
+        if not structure_key or not entry_keys_versions or \
+                any(version is None for _, version in entry_keys_versions):
+            return None
+
+        gzipped = accepts_gzip(request)
+        body = prerendered_pages.get(structure_key, entry_keys_versions, gzipped)
+        if body is None:
+            return None
+        resolved = concepts_condition(request)
+        if resolved is None:
+            return None
+        fingerprint = thesaurus_fingerprint(*resolved, templates=PAGE_TEMPLATES)
+        if fingerprint is None:
+            return None
+        etag, last_modified = fingerprint
+
+        store_concepts_visit(request, structure_key, entry_keys_versions)
+
+        response = HttpResponse(body, content_type="text/html; charset=utf-8")
+        # the view's ETag, weak for the gzipped body like GZipMiddleware does
+        response['ETag'] = ('W/' if gzipped else '') + quote_etag(etag)
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return get_conditional_response(
+            request, etag=response['ETag'], last_modified=int(last_modified.timestamp()), response=response)
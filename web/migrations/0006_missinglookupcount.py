@@ -0,0 +1,53 @@
+# Generated by Django 4.2.27 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.db.models import Count, Max
+
+
+def count_existing_missing_lookups(apps, schema_editor):
+    MissingLookup = apps.get_model('web', 'MissingLookup')
+    MissingLookupCount = apps.get_model('web', 'MissingLookupCount')
+    totals = {}
+    rows = MissingLookup.objects.values('item_type', 'item_value', 'language_context') \
+        .annotate(count=Count('id'), last_seen=Max('date_time'))
+    for row in rows.iterator():
+        key = (row['item_type'], row['item_value'], row['language_context'] or '')
+        count, last_seen = totals.get(key, (0, row['last_seen']))
+        totals[key] = (count + row['count'], max(last_seen, row['last_seen']))
+    MissingLookupCount.objects.bulk_create([
+        MissingLookupCount(
+            item_type=item_type,
+            item_value=item_value,
+            language_context=language_context,
+            count=count,
+            last_seen=last_seen,
+        )
+        for (item_type, item_value, language_context), (count, last_seen) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0005_rename_language_to_entry_in_lookupdata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissingLookupCount',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('item_type', models.CharField(max_length=20)),
+                ('item_value', models.CharField(max_length=100)),
+                ('language_context', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='missinglookupcount',
+            constraint=models.UniqueConstraint(fields=('item_type', 'item_value', 'language_context'), name='unique_missing_lookup_count'),
+        ),
+        migrations.RunPython(count_existing_missing_lookups, migrations.RunPython.noop),
+    ]
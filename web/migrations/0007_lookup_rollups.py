@@ -0,0 +1,116 @@
+# Generated by Django 4.2.27 on 2026-10-17 01:57
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+# A copy of web.rollups.rebuild_rollups as of this migration, so later
+# changes to the app code can't change what it does on a fresh database
+def backfill_rollups(apps, schema_editor):
+    site_visit_model = apps.get_model('web', 'SiteVisit')
+    lookup_model = apps.get_model('web', 'LookupData')
+
+    visits = site_visit_model.objects.annotate(day=TruncDate('date_time'))
+    lookups = lookup_model.objects.annotate(day=TruncDate('date_time'))
+    comparisons = lookups.exclude(entry2='')
+
+    # rollup model name, raw rows, fields grouped by, rollup fields they go to
+    grouped_queries = (
+        ('DailySiteVisits', visits, ('day',), ('day',)),
+        ('DailyStructureLookups', lookups, ('day', 'structure'), ('day', 'structure')),
+        ('DailyEntryLookups', lookups, ('day', 'entry1'), ('day', 'entry')),
+        ('DailyEntryLookups', comparisons, ('day', 'entry2'), ('day', 'entry')),
+        ('DailyEntryStructureLookups', lookups, ('day', 'entry1', 'structure'),
+         ('day', 'entry', 'structure')),
+        ('DailyEntryStructureLookups', comparisons, ('day', 'entry2', 'structure'),
+         ('day', 'entry', 'structure')),
+        ('DailyComparisonLookups', comparisons, ('day', 'entry1', 'entry2'),
+         ('day', 'entry1', 'entry2')),
+    )
+    counts = {}
+    for model_name, queryset, fields, rollup_fields in grouped_queries:
+        model_counts = counts.setdefault(model_name, {})
+        rows = queryset.values(*fields).annotate(rollup_count=Count('id')).order_by()
+        for row in rows.iterator():
+            key = tuple(zip(rollup_fields, (row[field] for field in fields)))
+            model_counts[key] = model_counts.get(key, 0) + row['rollup_count']
+
+    for model_name, model_counts in counts.items():
+        model = apps.get_model('web', model_name)
+        model.objects.bulk_create([
+            model(**dict(key), count=count) for key, count in model_counts.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_missinglookupcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyComparisonLookups',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('entry1', models.CharField(max_length=50)),
+                ('entry2', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyEntryLookups',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('entry', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyEntryStructureLookups',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('entry', models.CharField(max_length=50)),
+                ('structure', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySiteVisits',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField(unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyStructureLookups',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('structure', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailystructurelookups',
+            constraint=models.UniqueConstraint(fields=('day', 'structure'), name='unique_daily_structure_lookups'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyentrystructurelookups',
+            constraint=models.UniqueConstraint(fields=('day', 'entry', 'structure'), name='unique_daily_entry_structure_lookups'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyentrylookups',
+            constraint=models.UniqueConstraint(fields=('day', 'entry'), name='unique_daily_entry_lookups'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycomparisonlookups',
+            constraint=models.UniqueConstraint(fields=('day', 'entry1', 'entry2'), name='unique_daily_comparison_lookups'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
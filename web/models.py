@@ -1,9 +1,11 @@
 """models of codethesaur.us"""
 import json
 import os
-from jsonmerge import merge
 
 from django.db import models
+from django.utils import timezone
+
+from web.corpus import get_catalog, load_entry_document, load_meta_info, load_meta_structure
 
 
 # pylint: disable=too-few-public-methods
@@ -12,7 +14,6 @@ class MetaStructure:
     Holds info about how the structure is divided into categories and
     concepts
     """
-    _cached_files = {}
 
     def __init__(self, key, name):
         """
@@ -24,18 +25,7 @@ class MetaStructure:
         """
         self.key = key
         self.name = name
-
-        if key in MetaStructure._cached_files:
-            self.categories = MetaStructure._cached_files[key]
-            return
-
-        meta_structure_file_path = os.path.join(
-            "web", "thesauruses", "_meta", f"{key}.json")
-        with open(meta_structure_file_path, 'r', encoding='UTF-8') as meta_structure_file:
-            meta_structure_file_json = json.load(meta_structure_file)
-
-            self.categories = meta_structure_file_json["categories"]
-            MetaStructure._cached_files[key] = self.categories
+        self.categories = load_meta_structure(key)["categories"]
 
 
 class ThesaurusEntry:
@@ -58,36 +48,17 @@ class ThesaurusEntry:
         self.name = name
         self.concepts = None
         self.version = None
-        self.language_dir = None
-        for category in os.listdir(os.path.join("web", "thesauruses")):
-            if category == "_meta" or not os.path.isdir(os.path.join("web", "thesauruses", category)):
-                continue
-            potential_dir = os.path.join("web", "thesauruses", category, self.key)
-            if os.path.exists(potential_dir):
-                self.language_dir = potential_dir
-                break
-        
+        self.language_dir = get_catalog().entry_dir(self.key)
+
         if self.language_dir is None:
             # Fallback for when it doesn't exist yet (e.g. during template generation)
             # Defaulting to 'langs' if not found, but this might need refinement
             self.language_dir = os.path.join("web", "thesauruses", "langs", self.key)
-        self.version = None
 
 
     def versions(self):
         """Generate all versions and their paths for the ThesaurusEntry"""
-        versions = dict()
-        try:
-            for entry in os.scandir(self.language_dir):
-                if not entry.is_dir():
-                    continue
-
-                file_version = os.path.basename(entry.path)
-                versions[file_version] = entry.path
-        except FileNotFoundError:
-            pass
-
-        return versions
+        return get_catalog().versions(self.key)
 
 
     def __bool__(self):
@@ -97,7 +68,7 @@ class ThesaurusEntry:
 
         :rtype: bool
         """
-        return os.path.exists(self.language_dir)
+        return get_catalog().category(self.key) is not None
 
     def load_concepts(self, structure_key, version):
         """
@@ -106,49 +77,75 @@ class ThesaurusEntry:
         :param structure_key: the key for the structure to load
         :param version: the version of the language
         """
-        file_path = os.path.join(self.language_dir, version, f"{structure_key}.json")
-        with open(file_path, 'r', encoding='UTF-8') as file:
-            file_json = json.load(file)
-            self.concepts = file_json["concepts"]
+        file_json = load_entry_document(self.key, version, structure_key, self.language_dir)
+        self.concepts = file_json["concepts"]
         self.version = version
 
-    def load_filled_concepts(self, structure_key, version):
-        from web.thesaurus_template_generators import generate_entry_template
+    def filled_concepts(self, structure_key, version, meta_info=None, concept_keys=None, fields=None):
         """
-        Loads the concepts from the entry's structure file
+        Loads the concepts from the entry's structure file and fills them into
+        the entry template of the structure
 
         :param structure_key: the ID for the concept to load
         :param version: the version of the entry
-        :return: a dict containing the code and comment, and possibly the
-            'not-implemented' flag. They are empty code entries if not specified
-        :rtype: object Filled template
-        """
+        :param meta_info: optional ThesaurusMetaInfo to read the names from
+        :param concept_keys: optional collection of the only concepts to
+            include
+        :param fields: optional collection of the only fields of the concepts
+            to include, e.g. ("code", "comment")
+        :return: the template with a dict per concept containing the code and
+            comment, and possibly the 'not-implemented' flag. They are empty
+            code entries if not specified. Shares values with the loaded
+            structure file, so it must not be modified.
+        :rtype: dict
+        """
+        from web.thesaurus_template_generators import entry_template, merge_json, project_concepts
 
         self.load_concepts(structure_key, version)
 
-        template = generate_entry_template(
-            self.key,
-            structure_key,
-            version
+        # projected before merging, so the work depends on what was asked for
+        template = entry_template(self.key, structure_key, version, meta_info, concept_keys, fields)
+        template['concepts'] = merge_json(
+            template['concepts'],
+            project_concepts(self.concepts, concept_keys, fields)
         )
 
-        template = json.loads(template)
+        return template
 
-        template['concepts'] = merge(template['concepts'], self.concepts)
+    def load_filled_concepts(self, structure_key, version):
+        """
+        Loads the concepts from the entry's structure file
 
-        response = json.dumps(template, indent=2)
+        :param structure_key: the ID for the concept to load
+        :param version: the version of the entry
+        :return: JSON of the filled template, see `filled_concepts`
+        :rtype: str
+        """
+        return json.dumps(self.filled_concepts(structure_key, version), indent=2)
 
-        return response
+    def comparison(self, structure_key, entry_key, version_entry, version_self,
+                   concept_keys=None, fields=None):
+        """
+        Loads the filled concepts of this entry and another one
 
-    def load_comparison(self, structure_key, entry_key, version_entry, version_self):
+        :param structure_key: the ID for the concept to load
+        :param entry_key: key of the other entry
+        :param version_entry: version of the other entry
+        :param version_self: version of this entry
+        :param concept_keys: optional collection of the only concepts to
+            include
+        :param fields: optional collection of the only fields of the concepts
+            to include
+        :return: dict with the meta info and the filled concepts of both entries
+        :rtype: dict
+        """
         entry_obj = ThesaurusEntry(entry_key, "")
-        self_filled_concept = self.load_filled_concepts(structure_key, version_self)
-        entry_filled_concept = entry_obj.load_filled_concepts(structure_key, version_entry)
-
-        if self_filled_concept is False or entry_filled_concept is False:
-            return False
+        self_filled_concept = self.filled_concepts(
+            structure_key, version_self, concept_keys=concept_keys, fields=fields)
+        entry_filled_concept = entry_obj.filled_concepts(
+            structure_key, version_entry, concept_keys=concept_keys, fields=fields)
 
-        response = json.dumps({
+        return {
             "meta": {
                 "entry_1": self.key,
                 "entry_version_1": version_self,
@@ -156,11 +153,21 @@ class ThesaurusEntry:
                 "entry_version_2": version_entry,
                 "structure": structure_key
             },
-            "concepts1": json.loads(self_filled_concept)['concepts'],
-            "concepts2": json.loads(entry_filled_concept)['concepts']
-        }, indent=2)
+            "concepts1": self_filled_concept['concepts'],
+            "concepts2": entry_filled_concept['concepts']
+        }
 
-        return response
+    def load_comparison(self, structure_key, entry_key, version_entry, version_self):
+        """
+        Loads the comparison of this entry and another one
+
+        :return: JSON of the comparison, see `comparison`
+        :rtype: str
+        """
+        return json.dumps(
+            self.comparison(structure_key, entry_key, version_entry, version_self),
+            indent=2
+        )
 
 
     def concept(self, concept_key):
@@ -282,8 +289,6 @@ class MissingStructureError(Exception):
 
 class ThesaurusMetaInfo:
     """Holds info about structures and languages"""
-    _cached_structures = None
-    _cached_languages = None
 
     def __init__(self):
         """
@@ -291,34 +296,18 @@ class ThesaurusMetaInfo:
 
         :rtype: None
         """
-        if ThesaurusMetaInfo._cached_structures is not None:
-            self.structures = ThesaurusMetaInfo._cached_structures
-            self.languages = ThesaurusMetaInfo._cached_languages
-            self.categories = getattr(ThesaurusMetaInfo, "_cached_categories", {})
-            self.category_structures = getattr(ThesaurusMetaInfo, "_cached_category_structures", {})
-            return
-
-        meta_info_file_path = os.path.join(
-            "web", "thesauruses", "meta_info.json")
-        with open(meta_info_file_path, 'r', encoding='UTF-8') as meta_file:
-            meta_info_json = json.load(meta_file)
-        
+        meta_info_json = load_meta_info()
+
         self.categories = meta_info_json.get("categories", {})
         self.languages = meta_info_json["languages"]
-        
-        # Flatten structures for backward compatibility where needed, 
+
+        # Flatten structures for backward compatibility where needed,
         # but keep track of category-specific ones
         self.category_structures = meta_info_json["structures"]
         self.structures = {}
         for cat_structs in self.category_structures.values():
             self.structures.update(cat_structs)
 
-        ThesaurusMetaInfo._cached_structures = self.structures
-        ThesaurusMetaInfo._cached_languages = self.languages
-        ThesaurusMetaInfo._cached_categories = self.categories
-        ThesaurusMetaInfo._cached_category_structures = self.category_structures
-        
-
     def entry_name(self, entry_key):
         """
         Given a structure key (from meta_info.json), returns the entry's human-friendly name
@@ -365,6 +354,55 @@ class ThesaurusMetaInfo:
         return entries
 
 
+    def comparison(self, entry_keys_versions, meta_structure):
+        """
+        Loads any number of entries for one structure into a single document,
+        loading and filling each distinct entry once
+
+        :param entry_keys_versions: list of (entry key, version) tuples; the
+            latest version is used if the version is None
+        :param meta_structure: MetaStructure to compare the entries for
+        :raises MissingEntryError: if an entry doesn't exist
+        :raises MissingStructureError: if an entry doesn't have the structure
+        :return: dict with the structure and entries in "meta" and, per
+            concept, its name, category and the filled concept of every entry
+            (None where the entry doesn't have it) in "concepts"
+        :rtype: dict
+        """
+        from web.thesaurus_template_generators import merge_json, template_concepts
+
+        entries = self.load_entries(list(dict.fromkeys(entry_keys_versions)), meta_structure)
+        # entries requested without a version can resolve to a listed one
+        entries = list({(entry.key, entry.version): entry for entry in entries}.values())
+        filled = [merge_json(template_concepts(meta_structure), entry.concepts) for entry in entries]
+
+        concepts = {}
+        for category_key, category in meta_structure.categories.items():
+            for concept_key, name in category.items():
+                concepts[concept_key] = {"name": name, "category": category_key}
+        # concepts of entry files that aren't in the structure file
+        for entry_concepts in filled:
+            for concept_key in entry_concepts:
+                concepts.setdefault(concept_key, {"name": None, "category": None})
+        for concept_key, concept in concepts.items():
+            concept["entries"] = [entry_concepts.get(concept_key) for entry_concepts in filled]
+
+        return {
+            "meta": {
+                "structure": meta_structure.key,
+                "structure_name": meta_structure.name,
+                "entries": [
+                    {
+                        "entry": entry.key,
+                        "entry_name": entry.name,
+                        "entry_version": entry.version,
+                    }
+                    for entry in entries
+                ],
+            },
+            "concepts": concepts,
+        }
+
     def structure_name(self, structure_key):
         """
         Given a structure key (from meta_info.json), returns the structure's
@@ -418,3 +456,102 @@ class MissingLookup(models.Model):
     item_value = models.CharField(max_length=100)
     language_context = models.CharField(max_length=50, blank=True, null=True)
     site_visit = models.ForeignKey(SiteVisit, on_delete=models.CASCADE)
+
+
+class MissingLookupCount(models.Model):
+    """
+    Number of times an item was looked up but missing, counted per
+    (item_type, item_value, language_context) and incremented in place
+    """
+    KEY_FIELDS = ('item_type', 'item_value', 'language_context')
+
+    id = models.BigAutoField(primary_key=True)
+    item_type = models.CharField(max_length=20)  # 'language', 'structure', 'concept'
+    item_value = models.CharField(max_length=100)
+    language_context = models.CharField(max_length=50, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['item_type', 'item_value', 'language_context'],
+                name='unique_missing_lookup_count',
+            ),
+        ]
+
+
+class DailySiteVisits(models.Model):
+    """Number of site visits per day"""
+    KEY_FIELDS = ('day',)
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField(unique=True)
+    count = models.BigIntegerField(default=0)
+
+
+class DailyEntryLookups(models.Model):
+    """Number of lookups per day and entry, counting both sides of comparisons"""
+    KEY_FIELDS = ('day', 'entry')
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    entry = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'entry'], name='unique_daily_entry_lookups'),
+        ]
+
+
+class DailyStructureLookups(models.Model):
+    """Number of lookups per day and structure"""
+    KEY_FIELDS = ('day', 'structure')
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    structure = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'structure'], name='unique_daily_structure_lookups'),
+        ]
+
+
+class DailyComparisonLookups(models.Model):
+    """Number of comparisons per day and pair of entries"""
+    KEY_FIELDS = ('day', 'entry1', 'entry2')
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    entry1 = models.CharField(max_length=50)
+    entry2 = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'entry1', 'entry2'], name='unique_daily_comparison_lookups'),
+        ]
+
+
+class DailyEntryStructureLookups(models.Model):
+    """
+    Number of lookups per day, entry and structure, counting both sides of
+    comparisons
+    """
+    KEY_FIELDS = ('day', 'entry', 'structure')
+
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    entry = models.CharField(max_length=50)
+    structure = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'entry', 'structure'], name='unique_daily_entry_structure_lookups'),
+        ]
@@ -0,0 +1,252 @@
+"""Precompressed JSON payloads of the API, built ahead of time"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from web.build_manifest import inputs_fingerprint, manifest_entry, manifest_fingerprint
+from web.caching import BoundedLRUCache
+from web.corpus import structure_input_hashes
+
+
+MANIFEST_FILE_NAME = "manifest.json"
+# Version of how the API documents are built; bump it with changes to the
+# documents so payloads built by older code aren't served anymore
+PAYLOAD_VERSION = 1
+
+# (compact, gzipped) -> file name suffix of the variant
+VARIANT_SUFFIXES = {
+    (False, False): ".json",
+    (True, False): ".compact.json",
+    (False, True): ".json.gz",
+    (True, True): ".compact.json.gz",
+}
+
+
+def encode_payload(document, compact=False, gzipped=False):
+    """
+    Serializes an API document
+
+    :param document: the JSON-serializable document
+    :param compact: True for JSON without indentation and spaces
+    :param gzipped: True to gzip the JSON
+    :return: the encoded bytes
+    :rtype: bytes
+    """
+    if compact:
+        body = json.dumps(document, separators=(",", ":")).encode('UTF-8')
+    else:
+        body = json.dumps(document, indent=2).encode('UTF-8')
+    if gzipped:
+        # mtime=0 keeps the bytes (and the files on disk) reproducible
+        body = gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+def payload_inputs(structure_key, entry_keys_versions):
+    """
+    Returns the hashes of everything a payload is built from: the entries'
+    files, the meta files, `PAYLOAD_VERSION` and `settings.ETAG_SALT`, which
+    changes when a deploy changes how responses are built
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: dict of input name -> hash
+    :rtype: dict
+    :raises FileNotFoundError: if an entry's version doesn't define the structure
+    """
+    inputs = structure_input_hashes(structure_key, entry_keys_versions)
+    inputs["payload_version"] = str(PAYLOAD_VERSION)
+    inputs["ETAG_SALT"] = getattr(settings, "ETAG_SALT", "")
+    return inputs
+
+
+def payload_name(kind, structure_key, entry_keys_versions):
+    """
+    Returns the file name (without suffix) of the payload of an API response
+
+    :param kind: kind of the response, "reference" or "compare"
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :rtype: str
+    """
+    parts = [kind, structure_key]
+    for entry_key, version in entry_keys_versions:
+        parts += [entry_key, version]
+    return hashlib.sha256("\0".join(parts).encode('UTF-8')).hexdigest()[:40]
+
+
+class PayloadStore:
+    """
+    Directory of API responses serialized in every variant (indented or
+    compact, plain or gzipped) by `python manage.py build_api_payloads`, with
+    a manifest of the `payload_inputs` each one was built from. A payload is
+    only served while its thesaurus files, PAYLOAD_VERSION and ETAG_SALT are
+    unchanged.
+    """
+
+    def __init__(self, directory, max_bytes=16 * 1024 * 1024):
+        """
+        Initializes the store
+
+        :param directory: directory of the payloads, or None to disable it
+        :param max_bytes: maximum total size of the payloads kept in memory
+        """
+        self.directory = directory or None
+        self._memory = BoundedLRUCache(max_bytes)
+        self._manifest = {}
+        self._manifest_signature = None
+        self._lock = threading.Lock()
+
+    def _current_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE_NAME)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._manifest_signature:
+            with self._lock:
+                if signature != self._manifest_signature:
+                    try:
+                        with open(path, 'r', encoding='UTF-8') as file:
+                            self._manifest = json.load(file)
+                    except (OSError, ValueError) as error:
+                        logging.error(f"Failed to read API payload manifest {path}: {error}")
+                        self._manifest = {}
+                    self._manifest_signature = signature
+                    self._memory.clear()
+        return self._manifest
+
+    def get(self, kind, structure_key, entry_keys_versions, compact=False, gzipped=False):
+        """
+        Returns the prebuilt bytes of an API response, if they are up to date
+
+        :param kind: kind of the response, "reference" or "compare"
+        :param structure_key: key of the structure
+        :param entry_keys_versions: list of (entry key, version) tuples
+        :param compact: True for the compact variant
+        :param gzipped: True for the gzipped variant
+        :return: the bytes, or None if there is no up-to-date payload
+        :rtype: bytes
+        """
+        if self.directory is None:
+            return None
+        name = payload_name(kind, structure_key, entry_keys_versions)
+        built_from = manifest_fingerprint(self._current_manifest(), name)
+        if built_from is None:
+            return None
+        try:
+            fingerprint = inputs_fingerprint(payload_inputs(structure_key, entry_keys_versions))
+        except FileNotFoundError:
+            return None
+        if fingerprint != built_from:
+            return None
+
+        file_name = name + VARIANT_SUFFIXES[(compact, gzipped)]
+        body = self._memory.get(file_name)
+        if body is None:
+            try:
+                with open(os.path.join(self.directory, file_name[:2], file_name), 'rb') as file:
+                    body = file.read()
+            except OSError:
+                return None
+            self._memory.set(file_name, body, len(body))
+        return body
+
+    def read_manifest(self):
+        """
+        Returns the manifest of the last build
+
+        :return: dict of payload name -> `manifest_entry`, empty if there is none
+        :rtype: dict
+        """
+        if self.directory is None:
+            return {}
+        return dict(self._current_manifest())
+
+    def exists(self, name):
+        """
+        Returns True if all variants of a payload are on disk
+
+        :param name: `payload_name` of the payload
+        :rtype: bool
+        """
+        return all(
+            os.path.isfile(os.path.join(self.directory, name[:2], name + suffix))
+            for suffix in VARIANT_SUFFIXES.values()
+        )
+
+    def remove(self, name):
+        """
+        Deletes all variants of a payload
+
+        :param name: `payload_name` of the payload
+        """
+        for suffix in VARIANT_SUFFIXES.values():
+            try:
+                os.remove(os.path.join(self.directory, name[:2], name + suffix))
+            except FileNotFoundError:
+                pass
+
+    def write(self, kind, structure_key, entry_keys_versions, document, manifest):
+        """
+        Writes all variants of an API response and records it in `manifest`
+
+        :param kind: kind of the response, "reference" or "compare"
+        :param structure_key: key of the structure
+        :param entry_keys_versions: list of (entry key, version) tuples
+        :param document: the response document
+        :param manifest: dict of payload name -> `manifest_entry`, saved with
+            `write_manifest` once all payloads are written
+        """
+        name = payload_name(kind, structure_key, entry_keys_versions)
+        directory = os.path.join(self.directory, name[:2])
+        os.makedirs(directory, exist_ok=True)
+        for (compact, gzipped), suffix in VARIANT_SUFFIXES.items():
+            self._write_file(os.path.join(directory, name + suffix),
+                             encode_payload(document, compact, gzipped))
+        inputs = payload_inputs(structure_key, entry_keys_versions)
+        manifest[name] = manifest_entry(inputs_fingerprint(inputs), inputs)
+
+    def write_manifest(self, manifest):
+        """
+        Replaces the manifest, which makes the written payloads servable
+
+        :param manifest: dict of payload name -> `manifest_entry`
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_file(
+            os.path.join(self.directory, MANIFEST_FILE_NAME),
+            json.dumps(manifest, sort_keys=True).encode('UTF-8')
+        )
+
+    @staticmethod
+    def _write_file(path, body):
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(path), delete=False) as file:
+            file.write(body)
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+
+
+api_payloads = PayloadStore(getattr(settings, "API_PAYLOAD_DIR", None))
+
+
+def accepts_gzip(request):
+    """
+    Returns True if the client accepts gzipped responses
+
+    :param request: HttpRequest object
+    :rtype: bool
+    """
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for coding in accept_encoding.split(','):
+        name, _, parameters = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return parameters.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
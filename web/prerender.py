@@ -0,0 +1,284 @@
+"""Reference and compare pages rendered ahead of time to static HTML files"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from urllib.parse import urlencode, urlsplit
+
+import django
+import pygments
+from django.apps import apps
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import reverse
+
+from web.build_manifest import inputs_fingerprint, manifest_fingerprint, template_hashes
+from web.caching import BoundedLRUCache
+from web.corpus import structure_input_hashes
+
+
+MANIFEST_FILE_NAME = "manifest.json"
+PAGE_FILE_NAME = "index.html"
+GZIP_SUFFIX = ".gz"
+# Templates a reference or compare page is rendered from
+PAGE_TEMPLATES = ("base.html", "concepts.html", "concepts_category.html", "concept_card.html")
+# Templates a category loaded by the pages is rendered from
+CATEGORY_TEMPLATES = ("concepts_category.html", "concept_card.html")
+
+
+def page_path(structure_key, entry_keys_versions):
+    """
+    Returns the path of a pre-rendered page below the output directory:
+    reference/<structure>/<entry>/<version>/index.html for one entry and
+    compare/<structure>/<entry1>/<version1>/<entry2>/<version2>/.../index.html
+    for more
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples, which
+        must be known to the catalog
+    :rtype: str
+    """
+    parts = ["reference" if len(entry_keys_versions) == 1 else "compare", structure_key]
+    for entry_key, version in entry_keys_versions:
+        parts += [entry_key, version]
+    return "/".join(parts + [PAGE_FILE_NAME])
+
+
+def page_url(structure_key, entry_keys_versions):
+    """
+    Returns the URL of the live page of a structure of entries
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :rtype: str
+    """
+    view_name = "reference" if len(entry_keys_versions) == 1 else "compare"
+    parameters = [("concept", structure_key)] + [
+        ("entry", f"{entry_key};{version}") for entry_key, version in entry_keys_versions
+    ]
+    return f"{reverse(view_name)}?{urlencode(parameters)}"
+
+
+def page_inputs(structure_key, entry_keys_versions):
+    """
+    Returns the hashes of everything a page is rendered from: the entries'
+    files, the meta files, the templates, the Pygments version and
+    `settings.ETAG_SALT`, which changes when a deploy changes how pages are
+    rendered
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: dict of input name -> hash, or None if the catalog doesn't know
+        an entry's file
+    :rtype: dict
+    """
+    try:
+        inputs = structure_input_hashes(structure_key, entry_keys_versions)
+    except FileNotFoundError:
+        return None
+    inputs.update(template_hashes(PAGE_TEMPLATES))
+    inputs["pygments"] = pygments.__version__
+    inputs["ETAG_SALT"] = getattr(settings, "ETAG_SALT", "")
+    return inputs
+
+
+def page_fingerprint(structure_key, entry_keys_versions):
+    """
+    Returns the `inputs_fingerprint` of a page's `page_inputs`
+
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: the hash, or None if the catalog doesn't know an entry's file
+    :rtype: str
+    """
+    inputs = page_inputs(structure_key, entry_keys_versions)
+    return None if inputs is None else inputs_fingerprint(inputs)
+
+
+class PrerenderedPages:
+    """
+    Directory of reference and compare pages rendered by
+    `python manage.py prerender_pages`, plain and gzipped, with a manifest of
+    the `page_inputs` each page was rendered from. A page is only served while
+    its thesaurus files, templates, Pygments and ETAG_SALT are unchanged.
+    """
+
+    def __init__(self, directory, max_bytes=16 * 1024 * 1024):
+        """
+        Initializes the store
+
+        :param directory: directory of the pages, or None to disable it
+        :param max_bytes: maximum total size of the pages kept in memory
+        """
+        self.directory = directory or None
+        self._memory = BoundedLRUCache(max_bytes)
+        self._manifest = {}
+        self._manifest_signature = None
+        self._lock = threading.Lock()
+
+    def _current_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILE_NAME)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._manifest_signature:
+            with self._lock:
+                if signature != self._manifest_signature:
+                    try:
+                        with open(path, 'r', encoding='UTF-8') as file:
+                            self._manifest = json.load(file)
+                    except (OSError, ValueError) as error:
+                        logging.error(f"Failed to read pre-rendered page manifest {path}: {error}")
+                        self._manifest = {}
+                    self._manifest_signature = signature
+                    self._memory.clear()
+        return self._manifest
+
+    def get(self, structure_key, entry_keys_versions, gzipped=False):
+        """
+        Returns a pre-rendered page, if it is up to date
+
+        :param structure_key: key of the structure
+        :param entry_keys_versions: list of (entry key, version) tuples
+        :param gzipped: True for the gzipped page
+        :return: the page's bytes, or None if there is no up-to-date page
+        :rtype: bytes
+        """
+        if self.directory is None:
+            return None
+        manifest = self._current_manifest()
+        if not manifest:
+            return None
+        # checked against the catalog first, so parameters can't point anywhere else
+        fingerprint = page_fingerprint(structure_key, entry_keys_versions)
+        relative_path = page_path(structure_key, entry_keys_versions)
+        if fingerprint is None or manifest_fingerprint(manifest, relative_path) != fingerprint:
+            return None
+
+        file_path = relative_path + (GZIP_SUFFIX if gzipped else "")
+        body = self._memory.get(file_path)
+        if body is None:
+            try:
+                with open(os.path.join(self.directory, *file_path.split("/")), 'rb') as file:
+                    body = file.read()
+            except OSError:
+                return None
+            self._memory.set(file_path, body, len(body))
+        return body
+
+    def write(self, relative_path, html):
+        """
+        Writes a page and its gzipped copy
+
+        :param relative_path: `page_path` of the page
+        :param html: the rendered page
+        """
+        path = os.path.join(self.directory, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_file(path, html)
+        # mtime=0 keeps the bytes reproducible
+        self._write_file(path + GZIP_SUFFIX, gzip.compress(html, compresslevel=9, mtime=0))
+
+    def read_manifest(self):
+        """
+        Returns the manifest of the last build
+
+        :return: dict of page path -> `manifest_entry`, empty if there is none
+        :rtype: dict
+        """
+        if self.directory is None:
+            return {}
+        return dict(self._current_manifest())
+
+    def exists(self, relative_path):
+        """
+        Returns True if a page and its gzipped copy are on disk
+
+        :param relative_path: `page_path` of the page
+        :rtype: bool
+        """
+        path = os.path.join(self.directory, *relative_path.split("/"))
+        return os.path.isfile(path) and os.path.isfile(path + GZIP_SUFFIX)
+
+    def remove(self, relative_path):
+        """
+        Deletes a page and its gzipped copy
+
+        :param relative_path: `page_path` of the page
+        """
+        path = os.path.join(self.directory, *relative_path.split("/"))
+        for file_path in (path, path + GZIP_SUFFIX):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def write_manifest(self, manifest):
+        """
+        Replaces the manifest, which makes the written pages servable
+
+        :param manifest: dict of page path -> `manifest_entry`
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_file(
+            os.path.join(self.directory, MANIFEST_FILE_NAME),
+            json.dumps(manifest, sort_keys=True, indent=1).encode('UTF-8')
+        )
+
+    @staticmethod
+    def _write_file(path, body):
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(path), delete=False) as file:
+            file.write(body)
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+
+
+prerendered_pages = PrerenderedPages(getattr(settings, "PRERENDER_DIR", None))
+
+
+def init_worker():
+    """Sets up Django in a process of the pool rendering the pages"""
+    if not apps.ready:
+        django.setup()
+
+
+def render_page(directory, base_url, structure_key, entry_keys_versions):
+    """
+    Renders a page with the live view's code and writes it to `directory`.
+    Runs in the processes of `prerender_pages`, so it only takes picklable
+    arguments.
+
+    :param directory: output directory
+    :param base_url: scheme and host the page's absolute links point to
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: tuple of the page's path and its `page_inputs`, or None if the
+        page can't be rendered
+    :rtype: tuple
+    """
+    # pylint: disable=import-outside-toplevel
+    from web.views import concepts_page
+
+    inputs = page_inputs(structure_key, entry_keys_versions)
+    if inputs is None:
+        return None
+    base = urlsplit(base_url)
+    request = RequestFactory().get(
+        page_url(structure_key, entry_keys_versions),
+        secure=base.scheme == "https",
+        HTTP_HOST=base.netloc,
+    )
+    try:
+        response = concepts_page(request)
+    except Exception as e:
+        logging.error(f"Failed to pre-render {structure_key} of {entry_keys_versions}: {e}")
+        return None
+    if response.status_code != 200:
+        return None
+    relative_path = page_path(structure_key, entry_keys_versions)
+    PrerenderedPages(directory).write(relative_path, response.content)
+    return relative_path, inputs
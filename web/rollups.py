@@ -0,0 +1,99 @@
+"""Daily rollups of the visit and lookup analytics, read by the statistics page"""
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+ROLLUP_MODEL_NAMES = (
+    'DailySiteVisits',
+    'DailyEntryLookups',
+    'DailyStructureLookups',
+    'DailyComparisonLookups',
+    'DailyEntryStructureLookups',
+)
+
+
+def _add(counts, model_name, key, amount=1):
+    model_counts = counts.setdefault(model_name, {})
+    model_counts[key] = model_counts.get(key, 0) + amount
+
+
+def rollup_counts(visits, lookups):
+    """
+    Returns the rollup increments for newly written rows
+
+    :param visits: saved SiteVisit instances
+    :param lookups: saved LookupData instances
+    :return: dict of rollup model name -> dict of key tuple -> amount
+    :rtype: dict
+    """
+    counts = {}
+    for visit in visits:
+        _add(counts, 'DailySiteVisits', (timezone.localdate(visit.date_time),))
+    for lookup in lookups:
+        day = timezone.localdate(lookup.date_time)
+        _add(counts, 'DailyStructureLookups', (day, lookup.structure))
+        _add(counts, 'DailyEntryLookups', (day, lookup.entry1))
+        _add(counts, 'DailyEntryStructureLookups', (day, lookup.entry1, lookup.structure))
+        if lookup.entry2:
+            _add(counts, 'DailyEntryLookups', (day, lookup.entry2))
+            _add(counts, 'DailyEntryStructureLookups', (day, lookup.entry2, lookup.structure))
+            _add(counts, 'DailyComparisonLookups', (day, lookup.entry1, lookup.entry2))
+    return counts
+
+
+def rebuild_rollups(apps=global_apps, since=None):
+    """
+    Recomputes the rollups from the raw SiteVisit and LookupData tables with
+    GROUP BY queries in the database, e.g. to backfill them
+
+    :param apps: app registry to get the models from (a migration's `apps`)
+    :param since: optional date; only days from this one on are recomputed
+    :return: dict of rollup model name -> number of rows written
+    :rtype: dict
+    """
+    site_visit_model = apps.get_model('web', 'SiteVisit')
+    lookup_model = apps.get_model('web', 'LookupData')
+
+    visits = site_visit_model.objects.all()
+    lookups = lookup_model.objects.all()
+    if since is not None:
+        visits = visits.filter(date_time__date__gte=since)
+        lookups = lookups.filter(date_time__date__gte=since)
+    visits = visits.annotate(day=TruncDate('date_time'))
+    lookups = lookups.annotate(day=TruncDate('date_time'))
+    comparisons = lookups.exclude(entry2='')
+
+    counts = {name: {} for name in ROLLUP_MODEL_NAMES}
+    grouped_queries = (
+        ('DailySiteVisits', visits, ('day',)),
+        ('DailyStructureLookups', lookups, ('day', 'structure')),
+        ('DailyEntryLookups', lookups, ('day', 'entry1')),
+        ('DailyEntryLookups', comparisons, ('day', 'entry2')),
+        ('DailyEntryStructureLookups', lookups, ('day', 'entry1', 'structure')),
+        ('DailyEntryStructureLookups', comparisons, ('day', 'entry2', 'structure')),
+        ('DailyComparisonLookups', comparisons, ('day', 'entry1', 'entry2')),
+    )
+    for model_name, queryset, fields in grouped_queries:
+        rows = queryset.values(*fields).annotate(rollup_count=Count('id')).order_by()
+        for row in rows.iterator():
+            _add(counts, model_name, tuple(row[field] for field in fields), row['rollup_count'])
+
+    written = {}
+    with transaction.atomic():
+        for model_name, model_counts in counts.items():
+            model = apps.get_model('web', model_name)
+            existing = model.objects.all()
+            if since is not None:
+                existing = existing.filter(day__gte=since)
+            existing.delete()
+            key_fields = [field.name for field in model._meta.fields
+                          if field.name not in ('id', 'count')]
+            model.objects.bulk_create([
+                model(**dict(zip(key_fields, key)), count=count)
+                for key, count in model_counts.items()
+            ], batch_size=1000)
+            written[model_name] = len(model_counts)
+    return written
@@ -0,0 +1,266 @@
+"""Full-text search over the concept names, code and comments of the thesauruses"""
+import heapq
+import math
+import re
+import threading
+from collections import namedtuple
+from itertools import islice
+
+from web.concept_index import get_concept_index
+from web.corpus import load_meta_structure
+
+
+class SearchDocument(namedtuple("SearchDocument", [
+        "entry_key", "version", "structure_key", "concept_key", "concept_name", "code", "comment"])):
+    """One concept of one entry version, the unit search results are ranked in"""
+    __slots__ = ()
+
+
+# Runs of letters, digits and underscores, i.e. identifiers and words
+IDENTIFIER_RE = re.compile(r"[A-Za-z0-9_]+")
+# Parts of an identifier: "parseHTTPRequest2" -> "parse", "HTTP", "Request", "2"
+IDENTIFIER_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+# Words of comments that would match almost every document
+STOP_WORDS = frozenset((
+    "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "if", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "with",
+))
+
+# How much a match in each field counts; each field is scored with BM25 on its
+# own and the weighted scores are added up
+FIELD_WEIGHTS = (("concept_name", 3), ("code", 1), ("comment", 1))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# How much a term containing a query token counts, relative to the token
+PREFIX_MATCH_WEIGHT = 0.6
+INFIX_MATCH_WEIGHT = 0.4
+# Query tokens shorter than this only match exactly
+MIN_EXPANSION_LENGTH = 3
+# Maximum number of vocabulary terms a query token expands to, shortest first
+MAX_EXPANSIONS = 16
+# Maximum number of postings read per term (of the documents passing the
+# filters). Postings are ordered by impact, so this only drops the
+# lowest-ranked documents of very common terms.
+MAX_POSTINGS_PER_TERM = 2000
+
+
+def tokenize(text, whole_identifiers=True):
+    """
+    Splits text into lowercase search terms. Identifiers are split at
+    underscores, case changes and digits ("str_len", "strLen" -> "str", "len")
+    and, with `whole_identifiers`, also kept as one term ("str_len", "strlen").
+    Terms shorter than two characters and stop words are dropped.
+
+    :param text: text to split
+    :param whole_identifiers: False to only return the parts of identifiers,
+        as for queries
+    :return: list of terms in the order they appear
+    :rtype: list
+    """
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        parts = IDENTIFIER_PART_RE.findall(identifier)
+        for part in parts:
+            part = part.lower()
+            if len(part) > 1 and part not in STOP_WORDS:
+                terms.append(part)
+        if whole_identifiers and len(parts) > 1:
+            terms.append(identifier.strip("_").lower())
+            if "_" in identifier:
+                terms.append(identifier.replace("_", "").lower())
+    return terms
+
+
+def iter_search_documents(concept_index):
+    """
+    Yields a SearchDocument for every implemented or commented concept of
+    every entry version
+
+    :param concept_index: ConceptIndex with the concepts of all entries
+    :rtype: iterator of SearchDocument
+    """
+    concept_names = {}
+    for structure_key, concept_key in concept_index.postings:
+        if structure_key not in concept_names:
+            try:
+                categories = load_meta_structure(structure_key)["categories"]
+            except FileNotFoundError:
+                categories = {}
+            concept_names[structure_key] = {
+                key: name for category in categories.values() for key, name in category.items()
+            }
+    for (structure_key, concept_key), postings in concept_index.postings.items():
+        concept_name = concept_names[structure_key].get(concept_key, concept_key)
+        for posting in postings:
+            code, comment = posting.code, posting.comment
+            if code or comment:
+                yield SearchDocument(
+                    posting.entry_key, posting.version, structure_key, concept_key,
+                    concept_name, code, comment)
+
+
+class SearchIndex:
+    """
+    Inverted index from each term to the documents containing it, ranked with
+    BM25 per field (see FIELD_WEIGHTS). The score of each (term, document)
+    pair is computed when the index is built, so a query only adds up
+    precomputed impacts.
+
+    Query tokens also match the vocabulary terms containing them ("len" finds
+    "strlen" and "length", with a lower weight), found with a trigram index
+    over the vocabulary.
+    """
+
+    def __init__(self, documents, signature=None):
+        """
+        Builds the index
+
+        :param documents: iterable of SearchDocuments
+        :param signature: signature of the corpus the documents were read from
+        """
+        self.signature = signature
+        self.documents = []
+        # term -> doc id -> frequency in each field
+        term_frequencies = {}
+        # length of each field of each document
+        lengths = []
+        for document in documents:
+            doc_id = len(self.documents)
+            self.documents.append(document)
+            field_lengths = []
+            for field_index, (field, _) in enumerate(FIELD_WEIGHTS):
+                terms = tokenize(getattr(document, field))
+                for term in terms:
+                    frequencies = term_frequencies.setdefault(term, {}).setdefault(
+                        doc_id, [0] * len(FIELD_WEIGHTS))
+                    frequencies[field_index] += 1
+                field_lengths.append(len(terms))
+            lengths.append(field_lengths)
+
+        count = len(self.documents)
+        average_lengths = [
+            max(sum(field_lengths[field_index] for field_lengths in lengths) / count, 1) if count else 1
+            for field_index in range(len(FIELD_WEIGHTS))
+        ]
+        self.postings = {}
+        for term, postings in term_frequencies.items():
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            impacts = []
+            for doc_id, frequencies in postings.items():
+                impact = 0.0
+                for field_index, frequency in enumerate(frequencies):
+                    if frequency:
+                        length_ratio = lengths[doc_id][field_index] / average_lengths[field_index]
+                        impact += FIELD_WEIGHTS[field_index][1] * frequency * (BM25_K1 + 1) / (
+                            frequency + BM25_K1 * (1 - BM25_B + BM25_B * length_ratio))
+                impacts.append((idf * impact, doc_id))
+            impacts.sort(reverse=True)
+            self.postings[term] = (
+                [doc_id for _, doc_id in impacts],
+                [impact for impact, _ in impacts],
+            )
+
+        self.trigrams = {}
+        for term in self.postings:
+            for start in range(len(term) - 2):
+                self.trigrams.setdefault(term[start:start + 3], set()).add(term)
+
+    @classmethod
+    def build(cls, concept_index):
+        """
+        Builds the index of all concepts of the concept index
+
+        :param concept_index: ConceptIndex with the concepts of all entries
+        :rtype: SearchIndex
+        """
+        return cls(iter_search_documents(concept_index), concept_index.signature)
+
+    def expand(self, token):
+        """
+        Returns the vocabulary terms a query token matches
+
+        :param token: lowercase query token
+        :return: list of (term, weight) tuples, the token itself first
+        :rtype: list
+        """
+        expansions = [(token, 1.0)] if token in self.postings else []
+        if len(token) < MIN_EXPANSION_LENGTH:
+            return expansions
+        candidates = None
+        for start in range(len(token) - 2):
+            terms = self.trigrams.get(token[start:start + 3])
+            if not terms:
+                return expansions
+            if candidates is None or len(terms) < len(candidates):
+                candidates = terms
+        matches = sorted(
+            (term for term in candidates if token in term and term != token),
+            key=lambda term: (len(term), term)
+        )
+        for term in matches[:MAX_EXPANSIONS]:
+            weight = PREFIX_MATCH_WEIGHT if term.startswith(token) else INFIX_MATCH_WEIGHT
+            expansions.append((term, weight))
+        return expansions
+
+    def search(self, query, limit=20, structure_key=None, entry_key=None):
+        """
+        Returns the documents that best match a query
+
+        :param query: the query text
+        :param limit: maximum number of results
+        :param structure_key: only return documents of this structure
+        :param entry_key: only return documents of this entry
+        :return: list of (score, SearchDocument) tuples, best first
+        :rtype: list
+        """
+        documents = self.documents
+        filtered = structure_key is not None or entry_key is not None
+        scores = {}
+        for token in dict.fromkeys(tokenize(query, whole_identifiers=False)):
+            for term, weight in self.expand(token):
+                postings = zip(*self.postings[term])
+                if filtered:
+                    # before the budget, so it isn't spent on documents that are dropped anyway
+                    postings = (
+                        (doc_id, impact) for doc_id, impact in postings
+                        if (structure_key is None or documents[doc_id].structure_key == structure_key)
+                        and (entry_key is None or documents[doc_id].entry_key == entry_key)
+                    )
+                for doc_id, impact in islice(postings, MAX_POSTINGS_PER_TERM):
+                    scores[doc_id] = scores.get(doc_id, 0.0) + impact * weight
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, documents[doc_id]) for doc_id, score in best]
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_search_index():
+    """
+    Returns the search index, building it on first use and rebuilding it
+    whenever the concept index it is built from changes
+
+    :rtype: SearchIndex
+    """
+    global _index
+    concept_index = get_concept_index()
+    index = _index
+    if index is not None and index.signature == concept_index.signature:
+        return index
+    with _index_lock:
+        if _index is None or _index.signature != concept_index.signature:
+            _index = SearchIndex.build(concept_index)
+        return _index
+
+
+def reset_search_index():
+    """Forgets the index so the next `get_search_index` builds it again"""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,45 @@
+// Loads the categories of the compare/reference page that weren't rendered
+// with it, as they're scrolled to or their button is clicked
+function loadCategory(placeholder) {
+    if (placeholder.dataset.loading) {
+        return;
+    }
+    placeholder.dataset.loading = "true";
+    fetch(placeholder.dataset.url).then(function (response) {
+        if (!response.ok) {
+            throw new Error(`${response.status} ${response.statusText}`);
+        }
+        return response.text();
+    }).then(function (html) {
+        placeholder.outerHTML = html;
+    }).catch(function (error) {
+        delete placeholder.dataset.loading;
+        console.log(error);
+    });
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+    const placeholders = document.querySelectorAll(".lazy-category");
+
+    placeholders.forEach(function (placeholder) {
+        placeholder.querySelector("button").addEventListener("click", function () {
+            loadCategory(placeholder);
+        });
+    });
+
+    if (!("IntersectionObserver" in window)) {
+        return;
+    }
+    // starts loading a bit before the category comes into view
+    const observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                loadCategory(entry.target);
+            }
+        });
+    }, { rootMargin: "400px 0px" });
+    placeholders.forEach(function (placeholder) {
+        observer.observe(placeholder);
+    });
+});
@@ -0,0 +1,191 @@
+"""Tests for the write-behind analytics writer"""
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from web.analytics import AnalyticsWriter, CounterIncrement, increment_counters
+from web.models import (
+    DailyComparisonLookups,
+    DailyEntryLookups,
+    DailyEntryStructureLookups,
+    DailySiteVisits,
+    DailyStructureLookups,
+    LookupData,
+    MissingLookup,
+    MissingLookupCount,
+    SiteVisit,
+)
+from web.rollups import ROLLUP_MODEL_NAMES, rebuild_rollups
+
+
+def raw_inserts(queries):
+    """Returns the captured INSERTs of raw analytics rows, without the rollups"""
+    return [
+        query for query in queries
+        if query['sql'].startswith('INSERT') and 'web_daily' not in query['sql']
+    ]
+
+
+class TestAnalyticsWriter(TestCase):
+    """TestCase for AnalyticsWriter"""
+
+    def setUp(self):
+        self.writer = AnalyticsWriter(max_backlog=3, batch_size=10, flush_seconds=60)
+        # flush from the test's thread instead of the background thread
+        patcher = mock.patch.object(self.writer, "_ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rows_are_written_on_flush(self):
+        """test that queued rows are only written when flushed, visits first"""
+        visit = SiteVisit(url="/", user_agent="", referer="")
+        self.writer.add(visit)
+        self.writer.add(LookupData(
+            entry1="python", version1="3", entry2="", version2="",
+            structure="strings", site_visit=visit
+        ))
+        self.writer.add(MissingLookup(
+            item_type="concept", item_value="x", language_context="python", site_visit=visit
+        ))
+        self.assertEqual(SiteVisit.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.writer.flush()
+        inserts = raw_inserts(queries)
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(SiteVisit.objects.count(), 1)
+        self.assertEqual(LookupData.objects.get().site_visit_id, visit.pk)
+        self.assertEqual(MissingLookup.objects.get().site_visit_id, visit.pk)
+        self.assertEqual(self.writer.written, 3)
+
+    def test_full_backlog_drops_new_rows(self):
+        """test that rows beyond the backlog bound are dropped and counted"""
+        for _ in range(3):
+            self.assertTrue(self.writer.add(SiteVisit(url="/", user_agent="", referer="")))
+        dropped_visit = SiteVisit(url="/dropped", user_agent="", referer="")
+        self.assertFalse(self.writer.add(dropped_visit))
+        self.assertEqual(self.writer.dropped, 1)
+
+        self.writer.flush()
+        self.writer.write([MissingLookup(
+            item_type="concept", item_value="x", site_visit=dropped_visit
+        )])
+        self.assertEqual(SiteVisit.objects.count(), 3)
+        self.assertEqual(MissingLookup.objects.count(), 0)
+
+    def test_unbuffered_writes_immediately(self):
+        """test that an unbuffered writer writes in the calling thread"""
+        writer = AnalyticsWriter(max_backlog=3, batch_size=10, flush_seconds=60, buffered=False)
+        writer.add(SiteVisit(url="/", user_agent="", referer=""))
+        self.assertEqual(SiteVisit.objects.count(), 1)
+
+    def test_views_record_visits_and_lookups(self):
+        """test that a comparison records its visit and lookup"""
+        url = reverse('index') + '?concept=data_types&entry=python%3B3&entry=java%3B17'
+        self.client.get(url)
+        lookup = LookupData.objects.get()
+        self.assertEqual((lookup.entry1, lookup.entry2), ("python", "java"))
+        self.assertEqual(lookup.site_visit.url, url)
+
+    def test_counter_increments_are_merged(self):
+        """test that queued counter increments are summed and upserted"""
+        self.writer.add(CounterIncrement(MissingLookupCount, {("concept", "a", "python"): 1}))
+        self.writer.add(CounterIncrement(MissingLookupCount, {
+            ("concept", "a", "python"): 1,
+            ("concept", "b", "python"): 1,
+        }))
+        self.writer.flush()
+        increment_counters(MissingLookupCount, {("concept", "a", "python"): 3})
+
+        counts = dict(MissingLookupCount.objects.values_list("item_value", "count"))
+        self.assertEqual(counts, {"a": 5, "b": 1})
+
+    def test_missing_concepts_counted_once_per_request(self):
+        """test that a comparison counts missing concepts without a row per concept"""
+        url = reverse('compare') + '?concept=strings&entry=python%3B3&entry=c%3B17'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        inserts = raw_inserts(queries)
+
+        missing = MissingLookupCount.objects.filter(item_type="concept")
+        self.assertGreater(missing.count(), 1)
+        self.assertEqual(set(missing.values_list("count", flat=True)), {1})
+        self.assertEqual(MissingLookup.objects.count(), 0)
+        # the visit, the lookup and one insert of all missing counters
+        self.assertEqual(len(inserts), 3)
+
+
+class TestRollups(TestCase):
+    """TestCase for the daily rollups of the analytics"""
+
+    def setUp(self):
+        self.writer = AnalyticsWriter(max_backlog=10, batch_size=10, flush_seconds=60)
+        patcher = mock.patch.object(self.writer, "_ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def queue_lookup(self, entry1, entry2, structure):
+        visit = SiteVisit(url="/", user_agent="", referer="")
+        self.writer.add(visit)
+        self.writer.add(LookupData(
+            entry1=entry1, version1="1", entry2=entry2, version2="1" if entry2 else "",
+            structure=structure, site_visit=visit
+        ))
+
+    def rollup_rows(self):
+        return {
+            name: sorted(apps.get_model('web', name).objects.values_list(
+                *[field.name for field in apps.get_model('web', name)._meta.fields
+                  if field.name != 'id']))
+            for name in ROLLUP_MODEL_NAMES
+        }
+
+    def test_writes_increment_rollups(self):
+        """test that written visits and lookups are counted in the rollups"""
+        self.queue_lookup("python", "java", "strings")
+        self.queue_lookup("python", "", "strings")
+        self.writer.flush()
+        self.queue_lookup("java", "python", "data_types")
+        self.writer.flush()
+
+        self.assertEqual(DailySiteVisits.objects.get().count, 3)
+        self.assertEqual(
+            dict(DailyEntryLookups.objects.values_list("entry", "count")),
+            {"python": 3, "java": 2}
+        )
+        self.assertEqual(
+            dict(DailyStructureLookups.objects.values_list("structure", "count")),
+            {"strings": 2, "data_types": 1}
+        )
+        self.assertEqual(DailyComparisonLookups.objects.count(), 2)
+        self.assertEqual(
+            DailyEntryStructureLookups.objects.get(entry="python", structure="strings").count, 2
+        )
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """test that rebuilding from the raw rows gives the incremental counts"""
+        self.queue_lookup("python", "java", "strings")
+        self.queue_lookup("python", "", "strings")
+        self.queue_lookup("java", "python", "data_types")
+        self.writer.flush()
+        incremental = self.rollup_rows()
+
+        rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_statistics_reads_rollups(self):
+        """test that the statistics page shows the rolled up counts"""
+        self.queue_lookup("python", "java", "strings")
+        self.queue_lookup("python", "", "strings")
+        self.writer.flush()
+
+        response = self.client.get(reverse('statistics'))
+        self.assertEqual(response.context['total_lookups'], 2)
+        self.assertEqual(response.context['popular_languages'][0], {'name': 'Python', 'count': 2})
+        self.assertEqual(response.context['popular_structures'][0]['count'], 2)
+        self.assertEqual(response.context['unique_comparisons_count'], 1)
+        self.assertEqual(response.context['popular_concept_langs'][0]['count'], 2)
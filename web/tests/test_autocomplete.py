@@ -0,0 +1,91 @@
+"""Tests for the autocomplete of entry, structure and concept names"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from web.autocomplete import AutocompleteIndex, AutocompleteItem, deletions, typo_distance
+
+
+class TestAutocompleteIndex(SimpleTestCase):
+    """TestCase for completing prefixes and typos with the AutocompleteIndex"""
+
+    def setUp(self):
+        self.index = AutocompleteIndex([
+            AutocompleteItem("entry", "javascript", "JavaScript", None, ("ECMAScript 2023",)),
+            AutocompleteItem("entry", "java", "Java", None, ("17",)),
+            AutocompleteItem("entry", "cpp", "C++", None, ("20",)),
+            AutocompleteItem("structure", "lists", "Arrays and Hashed Lists", None, None),
+            AutocompleteItem("concept", "create_dictionary", "Create a dictionary", "lists", None),
+            AutocompleteItem("concept", "length_of_string", "Length of string", "strings", None),
+        ])
+
+    def names(self, query, **kwargs):
+        """Returns the names of the completions of `query`"""
+        return [item.name for _, item in self.index.complete(query, **kwargs)]
+
+    def test_prefixes(self):
+        """test that prefixes of any word of a name or key complete it"""
+        self.assertEqual(self.names("ja"), ["Java", "JavaScript"])
+        self.assertEqual(self.names("java"), ["Java", "JavaScript"])
+        self.assertEqual(self.names("javas")[0], "JavaScript")
+        self.assertEqual(self.names("c++"), ["C++"])
+        self.assertEqual(self.names("cpp"), ["C++"])
+        self.assertEqual(self.names("len of"), ["Length of string"])
+        self.assertEqual(self.names("of len"), ["Length of string"])
+        self.assertEqual(self.names("xyz"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_typos(self):
+        """test that misspelled words and starts of words are completed"""
+        self.assertEqual(self.names("javscript"), ["JavaScript"])
+        self.assertEqual(self.names("dictonary"), ["Create a dictionary"])
+        self.assertEqual(self.names("lenght of strng"), ["Length of string"])
+        self.assertEqual(self.names("hsahed"), ["Arrays and Hashed Lists"])
+        self.assertEqual(self.names("jvaa"), ["Java", "JavaScript"])
+
+    def test_long_words_only_match_exactly(self):
+        """test that words longer than any name's words aren't matched with typos"""
+        with mock.patch("web.autocomplete.deletions", wraps=deletions) as deletions_mock:
+            self.assertEqual(self.names("x" * 1500), [])
+            self.assertEqual(self.names("dictionaryyyyyyy"), [])
+        deletions_mock.assert_not_called()
+
+    def test_ranking_and_filters(self):
+        """test that exact words rank above prefixes and typos, and the filters"""
+        scores = dict((item.key, score) for score, item in self.index.complete("java"))
+        self.assertGreater(scores["java"], scores["javascript"])
+        self.assertEqual(self.names("ja", limit=1), ["Java"])
+        self.assertEqual(self.names("a", kind="structure"), ["Arrays and Hashed Lists"])
+
+    def test_typo_distance(self):
+        """test the typo distance to words and their starts"""
+        self.assertEqual(typo_distance("pyhton", "python"), 1)
+        self.assertEqual(typo_distance("javasrc", "javascript"), 1)
+        self.assertEqual(typo_distance("dictonary", "dictionary"), 1)
+        self.assertEqual(typo_distance("abc", "xyz"), 3)
+
+
+class TestAutocompleteView(TestCase):
+    """TestCase for the autocomplete API"""
+
+    def test_api_autocomplete(self):
+        """test that the API completes names of the thesauruses"""
+        response = self.client.get(reverse('api.autocomplete'), {'q': 'pyhton'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = response.json()['results'][0]
+        self.assertEqual((result['type'], result['key'], result['name']), ('entry', 'python', 'Python'))
+        self.assertIn('3', result['versions'])
+
+        response = self.client.get(reverse('api.autocomplete'), {'q': 'length of str', 'type': 'concept'})
+        results = response.json()['results']
+        self.assertEqual(results[0]['key'], 'length_of_string')
+        self.assertEqual(results[0]['structure'], 'strings')
+
+        response = self.client.get(reverse('api.autocomplete'), {'q': 'py', 'type': 'language'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(reverse('api.autocomplete'))
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('api.autocomplete'), {'q': 'python ' * 50})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
@@ -0,0 +1,161 @@
+"""Tests for the in-process caches"""
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from web.caching import BoundedLRUCache, RefreshingValue
+from web.corpus import DocumentCache
+
+
+class TestBoundedLRUCache(SimpleTestCase):
+    """TestCase for BoundedLRUCache"""
+
+    def test_hits_and_misses(self):
+        """test that lookups are counted"""
+        cache = BoundedLRUCache(10)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1, 1)
+        self.assertEqual(cache.get("a"), 1)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        """test that the size bound evicts the least recently used value"""
+        cache = BoundedLRUCache(10)
+        cache.set("a", "a", 4)
+        cache.set("b", "b", 4)
+        cache.get("a")
+        cache.set("c", "c", 4)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.get("c"), "c")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["size"], 8)
+
+    def test_oversized_values_are_not_cached(self):
+        """test that a value larger than the whole cache is skipped"""
+        cache = BoundedLRUCache(10)
+        cache.set("a", "a", 11)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_values_are_dropped(self):
+        """test that values failing validation count as misses"""
+        cache = BoundedLRUCache(10)
+        cache.set("a", 1, 1)
+        self.assertIsNone(cache.get("a", is_valid=lambda value: value == 2))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+class TestDocumentCache(SimpleTestCase):
+    """TestCase for DocumentCache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "doc.json")
+        self.write({"concepts": {"a": {"code": "1"}}})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, document, mtime_ns=None):
+        with open(self.path, 'w', encoding='UTF-8') as file:
+            json.dump(document, file)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_cached_until_file_changes(self):
+        """test that a file is parsed once and re-read after it changed"""
+        cache = DocumentCache(1024)
+        first = cache.load("doc", self.path)
+        self.assertIs(cache.load("doc", self.path), first)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        self.write({"concepts": {"a": {"code": "2"}}}, mtime_ns=os.stat(self.path).st_mtime_ns + 10**9)
+        self.assertEqual(cache.load("doc", self.path)["concepts"]["a"]["code"], "2")
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_missing_file_raises(self):
+        """test that a missing file raises FileNotFoundError"""
+        cache = DocumentCache(1024)
+        with self.assertRaises(FileNotFoundError):
+            cache.load("missing", os.path.join(self.tmp_dir.name, "missing.json"))
+
+
+class TestRefreshingValue(SimpleTestCase):
+    """TestCase for RefreshingValue"""
+
+    def setUp(self):
+        self.now = 0
+        patcher = mock.patch("web.caching.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # the background refresh closes the thread's database connection
+        patcher = mock.patch("web.caching.connection")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fresh_value_is_reused(self):
+        """test that the value is computed once while it is fresh"""
+        compute = mock.Mock(return_value="value")
+        value = RefreshingValue(compute, max_age=10)
+        self.assertEqual(value.get(), "value")
+        self.now = 9
+        self.assertEqual(value.get(), "value")
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(value.hits, 1)
+
+    def test_stale_value_is_served_during_one_refresh(self):
+        """test that stale gets return the old value and start a single refresh"""
+        release = threading.Event()
+        results = iter(["old", "new"])
+
+        def compute():
+            result = next(results)
+            if result == "new":
+                release.wait(5)
+            return result
+
+        value = RefreshingValue(compute, max_age=10)
+        value.get()
+        self.now = 11
+        threads_before = threading.active_count()
+        self.assertEqual(value.get(), "old")
+        self.assertEqual(value.get(), "old")
+        self.assertLessEqual(threading.active_count(), threads_before + 1)
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == "refreshing-value":
+                thread.join(5)
+        self.assertEqual(value.get(), "new")
+        self.assertEqual(value.computations, 2)
+        self.assertEqual(value.stale_hits, 2)
+
+    def test_concurrent_first_gets_compute_once(self):
+        """test that requests waiting for the first value share one computation"""
+        started = threading.Event()
+        release = threading.Event()
+        compute = mock.Mock(side_effect=lambda: (started.set(), release.wait(5), "value")[-1])
+        value = RefreshingValue(compute, max_age=10)
+
+        threads = [threading.Thread(target=value.get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(compute.call_count, 1)
+
+    def test_zero_max_age_always_computes(self):
+        """test that caching is disabled without a freshness window"""
+        compute = mock.Mock(return_value="value")
+        value = RefreshingValue(compute, max_age=0)
+        value.get()
+        value.get()
+        self.assertEqual(compute.call_count, 2)
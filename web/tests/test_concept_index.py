@@ -0,0 +1,81 @@
+"""Tests for the inverted index of concepts"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from web.concept_index import ConceptIndex, get_concept_index
+from web.corpus import get_catalog
+from web.models import ThesaurusEntry
+
+
+class TestConceptIndex(TestCase):
+    """TestCase for ConceptIndex and the views reading it"""
+
+    def test_postings_match_entry_files(self):
+        """test that every posting agrees with the entry's loaded file"""
+        index = ConceptIndex.build(get_catalog())
+        postings = index.lookup("strings", "concatenate_two_strings")
+        catalog = get_catalog()
+        self.assertEqual(
+            [(posting.entry_key, posting.version) for posting in postings],
+            [
+                (entry_key, version)
+                for entry_key in sorted(catalog.entry_versions)
+                for version in catalog.entry_versions[entry_key]
+                if catalog.availability.has(entry_key, version, "strings")
+            ]
+        )
+        for posting in postings:
+            entry = ThesaurusEntry(posting.entry_key, "")
+            entry.load_concepts("strings", posting.version)
+            self.assertEqual(posting.known, not entry.concept_unknown("concatenate_two_strings"))
+            self.assertEqual(posting.implemented, posting.known and
+                             entry.concept_implemented("concatenate_two_strings"))
+            if posting.implemented:
+                self.assertEqual(posting.code, entry.concept_code("concatenate_two_strings") or "")
+        self.assertEqual(index.lookup("strings", "notaconcept"), ())
+
+    def test_rebuilt_when_files_change(self):
+        """test that a changed corpus signature rebuilds the index"""
+        index = get_concept_index()
+        with mock.patch("web.concept_index.corpus_signature", return_value="changed"), \
+                self.settings(THESAURUS_CATALOG_RECHECK_SECONDS=0):
+            self.assertIsNot(get_concept_index(), index)
+            self.assertIs(get_concept_index(), get_concept_index())
+
+    def test_api_reads_index_only(self):
+        """test that the API answers from the index without loading files"""
+        get_concept_index()
+        url = reverse('api.concept', kwargs={
+            'structure_key': 'strings',
+            'concept_key': 'concatenate_two_strings'
+        })
+        with mock.patch("web.concept_index.load_entry_document") as load_entry_document:
+            response = self.client.get(url)
+        load_entry_document.assert_not_called()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response_data = response.json()
+        self.assertEqual(response_data['meta']['concept'], 'concatenate_two_strings')
+        python = [entry for entry in response_data['entries'] if entry['entry'] == 'python']
+        self.assertTrue(python and python[0]['implemented'])
+
+        url = reverse('api.concept', kwargs={'structure_key': 'strings', 'concept_key': 'nope'})
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_concept_page(self):
+        """test the page showing a concept in every language"""
+        url = reverse('concept', kwargs={
+            'structure_key': 'strings',
+            'concept_key': 'concatenate_two_strings'
+        })
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateUsed(response, 'concept.html')
+        self.assertContains(response, 'Python (3)')
+        self.assertEqual(len(response.context['entries']), len(
+            get_concept_index().lookup('strings', 'concatenate_two_strings')))
+
+        url = reverse('concept', kwargs={'structure_key': 'nope', 'concept_key': 'nope'})
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
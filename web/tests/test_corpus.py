@@ -0,0 +1,197 @@
+"""Tests for the compiled thesaurus snapshot"""
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from web.corpus import (
+    AvailabilityMatrix,
+    Catalog,
+    CorpusSnapshot,
+    file_fingerprint,
+    get_snapshot,
+    reset_snapshot,
+    structure_fingerprint,
+)
+from web.models import ThesaurusEntry, ThesaurusMetaInfo
+
+
+class TestCorpusSnapshot(TestCase):
+    """TestCase for CorpusSnapshot and serving the models from it"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.snapshot = CorpusSnapshot.compile()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.snapshot_path = os.path.join(cls.tmp_dir.name, "thesauruses.snapshot")
+        cls.snapshot.dump(cls.snapshot_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+        super().tearDownClass()
+
+    def tearDown(self):
+        reset_snapshot()
+
+    def test_compile_reads_all_files(self):
+        """test that the snapshot contains the meta info, structures and entries"""
+        with open("web/thesauruses/meta_info.json", 'r', encoding='UTF-8') as meta_file:
+            self.assertEqual(self.snapshot.meta_info, json.load(meta_file))
+        self.assertIn("strings", self.snapshot.meta_structures)
+        self.assertEqual(self.snapshot.entry_categories["mysql"], "databases")
+        with open("web/thesauruses/langs/python/3/strings.json", 'r', encoding='UTF-8') as file:
+            self.assertEqual(self.snapshot.entry_document("python", "3", "strings"), json.load(file))
+
+    def test_content_hash_is_stable(self):
+        """test that compiling the same files twice gives the same hash"""
+        self.assertEqual(CorpusSnapshot.compile().content_hash, self.snapshot.content_hash)
+        self.assertEqual(len(self.snapshot.content_hash), 64)
+
+    def test_dump_and_load_round_trip(self):
+        """test that a dumped snapshot loads back identically"""
+        loaded = CorpusSnapshot.load(self.snapshot_path)
+        self.assertEqual(loaded.content_hash, self.snapshot.content_hash)
+        self.assertEqual(loaded.documents, self.snapshot.documents)
+
+    def test_missing_document_raises_file_not_found(self):
+        """test that unknown entry files raise the same error as a missing file"""
+        with self.assertRaises(FileNotFoundError):
+            self.snapshot.entry_document("python", "non_existent_version", "strings")
+        with self.assertRaises(FileNotFoundError):
+            self.snapshot.meta_structure("notastructure")
+
+    def test_models_served_from_snapshot(self):
+        """test that the models read from the snapshot when one is configured"""
+        with override_settings(THESAURUS_SNAPSHOT_PATH=self.snapshot_path):
+            reset_snapshot()
+            self.assertIsNotNone(get_snapshot())
+
+            metainfo = ThesaurusMetaInfo()
+            self.assertEqual(metainfo.entry_name("python"), "Python")
+            structure = metainfo.structure("data_types")
+            self.assertEqual(
+                structure.categories,
+                self.snapshot.meta_structures["data_types"]["categories"]
+            )
+            entry = ThesaurusEntry("python", "Python")
+            entry.load_concepts("data_types", "3")
+            self.assertIn("boolean", entry.concepts)
+            self.assertRaises(FileNotFoundError, entry.load_concepts, "data_types", "nope")
+
+    def test_fingerprints_match_files(self):
+        """test that the snapshot's fingerprints are those of the loose files"""
+        relative_path = os.path.join("langs", "python", "3", "strings.json")
+        self.assertEqual(self.snapshot.fingerprints[relative_path], file_fingerprint(relative_path))
+        without_snapshot = structure_fingerprint("strings", [("python", "3")])
+        with override_settings(THESAURUS_SNAPSHOT_PATH=self.snapshot_path):
+            reset_snapshot()
+            self.assertEqual(structure_fingerprint("strings", [("python", "3")]), without_snapshot)
+        self.assertNotEqual(structure_fingerprint("strings", [("java", "17")]), without_snapshot)
+        with self.assertRaises(FileNotFoundError):
+            structure_fingerprint("strings", [("python", "..")])
+
+    def test_stale_files(self):
+        """test that added, removed and changed files are found, but not touched ones"""
+        root = os.path.join(self.tmp_dir.name, "thesauruses")
+        shutil.copytree("web/thesauruses", root)
+        snapshot = CorpusSnapshot.compile(root)
+        self.assertEqual(snapshot.stale_files(root), [])
+
+        changed = os.path.join("langs", "python", "3", "strings.json")
+        touched = os.path.join("langs", "java", "17", "strings.json")
+        added = os.path.join("langs", "python", "4", "strings.json")
+        removed = os.path.join("_meta", "strings.json")
+        with open(os.path.join(root, changed), 'a', encoding='UTF-8') as file:
+            file.write("\n")
+        os.utime(os.path.join(root, touched), (0, 0))
+        os.makedirs(os.path.dirname(os.path.join(root, added)))
+        shutil.copy(os.path.join(root, changed), os.path.join(root, added))
+        os.remove(os.path.join(root, removed))
+        self.assertEqual(snapshot.stale_files(root), sorted([changed, added, removed]))
+
+    def test_stale_snapshot_falls_back_to_files(self):
+        """test that a snapshot of other files than the loose ones is not used"""
+        with override_settings(THESAURUS_SNAPSHOT_PATH=self.snapshot_path), \
+                mock.patch.object(CorpusSnapshot, "stale_files", return_value=["meta_info.json"]):
+            reset_snapshot()
+            with self.assertLogs(level="WARNING") as logs:
+                self.assertIsNone(get_snapshot())
+        self.assertIn("1 files changed", logs.output[0])
+
+    def test_no_snapshot_falls_back_to_files(self):
+        """test that no snapshot is used when the file doesn't exist"""
+        missing_path = os.path.join(self.tmp_dir.name, "missing.snapshot")
+        with override_settings(THESAURUS_SNAPSHOT_PATH=missing_path):
+            reset_snapshot()
+            self.assertIsNone(get_snapshot())
+            entry = ThesaurusEntry("python", "Python")
+            entry.load_concepts("data_types", "3")
+            self.assertIn("boolean", entry.concepts)
+
+
+class TestCatalog(TestCase):
+    """TestCase for the Catalog of the thesauruses directory"""
+
+    def setUp(self):
+        self.catalog = Catalog.scan()
+
+    def test_scan_finds_entries(self):
+        """test that the scan knows categories, versions and structures"""
+        self.assertEqual(self.catalog.category("python"), "langs")
+        self.assertEqual(self.catalog.category("mysql"), "databases")
+        self.assertIsNone(self.catalog.category("abcdefg"))
+        self.assertIn("3", self.catalog.versions("python"))
+        self.assertEqual(
+            self.catalog.versions("python")["3"],
+            os.path.join("web", "thesauruses", "langs", "python", "3")
+        )
+        self.assertIn("strings", self.catalog.structures("python", "3"))
+        self.assertNotIn("data_types", self.catalog.structures("mysql", "8"))
+
+    def test_snapshot_catalog_matches_scan(self):
+        """test that a catalog built from a snapshot matches the scanned one"""
+        from_snapshot = Catalog.from_snapshot(CorpusSnapshot.compile())
+        self.assertEqual(from_snapshot.entry_categories, self.catalog.entry_categories)
+        self.assertEqual(from_snapshot.entry_versions, self.catalog.entry_versions)
+        self.assertIsNone(from_snapshot.signature)
+        self.assertFalse(from_snapshot.is_stale())
+
+    def test_is_stale_after_tree_changes(self):
+        """test that adding a version directory makes the catalog stale"""
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "_meta"))
+            os.makedirs(os.path.join(root, "langs", "lang", "1"))
+            catalog = Catalog.scan(root)
+            self.assertFalse(catalog.is_stale())
+            os.makedirs(os.path.join(root, "langs", "lang", "2"))
+            os.utime(os.path.join(root, "langs", "lang"), ns=(0, 0))
+            self.assertTrue(catalog.is_stale())
+
+
+class TestAvailabilityMatrix(TestCase):
+    """TestCase for the AvailabilityMatrix of the catalog"""
+
+    def test_rows_and_decoding(self):
+        """test that rows mark exactly the available structures"""
+        matrix = AvailabilityMatrix(
+            ["a", "b", "c"],
+            {("x", "1"): {"a", "c", "not_in_meta"}, ("x", "2"): set()}
+        )
+        self.assertEqual(matrix.rows[("x", "1")], 0b101)
+        self.assertEqual(matrix.structures("x", "1"), ["a", "c"])
+        self.assertEqual(matrix.structures("x", "2"), [])
+        self.assertEqual(matrix.structures("y", "1"), [])
+        self.assertTrue(matrix.has("x", "1", "c"))
+        self.assertFalse(matrix.has("x", "1", "b"))
+        self.assertFalse(matrix.has("x", "1", "not_in_meta"))
+
+    def test_catalog_matrix_matches_files(self):
+        """test that the catalog's matrix agrees with the files on disk"""
+        catalog = Catalog.scan()
+        self.assertTrue(catalog.availability.has("python", "3", "strings"))
+        self.assertFalse(catalog.availability.has("mysql", "8", "data_types"))
@@ -0,0 +1,51 @@
+"""Tests for the cache of rendered categories"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from web import views
+from web.fragments import entry_fingerprint, fragment_cache
+
+
+class TestFragmentCache(TestCase):
+    """TestCase for assembling the compare pages from cached fragments"""
+
+    url = reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17'
+
+    def setUp(self):
+        fragment_cache.clear()
+
+    def test_fragments_rendered_once(self):
+        """test that a second request reads every category from the cache"""
+        with mock.patch("web.views.render_category_fragment",
+                        wraps=views.render_category_fragment) as render_fragment:
+            first = self.client.get(self.url)
+            rendered = render_fragment.call_count
+            second = self.client.get(self.url)
+        self.assertEqual(first.status_code, HTTPStatus.OK)
+        self.assertGreater(rendered, 0)
+        self.assertEqual(render_fragment.call_count, rendered)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(fragment_cache.stats()["hits"], rendered)
+
+    def test_fragments_shared_between_pages(self):
+        """test that a reference page reuses the fragments of a comparison"""
+        self.client.get(self.url)
+        with mock.patch("web.views.render_category_fragment") as render_fragment:
+            response = self.client.get(reverse('reference') + '?concept=strings&entry=java%3B17')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        render_fragment.assert_not_called()
+
+    def test_changed_file_renders_again(self):
+        """test that fragments are keyed by the content of the entry's file"""
+        self.client.get(self.url)
+        fingerprint = entry_fingerprint("python", "3", "strings")
+        self.assertEqual(len(fingerprint), 64)
+        with mock.patch("web.views.entry_fingerprint", return_value="changed"), \
+                mock.patch("web.views.render_category_fragment",
+                           wraps=views.render_category_fragment) as render_fragment:
+            self.client.get(self.url)
+        self.assertGreater(render_fragment.call_count, 0)
+        self.assertIsNone(entry_fingerprint("python", "non_existent_version", "strings"))
@@ -0,0 +1,102 @@
+"""Tests for syntax highlighting"""
+import io
+import logging
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from pygments import highlight
+from pygments.formatters.html import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+
+from web.highlighting import HighlightCache, LexerRegistry, highlight_cache, highlight_code
+from web.models import ThesaurusEntry
+from web.views import format_code_for_display
+
+
+class TestHighlightCache(SimpleTestCase):
+    """TestCase for the two-tier HighlightCache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_memory_tier(self):
+        """test that stored HTML is returned from memory"""
+        cache = HighlightCache(1024)
+        key = HighlightCache.key("python", "print(1)")
+        self.assertIsNone(cache.get(key))
+        cache.set(key, "<pre>print(1)</pre>")
+        self.assertEqual(cache.get(key), "<pre>print(1)</pre>")
+        self.assertEqual(cache.stats()["disk_writes"], 0)
+
+    def test_disk_tier_survives_new_cache(self):
+        """test that a new cache on the same directory reads what an old one wrote"""
+        key = HighlightCache.key("c++", "int x;")
+        HighlightCache(1024, self.tmp_dir.name).set(key, "<pre>int x;</pre>")
+
+        cache = HighlightCache(1024, self.tmp_dir.name)
+        self.assertEqual(cache.get(key), "<pre>int x;</pre>")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        # the second lookup is served from memory
+        self.assertEqual(cache.get(key), "<pre>int x;</pre>")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        self.assertTrue(os.listdir(self.tmp_dir.name)[0].startswith("pygments-"))
+
+    def test_key_depends_on_lexer_and_code(self):
+        """test that different lexers or code give different keys"""
+        self.assertNotEqual(HighlightCache.key("python", "x"), HighlightCache.key("ruby", "x"))
+        self.assertNotEqual(HighlightCache.key("python", "x"), HighlightCache.key("python", "y"))
+
+    def test_highlight_code_matches_pygments(self):
+        """test that cached highlighting gives the same HTML as Pygments"""
+        lexer = get_lexer_by_name("python", startinline=True)
+        code = "def highlight_test_function():\n    return 42"
+        expected = highlight(code, lexer, HtmlFormatter())
+        self.assertEqual(highlight_code(code, lexer), expected)
+        self.assertEqual(highlight_cache.get(HighlightCache.key("python", code)), expected)
+
+
+    def test_warmed_cache_covers_displayed_code(self):
+        """test that the pages find every snippet they show in a warmed cache, empty ones too"""
+        cache = HighlightCache(64 * 1024 * 1024, self.tmp_dir.name)
+        with mock.patch("web.highlighting.highlight_cache", cache), \
+                mock.patch("web.management.commands.warm_highlight_cache.highlight_cache", cache):
+            call_command('warm_highlight_cache', stdout=io.StringIO())
+
+        cache = HighlightCache(64 * 1024 * 1024, self.tmp_dir.name)
+        entry = ThesaurusEntry("rust", "Rust")
+        entry.load_concepts("queues_stacks", "1")
+        self.assertIn("", [entry.concept_code(concept_key) for concept_key in entry.concepts])
+        with mock.patch("web.highlighting.highlight_cache", cache):
+            for concept_key in entry.concepts:
+                format_code_for_display(concept_key, entry)
+        self.assertGreater(cache.stats()["disk_hits"], 0)
+        self.assertEqual(cache.stats()["disk_writes"], 0)
+
+class TestLexerRegistry(SimpleTestCase):
+    """TestCase for the LexerRegistry"""
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.registry = LexerRegistry({"clips": "prolog", "broken": "notalexer"})
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_lexer_is_resolved_once(self):
+        """test that the same lexer instance is reused"""
+        self.assertIs(self.registry.lexer("python"), self.registry.lexer("python"))
+
+    def test_resolutions(self):
+        """test that exact, similar and plain text resolutions are reported"""
+        self.registry.resolve_all(["python", "clips", "notalanguage", "broken"])
+        description = self.registry.describe()
+        self.assertEqual(description["python"], {"lexer": "python", "resolution": "exact"})
+        self.assertEqual(description["clips"], {"lexer": "prolog", "resolution": "similar"})
+        self.assertEqual(description["notalanguage"]["resolution"], "text")
+        self.assertEqual(self.registry.fallbacks(), ["broken", "notalanguage"])
@@ -0,0 +1,66 @@
+"""Tests for loading the categories of the compare pages on demand"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from web import views
+from web.fragments import fragment_cache
+
+
+@override_settings(CONCEPTS_EAGER_CATEGORIES=2)
+class TestLazyCategories(TestCase):
+    """TestCase for rendering the first categories and fetching the others"""
+
+    url = reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17'
+
+    def setUp(self):
+        fragment_cache.clear()
+
+    def category_url(self, category_key, entries=("python;3", "java;17")):
+        """Returns the URL of a category of strings"""
+        return reverse('compare.category') + "?" + "&".join(
+            [f"concept=strings&category={category_key}"] + [f"entry={entry}" for entry in entries])
+
+    def test_page_renders_first_categories(self):
+        """test that only the first categories are rendered, and all of them on request"""
+        with mock.patch("web.views.render_category_fragment",
+                        wraps=views.render_category_fragment) as render_fragment:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(render_fragment.call_count, 2 * 2)
+        self.assertContains(response, '<h2>String Basics</h2>')
+        self.assertContains(response, 'class="lazy-category"', count=3)
+        self.assertContains(
+            response, 'data-url="/compare/category/?concept=strings&amp;category=Find+and+Search'
+                      '&amp;entry=python%3B3&amp;entry=java%3B17"')
+        self.assertContains(response, 'lazyCategories.js')
+
+        response = self.client.get(self.url + '&categories=all')
+        self.assertNotContains(response, 'class="lazy-category"')
+        self.assertNotContains(response, 'lazyCategories.js')
+
+    def test_category_matches_full_page(self):
+        """test that a fetched category is what the page renders of it"""
+        category = self.client.get(self.category_url("Manipulating Strings"))
+        self.assertEqual(category.status_code, HTTPStatus.OK)
+        self.assertIn('ETag', category)
+        self.assertIn(b'<h2>Manipulating Strings</h2>', category.content)
+        full_page = self.client.get(self.url + '&categories=all')
+        self.assertIn(category.content, full_page.content)
+
+        not_modified = self.client.get(
+            self.category_url("Manipulating Strings"), HTTP_IF_NONE_MATCH=category['ETag'])
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        other_category = self.client.get(self.category_url("String Formatting"))
+        self.assertNotEqual(other_category['ETag'], category['ETag'])
+
+    def test_invalid_category(self):
+        """test the status codes of categories that can't be loaded"""
+        self.assertEqual(self.client.get(self.category_url("Nonexistent")).status_code,
+                         HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(self.category_url("String Basics", ["nonexistent;1"])).status_code,
+                         HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(self.category_url("String Basics", [])).status_code,
+                         HTTPStatus.BAD_REQUEST)
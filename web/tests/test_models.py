@@ -2,8 +2,11 @@
 import json
 
 from django.test import TestCase
+from jsonmerge import merge
 
+from web.corpus import get_catalog
 from web.models import ThesaurusEntry, ThesaurusMetaInfo, MetaStructure
+from web.thesaurus_template_generators import generate_entry_template, merge_json
 
 
 class TestMetaStructures(TestCase):
@@ -201,3 +204,44 @@ class TestMetaStructures(TestCase):
         
         self.assertEqual(cm.exception.entry_key, "python")
         self.assertEqual(cm.exception.entry_version, "non_existent_version")
+
+
+def legacy_filled_concepts(entry, structure_key, version):
+    """the filled template as it was built with jsonmerge and JSON round trips"""
+    entry.load_concepts(structure_key, version)
+    template = json.loads(generate_entry_template(entry.key, structure_key, version))
+    template['concepts'] = merge(template['concepts'], entry.concepts)
+    return json.dumps(template, indent=2)
+
+
+class TestFilledTemplates(TestCase):
+    """TestCase for filling entry templates without jsonmerge"""
+
+    def test_merge_json_matches_jsonmerge(self):
+        """test merge_json on nested objects, overwrites and new keys"""
+        base = {"a": {"name": "A", "code": [""]}, "b": {"name": "B"}, "c": 1}
+        head = {"b": {"code": ["x"], "extra": {"y": None}}, "c": [2], "d": {"e": "f"}}
+        self.assertEqual(
+            list(merge_json(base, head).items()),
+            list(merge(base, head).items())
+        )
+        self.assertEqual(merge_json(base, head), merge(base, head))
+        self.assertEqual(base["b"], {"name": "B"})
+        with self.assertRaises(ValueError):
+            merge_json({"a": "string"}, {"a": {"b": 1}})
+
+    def test_filled_concepts_match_jsonmerge_for_all_files(self):
+        """test that every entry file gives byte-identical API output"""
+        catalog = get_catalog()
+        checked = 0
+        for entry_key, versions in catalog.entry_versions.items():
+            for version in versions:
+                for structure_key in catalog.structures(entry_key, version):
+                    entry = ThesaurusEntry(entry_key, "")
+                    self.assertEqual(
+                        entry.load_filled_concepts(structure_key, version),
+                        legacy_filled_concepts(ThesaurusEntry(entry_key, ""), structure_key, version),
+                        f"{entry_key} {version} {structure_key}"
+                    )
+                    checked += 1
+        self.assertGreater(checked, 0)
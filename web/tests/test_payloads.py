@@ -0,0 +1,115 @@
+"""Tests for the precompressed API payloads"""
+import gzip
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from web.models import ThesaurusEntry
+from web.payloads import PAYLOAD_VERSION, PayloadStore, accepts_gzip, encode_payload
+
+
+class TestPayloadStore(TestCase):
+    """TestCase for PayloadStore and serving API responses from it"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.store = PayloadStore(tmp_dir.name)
+        self.document = ThesaurusEntry("python", "").filled_concepts("data_types", "3")
+        self.manifest = {}
+        self.store.write("reference", "data_types", [("python", "3")], self.document, self.manifest)
+        self.store.write_manifest(self.manifest)
+        patcher = mock.patch("web.views.api_payloads", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('api.reference', kwargs={
+            'structure_key': 'data_types',
+            'lang': 'python',
+            'version': '3'
+        })
+
+    def test_variants(self):
+        """test that every variant decodes to the same document"""
+        for compact in (False, True):
+            for gzipped in (False, True):
+                body = self.store.get("reference", "data_types", [("python", "3")], compact, gzipped)
+                self.assertEqual(body, encode_payload(self.document, compact, gzipped))
+                if gzipped:
+                    body = gzip.decompress(body)
+                self.assertEqual(json.loads(body), self.document)
+        self.assertIsNone(self.store.get("reference", "data_types", [("python", "2")]))
+
+    def test_serves_gzip_without_building(self):
+        """test that gzip clients get the prebuilt payload"""
+        with mock.patch("web.views.ThesaurusEntry.filled_concepts") as filled_concepts:
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        filled_concepts.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.document)
+
+    def test_compact_parameter(self):
+        """test that ?compact=1/true/yes selects JSON without whitespace, any other value doesn't"""
+        response = self.client.get(self.url + '?compact=1')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn(b'\n', response.content)
+        self.assertEqual(json.loads(response.content), self.document)
+        self.assertNotEqual(
+            response['ETag'], self.client.get(self.url)['ETag'])
+        self.assertEqual(self.client.get(self.url + '?compact=Yes').content, response.content)
+        for value in ('', 'no', 'off', 'False', 'nope'):
+            self.assertEqual(self.client.get(self.url + '?compact=' + value).content,
+                             self.client.get(self.url).content)
+
+    def test_outdated_payload_is_not_served(self):
+        """test that payloads built from other files are ignored"""
+        self.store.write_manifest({
+            name: dict(entry, fingerprint="0" * 64) for name, entry in self.manifest.items()
+        })
+        store = PayloadStore(self.store.directory)
+        self.assertIsNone(store.get("reference", "data_types", [("python", "3")]))
+        with mock.patch("web.views.api_payloads", store):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.document)
+
+    def test_payloads_of_older_code_are_not_served(self):
+        """test that a new ETAG_SALT or PAYLOAD_VERSION outdates the payloads"""
+        self.assertIsNotNone(self.store.get("reference", "data_types", [("python", "3")]))
+        with override_settings(ETAG_SALT="next-release"):
+            self.assertIsNone(self.store.get("reference", "data_types", [("python", "3")]))
+        with mock.patch("web.payloads.PAYLOAD_VERSION", PAYLOAD_VERSION + 1):
+            self.assertIsNone(self.store.get("reference", "data_types", [("python", "3")]))
+
+    def test_command_rebuilds_payloads_of_older_code(self):
+        """test that the command builds every payload again after a new ETAG_SALT"""
+        options = {'output': self.store.directory, 'comparisons': 0, 'dry_run': True}
+        call_command('build_api_payloads', stdout=io.StringIO(), **dict(options, dry_run=False))
+        output = io.StringIO()
+        call_command('build_api_payloads', stdout=output, **options)
+        self.assertTrue(output.getvalue().startswith("0 of "))
+        output = io.StringIO()
+        with override_settings(ETAG_SALT="next-release"):
+            call_command('build_api_payloads', stdout=output, **options)
+        *rebuilt, summary = output.getvalue().splitlines()
+        self.assertTrue(rebuilt)
+        self.assertTrue(all(line.endswith(": ETAG_SALT changed") for line in rebuilt))
+        self.assertTrue(summary.startswith(f"{len(rebuilt)} of {len(rebuilt)} payloads"))
+
+    def test_missing_manifest_disables_payloads(self):
+        """test that nothing is served before a manifest is written"""
+        store = PayloadStore(self.store.directory + "-missing")
+        self.assertIsNone(store.get("reference", "data_types", [("python", "3")]))
+
+    def test_accepts_gzip(self):
+        """test parsing of Accept-Encoding"""
+        factory = RequestFactory()
+        self.assertTrue(accepts_gzip(factory.get('/', HTTP_ACCEPT_ENCODING='br, gzip;q=0.8')))
+        self.assertTrue(accepts_gzip(factory.get('/', HTTP_ACCEPT_ENCODING='*')))
+        self.assertFalse(accepts_gzip(factory.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0')))
+        self.assertFalse(accepts_gzip(factory.get('/', HTTP_ACCEPT_ENCODING='deflate')))
+        self.assertFalse(accepts_gzip(factory.get('/')))
@@ -0,0 +1,182 @@
+"""Tests for the pre-rendered reference and compare pages"""
+import gzip
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from web.build_manifest import (
+    NOT_BUILT,
+    OUTPUT_MISSING,
+    changed_inputs,
+    inputs_fingerprint,
+    manifest_entry,
+    plan_rebuild,
+)
+from web.management.commands.prerender_pages import Command
+from web.prerender import (
+    MANIFEST_FILE_NAME,
+    PrerenderedPages,
+    page_fingerprint,
+    page_path,
+    page_url,
+    render_page,
+)
+
+
+class TestPrerenderedPages(TestCase):
+    """TestCase for rendering pages ahead of time and serving them"""
+
+    entry_keys_versions = [("python", "3"), ("java", "17")]
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = tmp_dir.name
+        rendered = render_page(self.directory, "http://testserver", "strings", self.entry_keys_versions)
+        self.relative_path, self.inputs = rendered
+        self.fingerprint = inputs_fingerprint(self.inputs)
+        self.store = PrerenderedPages(self.directory)
+        self.store.write_manifest({self.relative_path: manifest_entry(self.fingerprint, self.inputs)})
+        patcher = mock.patch("web.middleware.prerendered_pages", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = page_url("strings", self.entry_keys_versions)
+
+    def test_page_matches_live_view(self):
+        """test that the pre-rendered page is what the view renders"""
+        self.assertEqual(self.relative_path, "compare/strings/python/3/java/17/index.html")
+        self.assertEqual(page_path("strings", [("python", "3")]), "reference/strings/python/3/index.html")
+        with mock.patch("web.middleware.prerendered_pages", PrerenderedPages(None)):
+            live = self.client.get(self.url, HTTP_HOST="testserver")
+        self.assertTemplateUsed(live, 'concepts.html')
+        with open(os.path.join(self.directory, *self.relative_path.split("/")), 'rb') as file:
+            self.assertEqual(file.read(), live.content)
+
+    def test_middleware_serves_page(self):
+        """test that the middleware answers from the files, plain, gzipped and with 304"""
+        with mock.patch("web.views.concepts_page") as concepts_page:
+            response = self.client.get(self.url)
+            gzipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        concepts_page.assert_not_called()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(b"Comparing Python (version 3) and Java (version 17)", response.content)
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), response.content)
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(gzipped['ETag'], 'W/' + response['ETag'])
+
+    def test_middleware_answers_like_view(self):
+        """test that pre-rendered and live pages share their validators, and HEAD goes to the view"""
+        prerendered = self.client.get(self.url)
+        with mock.patch("web.middleware.prerendered_pages", PrerenderedPages(None)):
+            live = self.client.get(self.url)
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=prerendered['ETag'])
+        self.assertTemplateUsed(live, 'concepts.html')
+        self.assertEqual(prerendered['ETag'], live['ETag'])
+        self.assertEqual(prerendered['Last-Modified'], live['Last-Modified'])
+        self.assertEqual(prerendered['X-Frame-Options'], live['X-Frame-Options'])
+        self.assertEqual(revalidated.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(self.client.head(self.url).status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_falls_back_to_view(self):
+        """test that stale, missing and differently asked for pages go to the view"""
+        self.store.write_manifest({self.relative_path: manifest_entry("outdated", self.inputs)})
+        # a new manifest is picked up by its mtime and size
+        os.utime(os.path.join(self.directory, MANIFEST_FILE_NAME), ns=(0, 0))
+        for url in [
+            self.url,
+            page_url("strings", [("python", "3")]),
+            self.url + "&lang=python",
+            reverse('compare') + "?concept=strings&entry=python&entry=java",
+        ]:
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'concepts.html')
+
+    def test_command_selects_pages(self):
+        """test that the command renders every reference and the asked for pairs"""
+        pages = Command().pages({'pair': [["python;3", "java;17"]], 'comparisons': 0})
+        self.assertIn(("strings", [("python", "3")]), pages)
+        self.assertIn(("strings", [("python", "3"), ("java", "17")]), pages)
+        self.assertNotIn(("data_types", [("mysql", "8")]), pages)
+        with open(os.path.join(self.directory, MANIFEST_FILE_NAME), 'r', encoding='UTF-8') as file:
+            self.assertEqual(json.load(file)[self.relative_path]["fingerprint"], self.fingerprint)
+
+    def test_page_inputs(self):
+        """test that a page is fingerprinted by its files, templates, Pygments and salt"""
+        self.assertEqual(page_fingerprint("strings", self.entry_keys_versions), self.fingerprint)
+        self.assertIn("meta_info.json", self.inputs)
+        self.assertIn(os.path.join("_meta", "strings.json"), self.inputs)
+        self.assertIn("templates/concepts.html", self.inputs)
+        self.assertIn("pygments", self.inputs)
+        self.assertIsNone(page_fingerprint("strings", [("python", "non_existent_version")]))
+
+    @mock.patch("web.management.commands.prerender_pages.ProcessPoolExecutor", ThreadPoolExecutor)
+    def test_command_renders_changed_pages(self):
+        """test that the command only renders pages whose inputs changed, and the dry run"""
+        options = {'output': self.directory, 'comparisons': 0, 'jobs': 1}
+        reference = page_path("strings", [("python", "3")])
+        call_command('prerender_pages', stdout=io.StringIO(), **options)
+        manifest = self.store.read_manifest()
+        self.assertIn(reference, manifest)
+        self.assertNotIn(self.relative_path, manifest)
+        self.assertFalse(self.store.exists(self.relative_path))
+
+        # a changed entry file only affects the pages it is part of
+        python_file = next(name for name in manifest[reference]["inputs"]
+                           if name.endswith(os.path.join("python", "3", "strings.json")))
+        manifest[reference] = manifest_entry("outdated", dict(manifest[reference]["inputs"]))
+        manifest[reference]["inputs"][python_file] = "0" * 64
+        self.store.write_manifest(manifest)
+        output = io.StringIO()
+        call_command('prerender_pages', stdout=output, dry_run=True, **options)
+        self.assertEqual(output.getvalue().splitlines()[0], f"rebuild {reference}: {python_file} changed")
+        self.assertIn("1 of", output.getvalue())
+
+        with mock.patch("web.management.commands.prerender_pages.render_page",
+                        wraps=render_page) as rendered:
+            call_command('prerender_pages', stdout=io.StringIO(), **options)
+        self.assertEqual([call.args[2:] for call in rendered.call_args_list],
+                         [("strings", [("python", "3")])])
+        self.assertEqual(self.store.read_manifest()[reference]["fingerprint"],
+                         page_fingerprint("strings", [("python", "3")]))
+
+
+class TestPlanRebuild(SimpleTestCase):
+    """TestCase for comparing wanted artifacts with the manifest of the last build"""
+
+    def test_plan_rebuild(self):
+        """test that new, missing and changed artifacts are rebuilt and unwanted ones removed"""
+        manifest = {
+            "same": manifest_entry("f", {"a": "1"}),
+            "changed": manifest_entry("f", {"a": "1", "b": "2"}),
+            "missing": manifest_entry("f", {"a": "1"}),
+            "old format": "f",
+            "unwanted": manifest_entry("f", {"a": "1"}),
+        }
+        plan = plan_rebuild(manifest, {
+            "same": {"a": "1"},
+            "changed": {"a": "3", "c": "4"},
+            "missing": {"a": "1"},
+            "old format": {"a": "1"},
+            "new": {"a": "1"},
+        }, is_built=lambda name: name != "missing")
+        self.assertEqual(plan.unchanged, ["same"])
+        self.assertEqual(plan.rebuild, {
+            "changed": ["a changed", "b changed", "c changed"],
+            "missing": [OUTPUT_MISSING],
+            "old format": [NOT_BUILT],
+            "new": [NOT_BUILT],
+        })
+        self.assertEqual(plan.removed, ["unwanted"])
+        self.assertEqual(plan.report()[-1], "remove unwanted")
+        self.assertEqual(changed_inputs({"a": "1"}, {"a": "1"}), [])
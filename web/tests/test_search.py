@@ -0,0 +1,109 @@
+"""Tests for the full-text search"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from web.search import SearchDocument, SearchIndex, get_search_index, tokenize
+
+
+def document(entry_key, concept_key, concept_name, code="", comment="", structure_key="strings"):
+    """Returns a SearchDocument of version 1"""
+    return SearchDocument(entry_key, "1", structure_key, concept_key, concept_name, code, comment)
+
+
+class TestSearchIndex(SimpleTestCase):
+    """TestCase for tokenizing and ranking with the SearchIndex"""
+
+    def setUp(self):
+        self.index = SearchIndex([
+            document("c", "length_of_string", "Length of string", "strlen(s)"),
+            document("python", "length_of_string", "Length of string", "len(s)"),
+            document("java", "length_of_string", "Length of string", "s.length()"),
+            document("python", "for_loop", "For loop", "for i in range(10):",
+                     "Loops over the numbers 0 to 9"),
+            document("python", "boolean", "Boolean", "True", structure_key="data_types"),
+        ])
+
+    def test_tokenize_splits_identifiers(self):
+        """test that identifiers are split and also kept whole"""
+        self.assertEqual(
+            tokenize("strLen(my_var) is the HTTPServer"),
+            ["str", "len", "strlen", "my", "var", "my_var", "myvar", "http", "server", "httpserver"]
+        )
+        self.assertEqual(tokenize("strLen(my_var)", whole_identifiers=False), ["str", "len", "my", "var"])
+
+    def test_substring_matches(self):
+        """test that a token finds the terms containing it, ranked below exact matches"""
+        results = self.index.search("len")
+        self.assertEqual(
+            {result.entry_key for _, result in results if result.concept_key == "length_of_string"},
+            {"c", "python", "java"}
+        )
+        self.assertEqual(results[0][1].entry_key, "python")
+        self.assertEqual([result.entry_key for _, result in self.index.search("strlen")], ["c"])
+
+    def test_ranking_and_filters(self):
+        """test that concept names rank first and filters narrow the results"""
+        results = self.index.search("loop numbers")
+        self.assertEqual(results[0][1].concept_key, "for_loop")
+        self.assertEqual(self.index.search("nothing matches this"), [])
+        self.assertEqual(len(self.index.search("string", limit=2)), 2)
+        self.assertEqual(
+            [result.entry_key for _, result in self.index.search("string", entry_key="java")],
+            ["java"]
+        )
+        self.assertEqual(self.index.search("true", structure_key="strings"), [])
+        self.assertEqual(len(self.index.search("true", structure_key="data_types")), 1)
+
+
+    def test_filters_apply_before_postings_budget(self):
+        """test that documents of other entries don't use up the postings read per term"""
+        with mock.patch("web.search.MAX_POSTINGS_PER_TERM", 1):
+            self.assertEqual(
+                [result.entry_key for _, result in self.index.search("string", entry_key="c")],
+                ["c"]
+            )
+            self.assertEqual(len(self.index.search("string")), 1)
+
+class TestSearchViews(TestCase):
+    """TestCase for the search page and API"""
+
+    def test_api_search(self):
+        """test that the API ranks the matching concept of the corpus"""
+        response = self.client.get(reverse('api.search'), {'q': 'length of string', 'limit': 5})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response_data = response.json()
+        self.assertEqual(response_data['query'], 'length of string')
+        self.assertEqual(len(response_data['results']), 5)
+        self.assertEqual(response_data['results'][0]['concept'], 'length_of_string')
+        self.assertEqual(response_data['results'][0]['structure_name'], 'Strings')
+
+        response = self.client.get(reverse('api.search'), {'q': 'string', 'entry': 'python'})
+        self.assertTrue(all(result['entry'] == 'python' for result in response.json()['results']))
+        self.assertEqual(self.client.get(reverse('api.search')).status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_page(self):
+        """test that the page shows the results and links to their concepts"""
+        response = self.client.get(reverse('search'), {'q': 'strlen'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateUsed(response, 'search.html')
+        self.assertContains(response, reverse('concept', args=['strings', 'length_of_string']))
+        response = self.client.get(reverse('search'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['results'], [])
+
+    def test_long_query_is_rejected(self):
+        """test that queries over SEARCH_MAX_QUERY_LENGTH are answered with 400"""
+        with override_settings(SEARCH_MAX_QUERY_LENGTH=10):
+            self.assertEqual(self.client.get(reverse('api.search'), {'q': 'length of string'}).status_code,
+                             HTTPStatus.BAD_REQUEST)
+            self.assertEqual(self.client.get(reverse('search'), {'q': 'length of string'}).status_code,
+                             HTTPStatus.BAD_REQUEST)
+            self.assertEqual(self.client.get(reverse('api.search'), {'q': 'strlen'}).status_code,
+                             HTTPStatus.OK)
+
+    def test_index_is_reused(self):
+        """test that the index is built once for an unchanged corpus"""
+        self.assertIs(get_search_index(), get_search_index())
@@ -0,0 +1,60 @@
+"""Tests for streaming the compare pages"""
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from web import views
+from web.fragments import fragment_cache
+
+
+@override_settings(CONCEPTS_STREAMING_MIN_ENTRIES=3)
+class TestStreamingCompare(TestCase):
+    """TestCase for sending compare pages of many entries category by category"""
+
+    url = reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17&entry=rust%3B1'
+
+    def setUp(self):
+        fragment_cache.clear()
+
+    def test_streams_same_page(self):
+        """test that the streamed page is the page rendered at once"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], "text/html; charset=utf-8")
+        self.assertIn('ETag', response)
+        streamed = b"".join(response.streaming_content)
+        self.assertIn(b"Comparing Python (version 3), Java (version 17) and Rust (version 1)", streamed)
+        self.assertNotIn(views.CATEGORIES_PLACEHOLDER.encode('UTF-8'), streamed)
+
+        with override_settings(CONCEPTS_STREAMING_MIN_ENTRIES=0):
+            rendered = self.client.get(self.url)
+        self.assertFalse(rendered.streaming)
+        self.assertEqual(streamed, rendered.content)
+        two_entries = self.client.get(reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17')
+        self.assertFalse(two_entries.streaming)
+
+    def test_header_sent_before_categories(self):
+        """test that the page header is sent before any category is rendered"""
+        with mock.patch("web.views.render_category_fragment",
+                        wraps=views.render_category_fragment) as render_fragment:
+            chunks = iter(self.client.get(self.url).streaming_content)
+            head = next(chunks)
+            render_fragment.assert_not_called()
+            first_category = next(chunks)
+            self.assertEqual(render_fragment.call_count, 3)
+        self.assertIn(b"<h1 class=\"col-12\">", head)
+        self.assertIn(b"<h2>", first_category)
+
+    def test_errors_are_not_streamed(self):
+        """test that invalid parameters still get their status code"""
+        response = self.client.get(
+            reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17&entry=nonexistent%3B1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.streaming)
+        response = self.client.get(
+            reverse('compare') + '?concept=strings&entry=python%3B3&entry=java%3B17&entry=mysql%3B8')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.streaming)
@@ -1,8 +1,10 @@
 """Tests for the views of codethesaur.us"""
+import json
 import logging
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from web.models import LookupData
 
@@ -297,6 +299,191 @@ class TestViews(TestCase):
         self.assertEqual(response_data['meta']['entry_1'], 'python')
         self.assertEqual(response_data['meta']['entry_2'], 'javascript')
 
+    def test_api_compare_entries(self):
+        """Test comparing any number of entries in one document"""
+        url = reverse('api.compare_entries', kwargs={'structure_key': 'data_types'}) + \
+            '?entry=python%3B3&entry=javascript%3BECMAScript%202009&entry=java%3B17&entry=python%3B3'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response_data = response.json()
+        self.assertEqual(
+            [(entry['entry'], entry['entry_version']) for entry in response_data['meta']['entries']],
+            [('python', '3'), ('javascript', 'ECMAScript 2009'), ('java', '17')]
+        )
+        boolean = response_data['concepts']['boolean']
+        self.assertEqual(len(boolean['entries']), 3)
+        pairwise = self.client.get(reverse('api.compare', kwargs={
+            'structure_key': 'data_types',
+            'lang1': 'python',
+            'version1': '3',
+            'lang2': 'java',
+            'version2': '17'
+        })).json()
+        self.assertEqual(boolean['entries'][0], pairwise['concepts1']['boolean'])
+        self.assertEqual(boolean['entries'][2], pairwise['concepts2']['boolean'])
+
+    def test_api_compare_entries_errors(self):
+        """Test the errors of the comparison of any number of entries"""
+        url = reverse('api.compare_entries', kwargs={'structure_key': 'data_types'})
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(url + '?entry=python%3B3&entry=abcdefg%3B1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        url = reverse('api.compare_entries', kwargs={'structure_key': 'notastructure'})
+        response = self.client.get(url + '?entry=python%3B3')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_api_export(self):
+        """Test the NDJSON export with and without filters"""
+        url = reverse('api.export') + '?entry=python&structure=data_types&structure=strings'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        documents = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertTrue(documents)
+        self.assertEqual({document['meta']['language'] for document in documents}, {'python'})
+        self.assertEqual(
+            {document['meta']['structure'] for document in documents},
+            {'data_types', 'strings'}
+        )
+        reference = self.client.get(reverse('api.reference', kwargs={
+            'structure_key': 'data_types',
+            'lang': 'python',
+            'version': '3'
+        })).json()
+        self.assertIn(reference, documents)
+
+        response = self.client.get(reverse('api.export') + '?category=databases')
+        entries = {
+            json.loads(line)['meta']['language'] for line in b''.join(response.streaming_content).splitlines()
+        }
+        self.assertIn('mysql', entries)
+        self.assertNotIn('python', entries)
+
+    def test_api_projection(self):
+        """Test selecting concepts and fields of the reference and compare APIs"""
+        url = reverse('api.reference', kwargs={
+            'structure_key': 'data_types',
+            'lang': 'python',
+            'version': '3'
+        })
+        full = self.client.get(url).json()
+        response = self.client.get(url + '?concepts=boolean,signed_integer_8_bit,notaconcept&fields=code')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        projected = response.json()
+        self.assertEqual(list(projected['concepts']), ['boolean', 'signed_integer_8_bit'])
+        self.assertEqual(
+            projected['concepts']['boolean'],
+            {'code': full['concepts']['boolean']['code']}
+        )
+        self.assertEqual(projected['meta'], full['meta'])
+
+        url = reverse('api.compare', kwargs={
+            'structure_key': 'data_types',
+            'lang1': 'python',
+            'version1': '3',
+            'lang2': 'java',
+            'version2': '17'
+        })
+        full = self.client.get(url).json()
+        projected = self.client.get(url + '?fields=name,comment').json()
+        self.assertEqual(list(projected['concepts2']), list(full['concepts2']))
+        for key, concept in projected['concepts2'].items():
+            self.assertEqual(set(concept), {'name', 'comment'} & set(full['concepts2'][key]))
+
+    def test_api_etag_not_modified(self):
+        """Test that revalidating an unchanged API response skips building it"""
+        url = reverse('api.reference', kwargs={
+            'structure_key': 'data_types',
+            'lang': 'python',
+            'version': '3'
+        })
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with mock.patch('web.models.ThesaurusEntry.filled_concepts') as filled_concepts:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        filled_concepts.assert_not_called()
+
+        with override_settings(ETAG_SALT='next-release'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_compare_page_etag(self):
+        """Test the ETags of the compare page and of unknown entries"""
+        url = reverse('compare') + '?concept=data_types&entry=python%3B3&entry=java'
+        etag = self.client.get(url)['ETag']
+        with mock.patch('web.views.highlight_code') as highlight:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        highlight.assert_not_called()
+
+        other = self.client.get(reverse('compare') + '?concept=data_types&entry=python%3B3')
+        self.assertNotEqual(other['ETag'], etag)
+        missing = self.client.get(reverse('compare') + '?concept=data_types&entry=abcdefg%3B1')
+        self.assertNotIn('ETag', missing)
+
+    def test_compare_page_etag_templates_and_analytics(self):
+        """Test that changed templates change the ETag and that 304s are still counted"""
+        url = reverse('compare') + '?concept=data_types&entry=python%3B3&entry=java%3B17'
+        etag = self.client.get(url)['ETag']
+        with mock.patch('web.conditional.template_hashes',
+                        return_value={'templates/concepts.html': 'changed'}):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        with mock.patch('web.views.store_lookup_info') as store_lookup, \
+                mock.patch('web.views.store_missing_concepts') as store_missing:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(store_lookup.call_args.args[2:], ('python', '3', 'java', '17', 'data_types'))
+        store_missing.assert_called_once()
+
+    def test_api_batch(self):
+        """Test the batch API with duplicates and per-item errors"""
+        items = [
+            {"structure": "data_types", "lang": "python", "version": "3"},
+            {"structure": "data_types", "lang": "python", "version": "3"},
+            {"structure": "strings", "lang": "java", "version": "17"},
+            {"structure": "data_types", "lang": "abcdefg", "version": "1"},
+            {"structure": "data_types", "lang": "python"},
+            {"structure": "strings", "lang": "python", "version": "../../langs/python/3"},
+        ]
+        response = self.client.post(
+            reverse('api.batch'), json.dumps({"items": items}), content_type="application/json")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response_data = response.json()
+        statuses = [result['status'] for result in response_data['results']]
+        self.assertEqual(statuses, [200, 200, 200, 404, 400, 404])
+        reference = self.client.get(reverse('api.reference', kwargs={
+            'structure_key': 'data_types',
+            'lang': 'python',
+            'version': '3'
+        })).json()
+        self.assertEqual(response_data['results'][0]['document'], reference)
+        self.assertIn('error', response_data['results'][3])
+        cost = response_data['cost']
+        self.assertEqual(cost['items'], 6)
+        self.assertEqual(cost['documents_built'], 2)
+        self.assertEqual(cost['deduplicated'], 1)
+        self.assertEqual(cost['errors'], 3)
+
+    def test_api_batch_limits(self):
+        """Test that invalid and oversized batches are rejected"""
+        url = reverse('api.batch')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+        response = self.client.post(url, "not json", content_type="application/json")
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        items = [{"structure": "data_types", "lang": "python", "version": "3"}] * 3
+        with override_settings(API_BATCH_MAX_ITEMS=2):
+            response = self.client.post(
+                url, json.dumps({"items": items}), content_type="application/json")
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
     def test_concepts_view_valid_params(self):
         """Test concepts view with valid parameters that should return 200"""
         url = reverse('index') + '?concept=data_types&entry=python%3B3&entry=javascript%3BECMAScript%202023'
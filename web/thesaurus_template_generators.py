@@ -1,11 +1,59 @@
 """Generator functions for thesaurus files"""
 import json
+import threading
+
 from web.models import ThesaurusMetaInfo
 
 
-def generate_entry_template(entry_key, structure_key, version=None):
-    """Generate a template for the given entry and structure"""
-    meta_info = ThesaurusMetaInfo()
+# Marks keys that are missing in a merge base, as opposed to a null value
+_UNDEFINED = object()
+
+# structure key -> (categories the skeleton was built from, skeleton)
+_skeletons = {}
+_skeletons_lock = threading.Lock()
+
+
+def entry_template_skeleton(meta_structure):
+    """
+    Returns the concepts of the entry template of a structure, built once per
+    version of the structure file
+
+    :param meta_structure: MetaStructure of the template
+    :return: tuple of (concept key, concept name) pairs, in template order
+    :rtype: tuple
+    """
+    categories = meta_structure.categories
+    cached = _skeletons.get(meta_structure.key)
+    # the loaded structure file is only replaced when the file changes
+    if cached is not None and cached[0] is categories:
+        return cached[1]
+    skeleton = tuple(
+        (key, name)
+        for category in categories.values()
+        for (key, name) in category.items()
+    )
+    with _skeletons_lock:
+        _skeletons[meta_structure.key] = (categories, skeleton)
+    return skeleton
+
+
+def entry_template(entry_key, structure_key, version=None, meta_info=None,
+                   concept_keys=None, fields=None):
+    """
+    Returns the template for the given entry and structure as a dict
+
+    :param entry_key: key of the entry
+    :param structure_key: key of the structure
+    :param version: optional version of the entry
+    :param meta_info: optional ThesaurusMetaInfo to read the names from
+    :param concept_keys: optional collection of the only concepts to include
+    :param fields: optional collection of the only fields of the concepts to
+        include, e.g. ("code", "comment")
+    :raises ValueError: if the structure doesn't exist
+    :rtype: dict
+    """
+    if meta_info is None:
+        meta_info = ThesaurusMetaInfo()
     if structure_key not in meta_info.structures:
         raise ValueError
     entry_name = meta_info.languages.get(
@@ -21,16 +69,84 @@ def generate_entry_template(entry_key, structure_key, version=None):
     if version:
         meta['language_version'] = version
 
-    concepts = {
+    concepts = template_concepts(meta_info.structure(structure_key), concept_keys, fields)
+
+    return {'meta': meta, 'concepts': concepts}
+
+
+def template_concepts(meta_structure, concept_keys=None, fields=None):
+    """
+    Returns the empty concepts of the entry template of a structure
+
+    :param meta_structure: MetaStructure of the template
+    :param concept_keys: optional collection of the only concepts to include
+    :param fields: optional collection of the only fields to include
+    :return: dict of concept key -> dict with the name and empty code
+    :rtype: dict
+    """
+    return project_concepts({
         key: {
             'name': name,
             'code': [""],
         }
-        for category in meta_info.structure(structure_key).categories.values()
-        for (key, name) in category.items()
-    }
+        for (key, name) in entry_template_skeleton(meta_structure)
+        if concept_keys is None or key in concept_keys
+    }, fields=fields)
+
+
+def project_concepts(concepts, concept_keys=None, fields=None):
+    """
+    Returns the requested concepts and fields of a dict of concepts, in the
+    order of `concepts`
+
+    :param concepts: dict of concept key -> concept
+    :param concept_keys: optional collection of the only concepts to include
+    :param fields: optional collection of the only fields of each concept to
+        include
+    :return: the projected dict; `concepts` itself if nothing is left out
+    :rtype: dict
+    """
+    if concept_keys is None and fields is None:
+        return concepts
+    projected = {}
+    for key, concept in concepts.items():
+        if concept_keys is not None and key not in concept_keys:
+            continue
+        if fields is not None and isinstance(concept, dict):
+            concept = {field: value for field, value in concept.items() if field in fields}
+        projected[key] = concept
+    return projected
+
+
+def generate_entry_template(entry_key, structure_key, version=None):
+    """Generate a template for the given entry and structure"""
+    return json.dumps(entry_template(entry_key, structure_key, version), indent=2)
+
+
+def merge_json(base, head):
+    """
+    Merges `head` into `base` with the semantics of jsonmerge's default
+    strategies: objects are merged key by key (keys of `base` first, then new
+    keys of `head`) and any other value of `head` replaces the one in `base`.
+    Neither argument is modified, but the result shares non-object values
+    with them.
 
-    return json.dumps({'meta': meta, 'concepts': concepts}, indent=2)
+    :param base: JSON value to merge into
+    :param head: JSON value to merge
+    :raises ValueError: if `head` is an object and `base` is another value
+    :return: the merged value
+    """
+    if not isinstance(head, dict):
+        return head
+    if base is _UNDEFINED:
+        merged = {}
+    elif not isinstance(base, dict):
+        raise ValueError(f"Can't merge an object into {base!r}")
+    else:
+        merged = dict(base)
+    for key, value in head.items():
+        merged[key] = merge_json(merged.get(key, _UNDEFINED), value)
+    return merged
 
 
 def generate_meta_template(structure_key, structure_name):
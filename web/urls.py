@@ -24,11 +24,46 @@ urlpatterns = [
     # /compare/
     path('compare/', views.concepts, name='compare'),
 
+    # /compare/category/?concept={structure}&category={category}&entry={lang};{version}&entry=...
+    path('compare/category/', views.concepts_category, name='compare.category'),
+
     # /reference/
     # path('compare/', controller.for.reference???, name='reference'),
     # /reference/lang1/
     path('reference/', views.concepts, name='reference'),
 
+    # /concept/{structure}/{concept}/
+    path('concept/<str:structure_key>/<str:concept_key>/', views.concept_entries, name='concept'),
+
+    # /search/?q={query}
+    path('search/', views.search, name='search'),
+
+    # API batch of reference lookups
+    # POST /api/batch/ {"items": [{"structure": ..., "lang": ..., "version": ...}, ...]}
+    path('api/batch/', views.api_batch, name='api.batch'),
+
+    # API full-text search
+    # /api/search/?q={query}&limit={limit}&structure={structure}&entry={lang}
+    path('api/search/', views.api_search, name='api.search'),
+
+    # API autocomplete of entry, structure and concept names
+    # /api/autocomplete/?q={typed}&limit={limit}&type={entry|structure|concept}
+    path('api/autocomplete/', views.api_autocomplete, name='api.autocomplete'),
+
+    # API export of all filled templates as newline-delimited JSON
+    # /api/export/?category={category}&entry={lang}&structure={structure}
+    path('api/export/', views.api_export, name='api.export'),
+
+    # API compare of any number of entries
+    # /api/compare/{structure}/?entry={lang};{version}&entry=...
+    path('api/compare/<str:structure_key>/', views.api_compare_entries, name='api.compare_entries'),
+
+    # API of one concept in every entry, before the reference API that has as
+    # many path segments
+    # /api/concept/{structure}/{concept}
+    path('api/concept/<str:structure_key>/<str:concept_key>/', views.api_concept_entries,
+         name='api.concept'),
+
     # API reference
     # /api/{structure}/{lang}/{version}
     path('api/<str:structure_key>/<str:lang>/<str:version>/', views.api_reference, name='api.reference'),
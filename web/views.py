@@ -1,32 +1,53 @@
 """codethesaur.us views"""
+import json
 import logging
-import os
 import random
+import time
+from http import HTTPStatus
+from urllib.parse import urlencode
 
-from django.conf import settings
 from django.http import (
     HttpResponseBadRequest,
     HttpResponseForbidden,
     HttpResponseNotFound,
-    HttpResponseServerError
+    HttpResponseServerError,
+    StreamingHttpResponse
 )
-from django.db import transaction
-from django.db.models import Count, Q
+from django.conf import settings
+from django.db.models import Sum
 from django.shortcuts import HttpResponse, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from pygments import highlight
-from pygments.formatters.html import HtmlFormatter
-from pygments.lexers import get_lexer_by_name
-from pygments.util import ClassNotFound
 
-from codethesaurus.settings import BASE_DIR
+from web.analytics import CounterIncrement, analytics_writer
+from web.autocomplete import KIND_ORDER, get_autocomplete_index
+from web.caching import RefreshingValue
+from web.concept_index import get_concept_index
+from web.conditional import thesaurus_condition
+from web.corpus import get_catalog
+from web.export import iter_ndjson
+from web.fragments import CategoryFragment, entry_fingerprint, fragment_cache
+from web.payloads import accepts_gzip, api_payloads, encode_payload
+from web.prerender import CATEGORY_TEMPLATES, PAGE_TEMPLATES
+from web.search import get_search_index
+from web.highlighting import highlight_code, lexer_registry
 from web.models import (
+    DailyComparisonLookups,
+    DailyEntryLookups,
+    DailyEntryStructureLookups,
+    DailySiteVisits,
+    DailyStructureLookups,
     ThesaurusEntry,
     LookupData,
     ThesaurusMetaInfo,
     MissingEntryError,
     MissingLookup,
+    MissingLookupCount,
     MissingStructureError,
     SiteVisit,
 )
@@ -34,6 +55,12 @@ from web.thesaurus_template_generators import generate_entry_template
 
 
 def store_url_info(request):
+    """
+    Queues a SiteVisit for the request with the analytics writer
+
+    :param request: HttpRequest object
+    :return: the (not yet saved) SiteVisit, or None if it couldn't be queued
+    """
     try:
         if 'HTTP_USER_AGENT' in request.META:
             user_agent = request.META['HTTP_USER_AGENT']
@@ -50,8 +77,8 @@ def store_url_info(request):
             user_agent=user_agent,
             referer=referer,
         )
-        with transaction.atomic():
-            visit.save()
+        if not analytics_writer.add(visit):
+            return None
         return visit
     except Exception as e:
         logging.error(f"Failed to store URL info: {e}")
@@ -70,8 +97,7 @@ def store_lookup_info(request, visit, entry1, version1, entry2, version2, struct
             structure=structure,
             site_visit=visit
         )
-        with transaction.atomic():
-            info.save()
+        analytics_writer.add(info)
     except Exception as e:
         logging.error(f"Failed to store lookup info: {e}")
 
@@ -86,12 +112,135 @@ def store_missing_info(visit, item_type, item_value, language_context=None):
             language_context=language_context,
             site_visit=visit
         )
-        with transaction.atomic():
-            info.save()
+        analytics_writer.add(info)
+        analytics_writer.add(CounterIncrement(
+            MissingLookupCount,
+            {(item_type, item_value, language_context or ''): 1}
+        ))
     except Exception as e:
         logging.error(f"Failed to store missing info: {e}")
 
 
+def store_missing_concepts(visit, missing_concepts):
+    """
+    Counts all concepts a request found not implemented with a single
+    increment of their MissingLookupCount rows
+
+    :param visit: SiteVisit of the request
+    :param missing_concepts: iterable of (concept key, entry key) tuples
+    """
+    if not visit:
+        return
+    counts = {}
+    for concept_key, entry_key in missing_concepts:
+        key = ('concept', concept_key, entry_key)
+        counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return
+    try:
+        analytics_writer.add(CounterIncrement(MissingLookupCount, counts))
+    except Exception as e:
+        logging.error(f"Failed to store missing concepts: {e}")
+
+
+def store_lookup_visit(request, structure_key, entry_keys_versions):
+    """
+    Stores the visit and lookup of a request the view didn't run for, e.g.
+    one answered with 304 Not Modified
+
+    :param request: HttpRequest object
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples
+    :return: the SiteVisit, or None if it couldn't be queued
+    """
+    visit = store_url_info(request)
+    entry1, version1 = entry_keys_versions[0]
+    entry2, version2 = entry_keys_versions[1] if len(entry_keys_versions) > 1 else ("", "")
+    store_lookup_info(request, visit, entry1, version1, entry2, version2, structure_key)
+    return visit
+
+
+def store_concepts_visit(request, structure_key, entry_keys_versions):
+    """
+    Stores the visit, lookup and missing concepts of a compare/reference page
+    the view didn't run for, like `concepts_page` stores them
+
+    :param request: HttpRequest object
+    :param structure_key: key of the structure
+    :param entry_keys_versions: list of (entry key, version) tuples, known to
+        the catalog
+    """
+    visit = store_lookup_visit(request, structure_key, entry_keys_versions)
+    if not visit:
+        return
+    meta_info = ThesaurusMetaInfo()
+    try:
+        meta_structure = meta_info.structure(structure_key)
+        entries = meta_info.load_entries(entry_keys_versions, meta_structure)
+    except (KeyError, MissingStructureError, MissingEntryError) as e:
+        logging.error(f"Failed to store missing concepts of {structure_key}: {e}")
+        return
+    missing_concepts, _ = concepts_status(entries, meta_structure)
+    store_missing_concepts(visit, missing_concepts)
+
+
+def resolve_entry_versions(entry_keys_versions):
+    """
+    Replaces missing versions with the entries' latest versions, like
+    `ThesaurusMetaInfo.load_entries` does
+
+    :param entry_keys_versions: list of (entry key, version or None) tuples
+    :return: list of (entry key, version) tuples, or None if an entry doesn't exist
+    """
+    catalog = get_catalog()
+    resolved = []
+    for entry_key, version in entry_keys_versions:
+        versions = catalog.entry_versions.get(entry_key)
+        if not versions:
+            return None
+        resolved.append((entry_key, version or versions[-1]))
+    return resolved
+
+
+def concepts_condition(request):
+    """Returns what the compare/reference pages depend on, for `thesaurus_condition`"""
+    entry_keys_versions, structure_key, errors = clean_concepts_parameters(request.GET)
+    entry_keys_versions = resolve_entry_versions(entry_keys_versions)
+    if errors or entry_keys_versions is None:
+        return None
+    # the pages link to their own absolute URL
+    return structure_key, entry_keys_versions, request.build_absolute_uri()
+
+
+def concepts_category_condition(request):
+    """Returns what `concepts_category` depends on, for `thesaurus_condition`"""
+    entry_keys_versions, structure_key, errors = clean_concepts_parameters(request.GET)
+    entry_keys_versions = resolve_entry_versions(entry_keys_versions)
+    if errors or entry_keys_versions is None:
+        return None
+    return structure_key, entry_keys_versions, request.GET.get('category', '')
+
+
+def api_reference_condition(request, structure_key, lang, version):
+    """Returns what `api_reference` depends on, for `thesaurus_condition`"""
+    return structure_key, [(lang, version)], api_variant(request)
+
+
+def api_compare_condition(request, structure_key, lang1, version1, lang2, version2):
+    """Returns what `api_compare` depends on, for `thesaurus_condition`"""
+    return structure_key, [(lang1, version1), (lang2, version2)], api_variant(request)
+
+
+def api_compare_entries_condition(request, structure_key):
+    """Returns what `api_compare_entries` depends on, for `thesaurus_condition`"""
+    entry_keys_versions = resolve_entry_versions([
+        clean_entry_parameter(entry_str) for entry_str in request.GET.getlist('entry')
+    ])
+    if not entry_keys_versions:
+        return None
+    return structure_key, entry_keys_versions, ""
+
+
 @require_http_methods(['GET'])
 def index(request):
     """
@@ -106,68 +255,9 @@ def index(request):
         return concepts(request)
 
     meta_info = ThesaurusMetaInfo()
-    thesauruses_dir = os.path.join(BASE_DIR, 'web', 'thesauruses')
-    meta_dir = os.path.join(thesauruses_dir, '_meta')
-    meta_concepts = os.listdir(meta_dir)
-
-    meta_data_entries = dict()
-    for key in meta_info.languages:
-        entry = meta_info.entry(key)
-        # Find which category this entry belongs to
-        category_name = "Other"
-        for cat_key, cat_label in meta_info.categories.items():
-            if os.path.exists(os.path.join(thesauruses_dir, cat_key, key)):
-                category_name = cat_label
-                break
-        
-        meta_data_entries[key] = {
-            "name": entry.name,
-            "category": category_name,
-            "versions": [{
-                "name": entry.name,
-                "version": version,
-                "availStructs": []
-            } for version in entry.versions()]
-        }
+    grouped_entries, meta_data_entries = group_index_entries(meta_info, get_catalog())
 
-    random_entries = random.sample(list(meta_data_entries.values()), k=min(3, len(meta_data_entries)))
-
-    for category in os.listdir(thesauruses_dir):
-        category_path = os.path.join(thesauruses_dir, category)
-        if category == '_meta' or not os.path.isdir(category_path):
-            continue
-        for entry_dir in os.listdir(category_path):
-            entry_path = os.path.join(category_path, entry_dir)
-            if not os.path.isdir(entry_path):
-                continue
-            for ver in os.listdir(entry_path):
-                ver_path = os.path.join(entry_path, ver)
-                if not os.path.isdir(ver_path):
-                    continue
-                for concept_json in meta_concepts:
-                    concept_name = concept_json.split('.')[0]
-                    if concept_json in os.listdir(ver_path):
-                        if entry_dir in meta_data_entries:
-                            for i in meta_data_entries[entry_dir]['versions']:
-                                if i['version'] == ver:
-                                    i['availStructs'].append(concept_name)
-                                    break
-
-    # Group meta_data_entries by category for the template
-    grouped_entries = []
-    for cat_key, cat_label in meta_info.categories.items():
-        category_data = {
-            "key": cat_key,
-            "label": cat_label,
-            "entries": {},
-            "structures": meta_info.category_structures.get(cat_key, {})
-        }
-        for key, data in meta_data_entries.items():
-            if data['category'] == cat_label:
-                category_data["entries"][key] = data['versions']
-        
-        if category_data["entries"]:
-            grouped_entries.append(category_data)
+    random_entries = random.sample(meta_data_entries, k=min(3, len(meta_data_entries)))
 
     content = {
         'title': 'Welcome',
@@ -189,45 +279,43 @@ def statistics(request):
     """
     store_url_info(request)
 
+    return render(request, 'statistics.html', statistics_cache.get())
+
+
+def statistics_context():
+    """
+    Computes the context of the statistics page from the analytics rollups
+
+    :return: dict with the counts, lists and chart data of the page
+    """
     meta_info = ThesaurusMetaInfo()
 
-    # Most popular languages (considering both language1 and language2)
-    # We need to aggregate counts for each language across both fields.
-    # A simple way is to get counts for each and then merge them in Python.
-    entry1_counts = LookupData.objects.values('entry1').annotate(count=Count('entry1'))
-    entry2_counts = LookupData.objects.exclude(entry2='').values('entry2').annotate(count=Count('entry2'))
-
-    combined_counts = {}
-    for item in entry1_counts:
-        entry = item['entry1']
-        combined_counts[entry] = combined_counts.get(entry, 0) + item['count']
-    for item in entry2_counts:
-        entry = item['entry2']
-        combined_counts[entry] = combined_counts.get(entry, 0) + item['count']
-
-    sorted_langs = sorted(combined_counts.items(), key=lambda x: x[1], reverse=True)
+    # All counts come from the daily rollups, which are maintained when the
+    # analytics are written, so the page doesn't scan the raw lookup rows
+    entry_counts = DailyEntryLookups.objects.values('entry').annotate(
+        total=Sum('count')).order_by('-total')[:10]
     popular_languages = []
-    for lang_key, count in sorted_langs[:10]:
+    for item in entry_counts:
         try:
-            name = meta_info.entry_name(lang_key)
+            name = meta_info.entry_name(item['entry'])
         except (KeyError, MissingEntryError):
-            name = lang_key
-        popular_languages.append({'name': name, 'count': count})
+            name = item['entry']
+        popular_languages.append({'name': name, 'count': item['total']})
 
     # Most popular structures
-    structure_counts = LookupData.objects.values('structure').annotate(count=Count('structure')).order_by('-count')[:10]
+    structure_counts = DailyStructureLookups.objects.values('structure').annotate(
+        total=Sum('count')).order_by('-total')[:10]
     popular_structures = []
     for item in structure_counts:
         try:
             name = meta_info.structure_name(item['structure'])
         except (KeyError, MissingStructureError):
             name = item['structure']
-        popular_structures.append({'name': name, 'count': item['count']})
+        popular_structures.append({'name': name, 'count': item['total']})
 
-    # Most popular comparisons
-    # Using a technique to ensure (lang1, lang2) is treated the same as (lang2, lang1) if we wanted to,
-    # but let's keep it simple and just look at pairs as they are.
-    comparison_counts = LookupData.objects.exclude(entry2='').values('entry1', 'entry2').annotate(count=Count('id')).order_by('-count')[:10]
+    # Most popular comparisons, with pairs as they were looked up
+    comparison_counts = DailyComparisonLookups.objects.values('entry1', 'entry2').annotate(
+        total=Sum('count')).order_by('-total')[:10]
     popular_comparisons = []
     for item in comparison_counts:
         try:
@@ -238,48 +326,40 @@ def statistics(request):
             name2 = meta_info.entry_name(item['entry2'])
         except (KeyError, MissingEntryError):
             name2 = item['entry2']
-        popular_comparisons.append({'lang1': name1, 'lang2': name2, 'count': item['count']})
+        popular_comparisons.append({'lang1': name1, 'lang2': name2, 'count': item['total']})
 
-    total_visits = SiteVisit.objects.count()
-    total_lookups = LookupData.objects.count()
+    total_visits = DailySiteVisits.objects.aggregate(total=Sum('count'))['total'] or 0
+    total_lookups = DailyStructureLookups.objects.aggregate(total=Sum('count'))['total'] or 0
 
     # Unique language comparisons
-    unique_comparisons_count = LookupData.objects.exclude(entry2='').values('entry1', 'entry2').distinct().count()
+    unique_comparisons_count = DailyComparisonLookups.objects.values(
+        'entry1', 'entry2').distinct().count()
 
     # Unique concept categories (structures) looked up
-    unique_structures_count = LookupData.objects.values('structure').distinct().count()
+    unique_structures_count = DailyStructureLookups.objects.values('structure').distinct().count()
 
     # Most popular concept-language pairs (e.g., Javascript functions)
-    concept_lang_counts = {}
-    for entry in LookupData.objects.all():
-        # Count for language 1
-        key1 = (entry.entry1, entry.structure)
-        concept_lang_counts[key1] = concept_lang_counts[key1] + 1 if key1 in concept_lang_counts else 1
-        # Count for language 2 if it exists
-        if entry.entry2:
-            key2 = (entry.entry2, entry.structure)
-            concept_lang_counts[key2] = concept_lang_counts[key2] + 1 if key2 in concept_lang_counts else 1
-    
-    sorted_concept_langs = sorted(concept_lang_counts.items(), key=lambda x: x[1], reverse=True)
+    concept_lang_counts = DailyEntryStructureLookups.objects.values('entry', 'structure').annotate(
+        total=Sum('count')).order_by('-total')[:10]
     popular_concept_langs = []
-    for (lang_key, struct_key), count in sorted_concept_langs[:10]:
+    for item in concept_lang_counts:
         try:
-            lang_name = meta_info.entry_name(lang_key)
+            lang_name = meta_info.entry_name(item['entry'])
         except (KeyError, MissingEntryError):
-            lang_name = lang_key
+            lang_name = item['entry']
         try:
-            struct_name = meta_info.structure_name(struct_key)
+            struct_name = meta_info.structure_name(item['structure'])
         except (KeyError, MissingStructureError):
-            struct_name = struct_key
+            struct_name = item['structure']
         popular_concept_langs.append({
             'label': f"{lang_name} {struct_name}",
             'lang': lang_name,
             'struct': struct_name,
-            'count': count
+            'count': item['total']
         })
 
     # Recent lookups
-    recent_lookups_query = LookupData.objects.order_by('-date_time')[:10]
+    recent_lookups_query = LookupData.objects.order_by('-id')[:10]
     recent_lookups = []
     for item in recent_lookups_query:
         try:
@@ -304,8 +384,8 @@ def statistics(request):
         })
 
     # Missing items statistics
-    missing_items_counts = MissingLookup.objects.values('item_type', 'item_value', 'language_context') \
-        .annotate(count=Count('id')).order_by('-count')[:15]
+    missing_items_counts = MissingLookupCount.objects.values(
+        'item_type', 'item_value', 'language_context', 'count').order_by('-count')[:15]
     
     missing_items = []
     for item in missing_items_counts:
@@ -331,8 +411,7 @@ def statistics(request):
             'type': item['item_type']
         })
 
-    import json
-    context = {
+    return {
         'title': 'Statistics',
         'popular_languages': popular_languages,
         'popular_structures': popular_structures,
@@ -349,7 +428,11 @@ def statistics(request):
         'popular_concept_langs_json': json.dumps(popular_concept_langs),
     }
 
-    return render(request, 'statistics.html', context)
+
+statistics_cache = RefreshingValue(
+    statistics_context,
+    getattr(settings, "STATISTICS_CACHE_SECONDS", 300),
+)
 
 
 @require_http_methods(['GET'])
@@ -370,6 +453,7 @@ def about(request):
 
 
 @require_http_methods(['GET'])
+@thesaurus_condition(concepts_condition, templates=PAGE_TEMPLATES, not_modified=store_concepts_visit)
 def concepts(request):
     """
     Renders the page comparing two language structures (/compare)
@@ -378,7 +462,22 @@ def concepts(request):
     :return: HttpResponse object with rendered object of the page
     """
     visit = store_url_info(request)
+    return concepts_page(request, visit, allow_streaming=True)
+
 
+def concepts_page(request, visit=None, allow_streaming=False):
+    """
+    Builds the compare/reference page for the `concept` and `entry`
+    parameters of a request
+
+    :param request: HttpRequest object
+    :param visit: SiteVisit the lookup and missing concepts are stored with,
+        or None to not store them (e.g. when pre-rendering the page)
+    :param allow_streaming: True to stream pages of at least
+        `settings.CONCEPTS_STREAMING_MIN_ENTRIES` entries
+    :return: HttpResponse object with rendered object of the page, or a
+        StreamingHttpResponse sending each category once it's rendered
+    """
     entry_strings, structure_key, errors = clean_concepts_parameters(request.GET)
     if errors:
         return render_errors(request, errors)
@@ -433,41 +532,136 @@ def concepts(request):
         meta_structure.key
     )
 
-    lexers = [get_highlighter(entry.key) for entry in entries]
-    all_categories = []
+    # known from the data alone, so the page header and the stored missing
+    # concepts don't have to wait for the categories to be highlighted
+    missing_concepts, incomplete_entries = concepts_status(entries, meta_structure)
+    for entry, is_incomplete in zip(entries, incomplete_entries):
+        entry._is_incomplete = is_incomplete
 
-    for (category_key, category) in meta_structure.categories.items():
-        concept_keys = list(category.keys())
-        concepts_list = [concepts_data(key, name, entries, lexers, visit) for (key, name) in category.items()]
+    store_missing_concepts(visit, missing_concepts)
+
+    # the other categories are fetched by the page as they're scrolled to
+    eager_categories = None
+    if request.GET.get('categories') != 'all' and settings.CONCEPTS_EAGER_CATEGORIES > 0:
+        eager_categories = settings.CONCEPTS_EAGER_CATEGORIES
+    categories = concepts_categories(entries, meta_structure, eager_categories)
+
+    streaming = allow_streaming and 0 < settings.CONCEPTS_STREAMING_MIN_ENTRIES <= len(entries)
+    return render_concepts(
+        request, entries, meta_structure, categories, streaming,
+        lazy_categories=eager_categories is not None and len(meta_structure.categories) > eager_categories,
+    )
 
-        category_entry = {
-            "key": category_key,
-            "concepts": concepts_list,
-            "is_incomplete": []
-        }
 
-        for entry in entries:
-            is_incomplete = False
-            # If nothing in this category is implemented for this language
-            if not entry.has_any_implemented_in_category(concept_keys):
-                is_incomplete = True
-            # OR if at least one concept is missing code/comment
-            elif entry.is_category_incomplete(concept_keys):
-                is_incomplete = True
-            
-            category_entry["is_incomplete"].append(is_incomplete)
-            
-        all_categories.append(category_entry)
+def concepts_status(entries, meta_structure):
+    """
+    Returns which concepts of a structure the entries don't implement and
+    whether each entry's thesaurus of it is incomplete
+
+    :param entries: ThesaurusEntry objects with their concepts loaded
+    :param meta_structure: MetaStructure of the structure
+    :return: tuple of a list of (concept key, entry key) tuples and a list of
+        one bool per entry
+    :rtype: tuple
+    """
+    missing_concepts = []
+    incomplete_entries = [False for _ in entries]
+    for category in meta_structure.categories.values():
+        for i, entry in enumerate(entries):
+            is_incomplete, missing = category_status(entry, list(category.keys()))
+            incomplete_entries[i] = incomplete_entries[i] or is_incomplete
+            missing_concepts.extend((concept_key, entry.key) for concept_key in missing)
+    return missing_concepts, incomplete_entries
 
-    for i, entry in enumerate(entries):
-        entry._is_incomplete = any(cat["is_incomplete"][i] for cat in all_categories)
 
-    return render_concepts(request, entries, meta_structure, all_categories)
+def concepts_categories(entries, meta_structure, eager_categories=None):
+    """
+    Yields the categories of the compare/reference page, each one only
+    rendered when it's asked for. Each entry's column of a category is
+    rendered once per content of its file and then read from the fragment
+    cache.
+
+    :param entries: ThesaurusEntry objects with their concepts loaded
+    :param meta_structure: MetaStructure of the structure
+    :param eager_categories: number of categories to render, or None for
+        all of them; the others only get the URL to load them from
+    :return: generator of dicts with the category's key and either the URL
+        of the category or its concepts (with the rendered card of each
+        entry) and whether each entry's column of it is incomplete
+    """
+    category_keys = list(meta_structure.categories.keys())
+    if eager_categories is None:
+        eager_categories = len(category_keys)
+    columns = [
+        category_fragments(entry, meta_structure, category_keys[:eager_categories])
+        for entry in entries
+    ]
+    for index, category_key in enumerate(category_keys):
+        if index < eager_categories:
+            fragments = [fragment for _, fragment in (next(column) for column in columns)]
+            yield category_data(category_key, meta_structure.categories[category_key], fragments)
+        else:
+            yield {"key": category_key, "url": category_url(meta_structure.key, category_key, entries)}
+
+
+def category_data(category_key, category, fragments):
+    """
+    Returns a category as the concepts_category.html template shows it
+
+    :param category_key: key of the category
+    :param category: dict of concept key -> concept name of the category
+    :param fragments: CategoryFragment of each entry
+    :rtype: dict
+    """
+    return {
+        "key": category_key,
+        "concepts": [
+            {
+                "key": key,
+                "name": name,
+                "cards": [fragment.cards[index] for fragment in fragments],
+            }
+            for index, (key, name) in enumerate(category.items())
+        ],
+        "is_incomplete": [fragment.is_incomplete for fragment in fragments],
+    }
+
+
+def category_url(structure_key, category_key, entries):
+    """
+    Returns the URL of one category of the compare/reference page
+
+    :param structure_key: key of the structure
+    :param category_key: key of the category
+    :param entries: ThesaurusEntry objects of the page
+    :rtype: str
+    """
+    parameters = [("concept", structure_key), ("category", category_key)] + [
+        ("entry", f"{entry.key};{entry.version}") for entry in entries
+    ]
+    return f"{reverse('compare.category')}?{urlencode(parameters)}"
+
+
+# stands in for the categories when the page around them is rendered for
+# streaming; can't come from the context, which is escaped
+CATEGORIES_PLACEHOLDER = "<!-- categories -->"
 
 
 @require_http_methods(['GET'])
-def render_concepts(request, entries, structure, all_categories):
-    """Renders the `structure` page for all `entries`"""
+def render_concepts(request, entries, structure, all_categories, streaming=False, lazy_categories=False):
+    """
+    Renders the `structure` page for all `entries`
+
+    :param request: HttpRequest object
+    :param entries: ThesaurusEntry objects of the page
+    :param structure: MetaStructure of the page
+    :param all_categories: iterable of the categories, as `concepts_categories`
+        yields them
+    :param streaming: True to send the page up to the categories right away
+        and then each category as soon as it's rendered
+    :param lazy_categories: True if some categories are loaded by the page
+    :return: HttpResponse, or StreamingHttpResponse if `streaming`
+    """
 
     entry_name_versions = [f"{l.name} (version {l.version})" for l in entries]
     if len(entries) == 1:
@@ -490,10 +684,147 @@ def render_concepts(request, entries, structure, all_categories):
             for entry in entries
         ],
         "categories": all_categories,
+        "lazy_categories": lazy_categories,
+        "description": f"Code Thesaurus: {title}"
+    }
+
+    if not streaming:
+        response["categories"] = list(all_categories)
+        return render(request, 'concepts.html', response)
+
+    response["categories_placeholder"] = mark_safe(CATEGORIES_PLACEHOLDER)
+    head, _, tail = render_to_string('concepts.html', response, request).partition(CATEGORIES_PLACEHOLDER)
+
+    def stream():
+        yield head
+        for category in all_categories:
+            yield render_to_string('concepts_category.html', {
+                "category": category,
+                "languages": response["languages"],
+                "structure_key": structure.key,
+            })
+        yield tail
+
+    return StreamingHttpResponse(stream(), content_type="text/html; charset=utf-8")
+
+
+@require_http_methods(['GET'])
+@thesaurus_condition(concepts_category_condition, templates=CATEGORY_TEMPLATES)
+def concepts_category(request):
+    """
+    Renders one category of the compare/reference page, for the page to load
+    the categories it didn't render as they're scrolled to
+    (/compare/category/?concept={structure}&category={category}&entry=...)
+
+    :param request: HttpRequest object
+    :return: HttpResponse object with the HTML of the category
+    """
+    entry_strings, structure_key, errors = clean_concepts_parameters(request.GET)
+    if errors:
+        return HttpResponseBadRequest()
+
+    meta_info = ThesaurusMetaInfo()
+    try:
+        meta_structure = meta_info.structure(structure_key)
+        category = meta_structure.categories[request.GET.get('category', '')]
+        entries = meta_info.load_entries(entry_strings, meta_structure)
+    except (KeyError, MissingStructureError, MissingEntryError):
+        return HttpResponseNotFound()
+
+    category_key = request.GET['category']
+    fragments = [
+        fragment
+        for entry in entries
+        for _, fragment in category_fragments(entry, meta_structure, [category_key])
+    ]
+    return render(request, 'concepts_category.html', {
+        "category": category_data(category_key, category, fragments),
+        "languages": [{"key": entry.key, "version": entry.version, "name": entry.name} for entry in entries],
+        "structure_key": meta_structure.key,
+    })
+
+
+@require_http_methods(['GET'])
+def concept_entries(request, structure_key, concept_key):
+    """
+    Renders the page showing one concept in every entry that has its structure
+    (/concept/<structure>/<concept>/)
+
+    :param request: HttpRequest object
+    :param structure_key: key of the structure
+    :param concept_key: key of the concept
+    :return: HttpResponse object with rendered object of the page
+    """
+    visit = store_url_info(request)
+
+    meta_info = ThesaurusMetaInfo()
+    found = find_concept(meta_info, structure_key, concept_key)
+    if found is None:
+        store_missing_info(visit, 'concept', concept_key, structure_key)
+        return render_errors(request, ["The structure/concept isn't valid. \
+                Double-check your URL and try again."])
+    meta_structure, category_key, concept_name = found
+
+    entries = []
+    for posting in get_concept_index().lookup(structure_key, concept_key):
+        if not posting.known:
+            code = "Unknown"
+        elif posting.implemented and posting.code:
+            code = highlight_code(posting.code, get_highlighter(posting.entry_key))
+        else:
+            code = None
+        comment = posting.comment
+        if posting.known and not posting.implemented and not comment:
+            comment = "Not Implemented"
+        entries.append({
+            "key": posting.entry_key,
+            "name": meta_info.languages.get(posting.entry_key, posting.entry_key),
+            "version": posting.version,
+            "implemented": posting.implemented,
+            "code": code,
+            "comment": comment,
+        })
+
+    title = f"{concept_name} in every language"
+    content = {
+        "title": title,
+        "structure": meta_structure.key,
+        "structure_name": meta_structure.name,
+        "category": category_key,
+        "concept": concept_key,
+        "concept_name": concept_name,
+        "entries": entries,
         "description": f"Code Thesaurus: {title}"
     }
+    return render(request, 'concept.html', content)
 
-    return render(request, 'concepts.html', response)
+
+@require_http_methods(['GET'])
+def search(request):
+    """
+    Renders the results of a full-text search of the thesauruses
+    (/search/?q=...)
+
+    :param request: HttpRequest object
+    :return: HttpResponse object with rendered object of the page
+    """
+    store_url_info(request)
+
+    if len(request.GET.get('q', '')) > getattr(settings, "SEARCH_MAX_QUERY_LENGTH", 200):
+        return error_handler_400_bad_request(request, "Search query too long")
+    query, results = search_results(request)
+    for result in results:
+        if result["code"]:
+            result["code"] = highlight_code(result["code"], get_highlighter(result["entry"]))
+
+    title = f"Search results for \"{query}\"" if query else "Search"
+    content = {
+        "title": title,
+        "query": query,
+        "results": results,
+        "description": f"Code Thesaurus: {title}"
+    }
+    return render(request, 'search.html', content)
 
 
 def error_handler_400_bad_request(request, exception):
@@ -559,14 +890,117 @@ def error_handler_500_server_error(request):
 
 #get lexer 
 def get_highlighter(entry_key):
-    SIMILAR_LEXERS = settings.SIMILAR_LEXERS
-    try:
-        lexer = get_lexer_by_name(entry_key, startinline=True)
-    except ClassNotFound:
-        lexer = get_lexer_by_name(SIMILAR_LEXERS.get(entry_key, "text"), startinline=True)
-    return lexer
+    """
+    Returns the lexer for an entry from the process-wide lexer registry
+
+    :param entry_key: key of the entry
+    :return: Pygments lexer
+    """
+    return lexer_registry.lexer(entry_key)
 
 # Helper functions
+def group_index_entries(meta_info, catalog):
+    """
+    Builds the entries of the home page, grouped by category, in one pass over
+    the entries and their versions, reading availability from the catalog's
+    precomputed matrix
+
+    :param meta_info: ThesaurusMetaInfo with the entries and categories
+    :param catalog: Catalog of the thesauruses directory
+    :return: tuple of the list of categories (with their entries and
+        structures) and the list of all entries
+    """
+    availability = catalog.availability
+    grouped = {
+        cat_key: {
+            "key": cat_key,
+            "label": cat_label,
+            "entries": {},
+            "structures": meta_info.category_structures.get(cat_key, {})
+        }
+        for cat_key, cat_label in meta_info.categories.items()
+    }
+    all_entries = []
+    for key, name in meta_info.languages.items():
+        category_key = catalog.category(key)
+        versions = [{
+            "name": name,
+            "version": version,
+            "availStructs": availability.structures(key, version)
+        } for version in catalog.entry_versions.get(key, [])]
+
+        all_entries.append({
+            "name": name,
+            "category": meta_info.categories.get(category_key, "Other"),
+            "versions": versions
+        })
+        if category_key in grouped:
+            grouped[category_key]["entries"][key] = versions
+
+    grouped_entries = [category for category in grouped.values() if category["entries"]]
+    return grouped_entries, all_entries
+
+def find_concept(meta_info, structure_key, concept_key):
+    """
+    Looks up a concept in the meta structure file of its structure
+
+    :param meta_info: ThesaurusMetaInfo
+    :param structure_key: key of the structure
+    :param concept_key: key of the concept
+    :return: tuple of the MetaStructure, the concept's category and its
+        name, or None if the structure or the concept doesn't exist
+    :rtype: tuple
+    """
+    try:
+        meta_structure = meta_info.structure(structure_key)
+    except (KeyError, FileNotFoundError):
+        return None
+    for category_key, category in meta_structure.categories.items():
+        if concept_key in category:
+            return meta_structure, category_key, category[concept_key]
+    return None
+
+def search_results(request):
+    """
+    Runs the search given by the `q`, `limit`, `structure` and `entry`
+    parameters of a request
+
+    :param request: HttpRequest object
+    :return: tuple of the query and the list of results, each a dict with the
+        entry, structure and concept of a match, its code and comment
+    :rtype: tuple
+    """
+    query = request.GET.get('q', '').strip()
+    max_results = getattr(settings, "SEARCH_MAX_RESULTS", 100)
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), max_results)
+    except ValueError:
+        limit = 20
+    if not query:
+        return query, []
+
+    meta_info = ThesaurusMetaInfo()
+    matches = get_search_index().search(
+        query, limit,
+        structure_key=request.GET.get('structure') or None,
+        entry_key=request.GET.get('entry') or None,
+    )
+    return query, [
+        {
+            "entry": document.entry_key,
+            "entry_name": meta_info.languages.get(document.entry_key, document.entry_key),
+            "version": document.version,
+            "structure": document.structure_key,
+            "structure_name": meta_info.structures.get(document.structure_key, document.structure_key),
+            "concept": document.concept_key,
+            "concept_name": document.concept_name,
+            "code": document.code,
+            "comment": document.comment,
+            "score": round(score, 4),
+        }
+        for score, document in matches
+    ]
+
 def format_code_for_display(concept_key, entry, lexer=None):
     """
     Returns the formatted HTML formatted syntax-highlighted text for a concept key (from a meta
@@ -583,11 +1017,7 @@ def format_code_for_display(concept_key, entry, lexer=None):
     if entry.concept_implemented(concept_key):
         if lexer is None:
             lexer = get_highlighter(entry.key)
-        return highlight(
-            entry.concept_code(concept_key),
-            lexer,
-            HtmlFormatter()
-        )
+        return highlight_code(entry.concept_code(concept_key), lexer)
     return None
 
 
@@ -605,35 +1035,76 @@ def format_comment_for_display(concept_key, entry):
     return entry.concept_comment(concept_key)
 
 
-def concepts_data(key, name, entries, lexers=None, visit=None):
+def render_category_fragment(entry, category, lexer):
     """
-    Generates the comparison object of a single concept
+    Renders an entry's column of a category of the compare and reference pages
 
-    :param key: key of the concept
-    :param name: name of the concept
-    :param entries: list of entries to compare / get a reference for
-    :param lexers: optional list of pre-fetched lexers corresponding to entries
-    :param visit: optional SiteVisit for logging missing items
-    :return: dict with code and comment for each entry
+    :param entry: ThesaurusEntry with its concepts loaded
+    :param category: dict of concept key -> concept name of the category
+    :param lexer: Pygments lexer of the entry
+    :rtype: CategoryFragment
     """
-    data = []
-    for i, entry in enumerate(entries):
-        lexer = lexers[i] if lexers else None
-        
-        # Log if concept is not implemented
-        if visit and not entry.concept_implemented(key):
-            store_missing_info(visit, 'concept', key, entry.key)
-            
-        data.append({
-            "code": format_code_for_display(key, entry, lexer),
-            "comment": format_comment_for_display(key, entry)
-        })
+    concept_keys = list(category.keys())
+    cards = []
+    for concept_key in concept_keys:
+        cards.append(render_to_string("concept_card.html", {
+            "code": format_code_for_display(concept_key, entry, lexer),
+            "comment": format_comment_for_display(concept_key, entry),
+        }))
+    is_incomplete, missing_concepts = category_status(entry, concept_keys)
+    return CategoryFragment(tuple(cards), is_incomplete, missing_concepts)
+
+
+def category_status(entry, concept_keys):
+    """
+    Returns whether an entry's column of a category is incomplete and which
+    of its concepts the entry doesn't implement
 
-    return {
-        "key": key,
-        "name": name,
-        "data": data,
-    }
+    :param entry: ThesaurusEntry with its concepts loaded
+    :param concept_keys: keys of the concepts of the category
+    :return: tuple of the bool and a tuple of the keys of the missing concepts
+    :rtype: tuple
+    """
+    # nothing in the category is implemented, or a concept is missing its
+    # code/comment
+    is_incomplete = not entry.has_any_implemented_in_category(concept_keys) or \
+        entry.is_category_incomplete(concept_keys)
+    missing_concepts = tuple(
+        concept_key for concept_key in concept_keys if not entry.concept_implemented(concept_key))
+    return is_incomplete, missing_concepts
+
+
+def category_fragments(entry, meta_structure, category_keys=None):
+    """
+    Yields an entry's column of each category of a structure, from the
+    fragment cache where possible, rendering a category only when it's
+    asked for
+
+    :param entry: ThesaurusEntry with its concepts of the structure loaded
+    :param meta_structure: MetaStructure of the structure
+    :param category_keys: keys of the categories, or None for all of them
+    :return: generator of (category key, CategoryFragment) tuples, in the
+        order of `category_keys` or else of the structure
+    """
+    fingerprint = entry_fingerprint(entry.key, entry.version, meta_structure.key)
+    lexer = None
+    if category_keys is None:
+        category_keys = meta_structure.categories.keys()
+    for category_key in category_keys:
+        category = meta_structure.categories[category_key]
+        fragment = None
+        if fingerprint is not None:
+            fragment = fragment_cache.get(
+                fingerprint, entry.key, entry.version, meta_structure.key, category_key)
+        if fragment is None:
+            if lexer is None:
+                lexer = get_highlighter(entry.key)
+            fragment = render_category_fragment(entry, category, lexer)
+            if fingerprint is not None:
+                fragment_cache.set(
+                    fingerprint, entry.key, entry.version, meta_structure.key, category_key,
+                    fragment)
+        yield category_key, fragment
 
 
 def render_errors(request, errors):
@@ -646,6 +1117,21 @@ def render_errors(request, errors):
     return HttpResponseNotFound(response)
 
 
+def clean_entry_parameter(entry_str):
+    """
+    Cleans up an entry parameter in the form "key;version"
+
+    :param entry_str: value of the parameter
+    :return: tuple of the entry key and the version, or None if there is none
+    :rtype: tuple
+    """
+    key_version = escape(strip_tags(entry_str)).split(";")
+    try:
+        return key_version[0], key_version[1]
+    except IndexError:
+        return key_version[0], None
+
+
 def clean_concepts_parameters(parameters):
     """Verify and clean up the parameters for concepts view"""
 
@@ -658,13 +1144,7 @@ def clean_concepts_parameters(parameters):
     if "lang2" in parameters:
         entry_strings.append(parameters['lang2'])
 
-    entry_keys_versions = []
-    for entry_str in entry_strings:
-        key_version = escape(strip_tags(entry_str)).split(";")
-        try:
-            entry_keys_versions.append((key_version[0], key_version[1]))
-        except IndexError:
-            entry_keys_versions.append((key_version[0], None))
+    entry_keys_versions = [clean_entry_parameter(entry_str) for entry_str in entry_strings]
     structure_key = escape(strip_tags(parameters.get('concept', '')))
 
     errors = []
@@ -675,11 +1155,78 @@ def clean_concepts_parameters(parameters):
     return entry_keys_versions, structure_key, errors
 
 
+def api_representation(request):
+    """
+    Returns which variant of a JSON API response the client asked for
+
+    :param request: HttpRequest object
+    :return: tuple of whether to use compact JSON (the `compact` parameter is
+        `1`, `true` or `yes`) and whether to gzip it (the client accepts gzip)
+    :rtype: tuple
+    """
+    compact = request.GET.get('compact', '').strip().lower() in ('1', 'true', 'yes')
+    return compact, accepts_gzip(request)
+
+
+def api_projection(request):
+    """
+    Returns the concepts and fields the client asked for with the `concepts`
+    and `fields` parameters, e.g. ?concepts=boolean,integer&fields=code,comment
+
+    :param request: HttpRequest object
+    :return: tuple of the frozenset of concept keys and the frozenset of
+        fields; each is None if the parameter isn't given
+    :rtype: tuple
+    """
+    projection = []
+    for parameter in ('concepts', 'fields'):
+        values = request.GET.get(parameter)
+        if values is None:
+            projection.append(None)
+        else:
+            projection.append(frozenset(value.strip() for value in values.split(',') if value.strip()))
+    return tuple(projection)
+
+
+def api_variant(request):
+    """
+    Returns a string of everything besides the thesaurus files an API
+    response depends on, for `thesaurus_condition`
+
+    :param request: HttpRequest object
+    :rtype: str
+    """
+    concept_keys, fields = api_projection(request)
+    return repr((
+        api_representation(request),
+        None if concept_keys is None else sorted(concept_keys),
+        None if fields is None else sorted(fields),
+    ))
+
+
+def api_json_response(body, gzipped):
+    """
+    Returns the response of an encoded JSON API document
+
+    :param body: bytes from `encode_payload` or the prebuilt payloads
+    :param gzipped: True if the body is gzipped
+    :return: HttpResponse object
+    """
+    response = HttpResponse(body, content_type="application/json")
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
 # API functions
 
+@thesaurus_condition(api_reference_condition, not_modified=store_lookup_visit)
 def api_reference(request, structure_key, lang, version):
     """
-    Returns the filled template for a given language and concept
+    Returns the filled template for a given language and concept, optionally
+    only with the concepts and fields given by `concepts` and `fields`
+    parameters, and as compact JSON with `compact`
 
     :param request: HttpRequest object
     :param structure_key: concept
@@ -688,23 +1235,30 @@ def api_reference(request, structure_key, lang, version):
     :return: HttpResponse filled template of concept
     """
     visit = store_url_info(request)
+    compact, gzipped = api_representation(request)
+    concept_keys, fields = api_projection(request)
 
     entry_obj = ThesaurusEntry(lang, "")
 
-    try:
-        response = entry_obj.load_filled_concepts(structure_key, version)
-    except Exception as e:
-        # Determine if it's a language or structure issue
-        # If ThesaurusEntry(lang, "") failed to find versions, it might be a language issue
-        if not entry_obj.versions():
-            store_missing_info(visit, 'language', lang)
-        else:
-            store_missing_info(visit, 'structure', structure_key, lang)
-        return error_handler_404_not_found(request, e)
-
-    if response is False:
-        store_missing_info(visit, 'structure', structure_key, lang)
-        return HttpResponseNotFound()
+    response = None
+    if concept_keys is None and fields is None:
+        response = api_payloads.get("reference", structure_key, [(lang, version)], compact, gzipped)
+    if response is None:
+        try:
+            response = encode_payload(
+                entry_obj.filled_concepts(
+                    structure_key, version, concept_keys=concept_keys, fields=fields),
+                compact,
+                gzipped
+            )
+        except Exception as e:
+            # Determine if it's a language or structure issue
+            # If ThesaurusEntry(lang, "") failed to find versions, it might be a language issue
+            if not entry_obj.versions():
+                store_missing_info(visit, 'language', lang)
+            else:
+                store_missing_info(visit, 'structure', structure_key, lang)
+            return error_handler_404_not_found(request, e)
 
     store_lookup_info(
         request,
@@ -716,11 +1270,13 @@ def api_reference(request, structure_key, lang, version):
         structure_key
     )
 
-    return HttpResponse(response, content_type="application/json")
+    return api_json_response(response, gzipped)
 
+@thesaurus_condition(api_compare_condition, not_modified=store_lookup_visit)
 def api_compare(request, structure_key, lang1, version1, lang2, version2):
     """
-    Returns the comparison between two languages for a given structure
+    Returns the comparison between two languages for a given structure, with
+    the same parameters as `api_reference`
 
     :param request: HttpRequest object
     :param structure_key: concept
@@ -731,17 +1287,25 @@ def api_compare(request, structure_key, lang1, version1, lang2, version2):
     :return: HttpResponse response
     """
     visit = store_url_info(request)
-
-    try:
-        response = ThesaurusEntry(lang1, "").load_comparison(structure_key, lang2, version2, version1)
-    except Exception:
-        # Simple logging for now
-        store_missing_info(visit, 'structure', structure_key, f"{lang1}/{lang2}")
-        return HttpResponseNotFound()
-
-    if response is False:
-        store_missing_info(visit, 'structure', structure_key, f"{lang1}/{lang2}")
-        return HttpResponseNotFound()
+    compact, gzipped = api_representation(request)
+    concept_keys, fields = api_projection(request)
+
+    response = None
+    if concept_keys is None and fields is None:
+        response = api_payloads.get(
+            "compare", structure_key, [(lang1, version1), (lang2, version2)], compact, gzipped)
+    if response is None:
+        try:
+            response = encode_payload(
+                ThesaurusEntry(lang1, "").comparison(
+                    structure_key, lang2, version2, version1, concept_keys, fields),
+                compact,
+                gzipped
+            )
+        except Exception:
+            # Simple logging for now
+            store_missing_info(visit, 'structure', structure_key, f"{lang1}/{lang2}")
+            return HttpResponseNotFound()
 
     store_lookup_info(
         request,
@@ -753,4 +1317,279 @@ def api_compare(request, structure_key, lang1, version1, lang2, version2):
         structure_key
     )
 
-    return HttpResponse(response, content_type="application/json")
+    return api_json_response(response, gzipped)
+
+
+@thesaurus_condition(api_compare_entries_condition, not_modified=store_lookup_visit)
+def api_compare_entries(request, structure_key):
+    """
+    Returns the comparison of any number of entries for a given structure,
+    e.g. /api/compare/data_types/?entry=python;3&entry=java;17&entry=rust;1.73
+
+    :param request: HttpRequest object
+    :param structure_key: concept
+    :return: HttpResponse with the combined document of all entries
+    """
+    visit = store_url_info(request)
+
+    entry_keys_versions = [
+        clean_entry_parameter(entry_str) for entry_str in request.GET.getlist('entry')
+    ]
+    if not entry_keys_versions:
+        return HttpResponseBadRequest()
+
+    meta_info = ThesaurusMetaInfo()
+    try:
+        meta_structure = meta_info.structure(structure_key)
+        response = meta_info.comparison(entry_keys_versions, meta_structure)
+    except KeyError:
+        store_missing_info(visit, 'structure', structure_key)
+        return HttpResponseNotFound()
+    except MissingStructureError as missing_structure:
+        store_missing_info(visit, 'structure', structure_key, missing_structure.entry_key)
+        return HttpResponseNotFound()
+    except MissingEntryError as missing_entry:
+        store_missing_info(visit, 'language', missing_entry.key)
+        return HttpResponseNotFound()
+
+    entries = response["meta"]["entries"]
+    store_lookup_info(
+        request,
+        visit,
+        entries[0]["entry"],
+        entries[0]["entry_version"],
+        entries[1]["entry"] if len(entries) > 1 else "",
+        entries[1]["entry_version"] if len(entries) > 1 else "",
+        structure_key
+    )
+
+    return HttpResponse(json.dumps(response, indent=2), content_type="application/json")
+
+
+@require_http_methods(['GET'])
+def api_export(request):
+    """
+    Streams the filled template of every entry, version and structure as
+    newline-delimited JSON, optionally filtered by `category`, `entry` and
+    `structure` parameters (each can be repeated)
+
+    :param request: HttpRequest object
+    :return: StreamingHttpResponse with one JSON document per line
+    """
+    store_url_info(request)
+
+    response = StreamingHttpResponse(
+        iter_ndjson(
+            set(request.GET.getlist('category')),
+            set(request.GET.getlist('entry')),
+            set(request.GET.getlist('structure')),
+        ),
+        content_type="application/x-ndjson"
+    )
+    response['Content-Disposition'] = 'inline; filename="codethesaurus.ndjson"'
+    return response
+
+
+def batch_lookup(structure_key, entry_key, version, meta_info):
+    """
+    Builds the filled template of one lookup of the batch API
+
+    :param structure_key: key of the structure
+    :param entry_key: key of the entry
+    :param version: version of the entry
+    :param meta_info: ThesaurusMetaInfo shared by all lookups of the batch
+    :return: tuple of the HTTP status of the lookup and the filled template,
+        or an error message
+    :rtype: tuple
+    """
+    if structure_key not in meta_info.structures:
+        return HTTPStatus.NOT_FOUND, f"The structure \"{structure_key}\" doesn't exist"
+    if entry_key not in meta_info.languages:
+        return HTTPStatus.NOT_FOUND, f"The entry \"{entry_key}\" doesn't exist"
+    missing_version = HTTPStatus.NOT_FOUND, \
+        f"Version \"{version}\" of \"{entry_key}\" doesn't have the structure \"{structure_key}\""
+    # only known files, so the version from the body can't point anywhere else
+    if not get_catalog().availability.has(entry_key, version, structure_key):
+        return missing_version
+    try:
+        return HTTPStatus.OK, ThesaurusEntry(entry_key, "").filled_concepts(
+            structure_key, version, meta_info)
+    except FileNotFoundError:
+        return missing_version
+    except Exception as e:
+        logging.error(f"Failed to build {entry_key} {version} {structure_key} for a batch: {e}")
+        return HTTPStatus.INTERNAL_SERVER_ERROR, "The document couldn't be built"
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+def api_batch(request):
+    """
+    Returns the filled templates of many lookups at once. The body is JSON like
+    {"items": [{"structure": "data_types", "lang": "python", "version": "3"}, ...]}
+    with at most `settings.API_BATCH_MAX_ITEMS` items. Every item gets its own
+    result with a status, so one failed lookup doesn't fail the batch, and
+    repeated lookups are only built once.
+
+    :param request: HttpRequest object
+    :return: HttpResponse with the results in the order of the items and the
+        cost of the batch
+    """
+    visit = store_url_info(request)
+    started = time.perf_counter()
+
+    try:
+        items = json.loads(request.body)["items"]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest(
+            json.dumps({"error": "The body must be a JSON object with a list of \"items\""}),
+            content_type="application/json"
+        )
+    max_items = getattr(settings, "API_BATCH_MAX_ITEMS", 100)
+    if not isinstance(items, list) or len(items) > max_items:
+        return HttpResponseBadRequest(
+            json.dumps({"error": f"\"items\" must be a list of at most {max_items} lookups"}),
+            content_type="application/json"
+        )
+
+    meta_info = ThesaurusMetaInfo()
+    lookups = {}
+    results = []
+    for item in items:
+        lookup = None
+        if isinstance(item, dict):
+            lookup = (item.get("structure"), item.get("lang"), item.get("version"))
+        if lookup is None or not all(isinstance(value, str) and value for value in lookup):
+            results.append({
+                "status": HTTPStatus.BAD_REQUEST,
+                "error": "Every item needs a \"structure\", \"lang\" and \"version\""
+            })
+            continue
+
+        structure_key, entry_key, version = lookup
+        if lookup not in lookups:
+            lookups[lookup] = batch_lookup(structure_key, entry_key, version, meta_info)
+            status, _ = lookups[lookup]
+            if status == HTTPStatus.OK:
+                store_lookup_info(request, visit, entry_key, version, "", "", structure_key)
+            elif entry_key not in meta_info.languages:
+                store_missing_info(visit, 'language', entry_key)
+            elif status == HTTPStatus.NOT_FOUND:
+                store_missing_info(visit, 'structure', structure_key, entry_key)
+
+        status, document = lookups[lookup]
+        result = {"structure": structure_key, "lang": entry_key, "version": version, "status": status}
+        result["document" if status == HTTPStatus.OK else "error"] = document
+        results.append(result)
+
+    response = {
+        "results": results,
+        "cost": {
+            "items": len(items),
+            "documents_built": sum(1 for status, _ in lookups.values() if status == HTTPStatus.OK),
+            "deduplicated": sum(1 for result in results if "lang" in result) - len(lookups),
+            "errors": sum(1 for result in results if result["status"] != HTTPStatus.OK),
+            "milliseconds": round((time.perf_counter() - started) * 1000, 3),
+        },
+    }
+    return HttpResponse(json.dumps(response, indent=2), content_type="application/json")
+
+
+def api_concept_entries(request, structure_key, concept_key):
+    """
+    Returns one concept of every entry that has its structure, read from the
+    concept index
+
+    :param request: HttpRequest object
+    :param structure_key: key of the structure
+    :param concept_key: key of the concept
+    :return: HttpResponse with the concept's meta info and the code and
+        comment of each entry version
+    """
+    visit = store_url_info(request)
+
+    meta_info = ThesaurusMetaInfo()
+    found = find_concept(meta_info, structure_key, concept_key)
+    if found is None:
+        store_missing_info(visit, 'concept', concept_key, structure_key)
+        return HttpResponseNotFound()
+    meta_structure, category_key, concept_name = found
+
+    response = {
+        "meta": {
+            "structure": structure_key,
+            "structure_name": meta_structure.name,
+            "category": category_key,
+            "concept": concept_key,
+            "concept_name": concept_name,
+        },
+        "entries": [
+            {
+                "entry": posting.entry_key,
+                "entry_name": meta_info.languages.get(posting.entry_key, posting.entry_key),
+                "version": posting.version,
+                "known": posting.known,
+                "implemented": posting.implemented,
+                "code": posting.code,
+                "comment": posting.comment,
+            }
+            for posting in get_concept_index().lookup(structure_key, concept_key)
+        ],
+    }
+    return HttpResponse(json.dumps(response, indent=2), content_type="application/json")
+
+
+@require_http_methods(['GET'])
+def api_search(request):
+    """
+    Returns the results of a full-text search of the thesauruses
+
+    :param request: HttpRequest object with the `q` (at most
+        `settings.SEARCH_MAX_QUERY_LENGTH` characters), `limit`, `structure`
+        and `entry` parameters
+    :return: HttpResponse with the query and the ranked results
+    """
+    store_url_info(request)
+
+    if len(request.GET.get('q', '')) > getattr(settings, "SEARCH_MAX_QUERY_LENGTH", 200):
+        return HttpResponseBadRequest()
+    query, results = search_results(request)
+    if not query:
+        return HttpResponseBadRequest()
+    response = {
+        "query": query,
+        "results": results,
+    }
+    return HttpResponse(json.dumps(response, indent=2), content_type="application/json")
+
+
+@require_http_methods(['GET'])
+def api_autocomplete(request):
+    """
+    Returns the entries, structures and concepts whose names best match what
+    has been typed so far, tolerating typos. It is called on every keystroke,
+    so unlike the other API functions it isn't stored as a site visit.
+
+    :param request: HttpRequest object with the `q` (at most
+        `settings.AUTOCOMPLETE_MAX_QUERY_LENGTH` characters), `limit` and
+        `type` (entry, structure or concept) parameters
+    :return: HttpResponse with the query and the ranked matches
+    """
+    query = request.GET.get('q', '')
+    kind = request.GET.get('type') or None
+    if kind is not None and kind not in KIND_ORDER:
+        return HttpResponseBadRequest()
+    if len(query) > getattr(settings, "AUTOCOMPLETE_MAX_QUERY_LENGTH", 100):
+        return HttpResponseBadRequest()
+    max_results = getattr(settings, "AUTOCOMPLETE_MAX_RESULTS", 25)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), max_results)
+    except ValueError:
+        limit = 10
+
+    matches = get_autocomplete_index().complete(query, limit, kind)
+    response = {
+        "query": query,
+        "results": [dict(item.as_dict(), score=round(score, 4)) for score, item in matches],
+    }
+    return HttpResponse(json.dumps(response), content_type="application/json")